@@ -0,0 +1,199 @@
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from file_lock import try_flock
+
+# how often a ticket at the head of the queue retries for a host-wide slot
+GLOBAL_SLOT_POLL_SECONDS = 0.05
+
+
+class QueueFull(Exception):
+    """Raised when a request is rejected by the admission queue."""
+
+    def __init__(self, message, status=503):
+        super().__init__(message)
+        self.status = status
+
+
+class AdmissionQueue:
+    """FIFO admission control in front of a slow backend (the vision model).
+
+    At most ``max_in_flight`` requests are served at once, each session may
+    have only one request queued or running, and requests are rejected once
+    ``max_queue`` are already waiting. Waiting and service time are recorded
+    separately.
+
+    With ``slot_dir`` set, ``max_in_flight`` is enforced across every
+    process on the host: an admitted request also holds one of
+    ``max_in_flight`` slot files (``flock``) until it is released. Queue
+    order and the one-request-per-session rule stay per process.
+
+    Args:
+        max_in_flight (int): concurrent requests allowed through.
+        max_queue (int): waiting requests before new ones are rejected.
+        name (str): label used in log lines.
+        slot_dir (str, optional): folder for host-wide slot files.
+    """
+
+    def __init__(self, max_in_flight=2, max_queue=16, name="queue", slot_dir=None):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.name = name
+        self.slot_dir = slot_dir
+        if slot_dir:
+            os.makedirs(slot_dir, exist_ok=True)
+        self._cond = threading.Condition()
+        self._waiting = deque()  # tickets, FIFO
+        self._in_flight = 0
+        self._sessions = set()
+        self.admitted = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.total_service = 0.0
+
+    def position(self, ticket):
+        """1-based position of a waiting ticket (0 once admitted)."""
+        with self._cond:
+            for i, waiting in enumerate(self._waiting):
+                if waiting is ticket:
+                    return i + 1
+            return 0
+
+    def session_position(self, session_id):
+        """Position of a session's waiting request, 0 if running, None if absent."""
+        with self._cond:
+            for i, waiting in enumerate(self._waiting):
+                if waiting["session_id"] == session_id:
+                    return i + 1
+            return 0 if session_id in self._sessions else None
+
+    def enqueue(self, session_id):
+        """Reserve a place in the queue for ``session_id``.
+
+        Returns:
+            object: ticket to pass to ``wait``/``release``.
+
+        Raises:
+            QueueFull: session already active (429) or queue full (503).
+        """
+        with self._cond:
+            if session_id in self._sessions:
+                self.rejected += 1
+                raise QueueFull("A request for this session is already in progress", status=429)
+            if len(self._waiting) >= self.max_queue:
+                self.rejected += 1
+                raise QueueFull(f"Model is busy ({len(self._waiting)} requests waiting)", status=503)
+            ticket = {"session_id": session_id, "enqueued": time.monotonic()}
+            self._sessions.add(session_id)
+            self._waiting.append(ticket)
+            return ticket
+
+    def wait(self, ticket, timeout=None):
+        """Block until ``ticket`` is at the head and a slot is free.
+
+        Args:
+            ticket (object): from ``enqueue``.
+            timeout (float, optional): seconds to wait before returning.
+
+        Returns:
+            bool: True once admitted, False if ``timeout`` elapsed first (the
+            ticket keeps its place, so callers can report the position and
+            wait again).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                ready = self._waiting[0] is ticket and self._in_flight < self.max_in_flight
+                if ready and self._take_global_slot(ticket):
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                if ready:
+                    # only another process can free a slot: poll
+                    remaining = min(remaining or GLOBAL_SLOT_POLL_SECONDS, GLOBAL_SLOT_POLL_SECONDS)
+                self._cond.wait(remaining)
+
+            self._waiting.popleft()
+            self._in_flight += 1
+            self.admitted += 1
+            ticket["admitted"] = time.monotonic()
+            ticket["wait"] = ticket["admitted"] - ticket["enqueued"]
+            self.total_wait += ticket["wait"]
+            self._cond.notify_all()
+            return True
+
+    def _take_global_slot(self, ticket):
+        """Lock a free host-wide slot file for ``ticket`` (always True without ``slot_dir``)."""
+        if not self.slot_dir:
+            return True
+        for i in range(self.max_in_flight):
+            fd = try_flock(os.path.join(self.slot_dir, f"{self.name}-{i}.slot"))
+            if fd is not None:
+                ticket["slot_fd"] = fd
+                return True
+        return False
+
+    def release(self, ticket):
+        """Free the slot (or queue place) held by ``ticket``.
+
+        Idempotent: only the first call releases, later ones are no-ops (so
+        they cannot drop the session's next request).
+        """
+        with self._cond:
+            if ticket.get("released"):
+                return
+            ticket["released"] = True
+            if "admitted" in ticket and "service" not in ticket:
+                ticket["service"] = time.monotonic() - ticket["admitted"]
+                self.total_service += ticket["service"]
+                self._in_flight -= 1
+                if "slot_fd" in ticket:
+                    os.close(ticket.pop("slot_fd"))
+            else:
+                self._remove(ticket)
+            self._sessions.discard(ticket["session_id"])
+            self._cond.notify_all()
+
+    def _remove(self, ticket):
+        for waiting in self._waiting:
+            if waiting is ticket:
+                self._waiting.remove(waiting)
+                break
+
+    @contextmanager
+    def slot(self, session_id, timeout=None):
+        """``with queue.slot(sid) as ticket:`` enqueue, wait, and always release.
+
+        Raises:
+            QueueFull: rejected, or not admitted within ``timeout``.
+        """
+        ticket = self.enqueue(session_id)
+        try:
+            if not self.wait(ticket, timeout=timeout):
+                with self._cond:
+                    self.rejected += 1
+                raise QueueFull("Timed out waiting for the model", status=503)
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self):
+        """Queue depth, in-flight count and average wait/service seconds."""
+        with self._cond:
+            done = max(self.admitted - self._in_flight, 0)
+            return {
+                "name": self.name,
+                "waiting": len(self._waiting),
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+                "max_queue": self.max_queue,
+                "host_wide": bool(self.slot_dir),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "avg_wait_s": round(self.total_wait / self.admitted, 3) if self.admitted else 0.0,
+                "avg_service_s": round(self.total_service / done, 3) if done else 0.0,
+            }
@@ -1,4 +1,7 @@
 // ========== WANG LAB CHATBOT + ROI MIRROR + REALISTIC EFFECTS ==========
+// Thumbnails are shown at 80px; request 2x for high-DPI screens
+const THUMB_SIZE = 160;
+
 function waitForChatElements() {
   const sendBtn = document.getElementById("sendBtn");
   const chatInput = document.getElementById("chatInput");
@@ -53,7 +56,8 @@ function waitForChatElements() {
 
       imagePaths.forEach((path) => {
         const img = document.createElement("img");
-        img.src = `/preview?path=${encodeURIComponent(path)}`;
+        const fullURL = `/preview?path=${encodeURIComponent(path)}`;
+        img.src = `${fullURL}&size=${THUMB_SIZE}`;
         console.log("🧩 ROI preview URL:", img.src);
         img.alt = "ROI preview";
         img.style.width = "80px";
@@ -63,7 +67,7 @@ function waitForChatElements() {
         img.style.border = "1px solid #ccc";
         img.style.cursor = "pointer";
         img.title = path;
-        img.onclick = () => window.open(img.src, "_blank");
+        img.onclick = () => window.open(fullURL, "_blank");
         thumbContainer.appendChild(img);
       });
 
@@ -92,20 +96,44 @@ function waitForChatElements() {
     return [];
   }
 
-  // 🎬 Typing effect
-  function typeText(el, text, delay = 25) {
-    return new Promise((resolve) => {
-      let i = 0;
-      const typer = setInterval(() => {
-        el.textContent += text.charAt(i);
-        i++;
-        chatMessages.scrollTop = chatMessages.scrollHeight;
-        if (i >= text.length) {
-          clearInterval(typer);
-          resolve();
+  // 📶 Read Server-Sent Events from /api/chat/stream
+  async function readStream(response, onToken, onQueue) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let fullText = "";
+    let cached = false;
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      const events = buffer.split("\n\n");
+      buffer = events.pop();
+      for (const raw of events) {
+        let event = "message";
+        let data = "";
+        raw.split("\n").forEach((line) => {
+          if (line.startsWith("event: ")) event = line.slice(7);
+          else if (line.startsWith("data: ")) data += line.slice(6);
+        });
+        if (!data) continue;
+
+        const parsed = JSON.parse(data);
+        if (event === "error") throw new Error(parsed.error);
+        if (event === "queue") {
+          if (onQueue) onQueue(parsed.position);
+        } else if (event === "done") {
+          fullText = parsed.response;
+          cached = Boolean(parsed.cached);
+        } else if (parsed.token) {
+          fullText += parsed.token;
+          onToken(parsed.token);
         }
-      }, delay);
-    });
+      }
+    }
+    return { text: fullText, cached };
   }
 
   // ⚙️ AI response handler
@@ -140,26 +168,53 @@ function waitForChatElements() {
         session_id: sessionId,
       };
 
-      console.log("📡 Sending payload → /api/chat", payload);
-      const response = await fetch("/api/chat", {
+      console.log("📡 Sending payload → /api/chat/stream", payload);
+      const response = await fetch("/api/chat/stream", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify(payload),
       });
 
-      if (!response.ok) throw new Error("Chat API failed");
-      const data = await response.json();
+      if (response.status === 429 || response.status === 503) {
+        // rejected by the model queue: show why instead of a fake reply
+        const data = await response.json();
+        clearInterval(typingAnim);
+        dots.remove();
+        thinking.textContent = `AI: ⏳ ${data.error || "Model is busy, please try again."}`;
+        return;
+      }
+      if (!response.ok || !response.body) throw new Error("Chat API failed");
+
+      // Render tokens as they arrive; the dots run until the first one
+      const { text: replyText, cached } = await readStream(response, (token) => {
+        if (typingAnim) {
+          clearInterval(typingAnim);
+          typingAnim = null;
+          dots.remove();
+        }
+        if (thinking.dataset.queued) {
+          delete thinking.dataset.queued;
+          thinking.textContent = "AI: ";
+        }
+        thinking.textContent += token;
+        chatMessages.scrollTop = chatMessages.scrollHeight;
+      }, (position) => {
+        // waiting for a model slot
+        thinking.dataset.queued = "1";
+        thinking.firstChild.textContent = `AI (queued, position ${position}) `;
+      });
 
-      // Stop typing
       clearInterval(typingAnim);
       dots.remove();
-
-      // Simulate realistic pause
-      await new Promise((r) => setTimeout(r, 500 + Math.random() * 800));
-
-      const replyText = data.response || "(no response)";
-      thinking.textContent = "AI: ";
-      await typeText(thinking, replyText, 20);
+      if (!replyText) thinking.textContent = "AI: (no response)";
+      if (cached) {
+        // answered from the server's response cache, not a new generation
+        const badge = document.createElement("span");
+        badge.classList.add("cached-badge");
+        badge.textContent = "cached";
+        badge.title = "Same question on the same region was answered before";
+        thinking.appendChild(badge);
+      }
 
       // 🩻 ROI previews
       if (roiPaths.length > 0) {
@@ -172,7 +227,8 @@ function waitForChatElements() {
 
         roiPaths.forEach((path) => {
           const img = document.createElement("img");
-          img.src = `/preview?path=${encodeURIComponent(path)}`;
+          const fullURL = `/preview?path=${encodeURIComponent(path)}`;
+          img.src = `${fullURL}&size=${THUMB_SIZE}`;
           img.alt = "ROI preview";
           img.style.width = "80px";
           img.style.height = "80px";
@@ -180,7 +236,7 @@ function waitForChatElements() {
           img.style.borderRadius = "8px";
           img.style.border = "1px solid #ccc";
           img.style.cursor = "pointer";
-          img.onclick = () => window.open(img.src, "_blank");
+          img.onclick = () => window.open(fullURL, "_blank");
           thumbContainer.appendChild(img);
         });
         thinking.appendChild(thumbContainer);
@@ -192,10 +248,11 @@ function waitForChatElements() {
       clearInterval(typingAnim);
       dots.remove();
 
-      const fallback = document.createElement("div");
-      fallback.classList.add("chat-message", "ai");
-      fallback.textContent = `AI (Mock): Offline. Echo → "${userText}"`;
-      chatMessages.appendChild(fallback);
+      // the turn was not saved, so the question can simply be sent again
+      const failure = document.createElement("div");
+      failure.classList.add("chat-message", "ai");
+      failure.textContent = `AI: ⚠️ ${err.message}`;
+      chatMessages.appendChild(failure);
     }
   }
 
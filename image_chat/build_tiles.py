@@ -0,0 +1,143 @@
+"""Build Cloud-Optimized GeoTIFFs for every sample in the database.
+
+Usage:
+    python build_tiles.py                 # all samples, incremental
+    python build_tiles.py TCGA-XX-XXXX    # only these samples
+    python build_tiles.py --force -j 8
+    python build_tiles.py -j 2 --threads 16   # few large samples
+
+For each ``raster_resized*.tif`` a sibling ``*.cog.tif`` is written with
+internal 256px tiling and overviews, so the tile server reads one small tile
+per request at every zoom level. Inputs whose size and mtime match the last
+build (recorded in ``.cog_build.json`` in the sample folder) are skipped.
+The CPUs are split between worker processes and GDAL's threads in each, so
+``workers * threads`` never exceeds the machine.
+The viewer picks the COG up automatically, see ``tile_server.raster_path``.
+"""
+import os
+import json
+import glob
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import rasterio
+from rasterio.shutil import copy as rio_copy
+
+from tile_server import DATABASE_DIR, LAYER_FILES, cog_path
+
+BUILD_MANIFEST = ".cog_build.json"
+
+# overlays hold class colours, so overviews must not blend them
+OVERVIEW_RESAMPLING = {
+    "base": "AVERAGE",
+    "overlay": "NEAREST",
+}
+
+
+def _load_manifest(sample_dir):
+    try:
+        with open(os.path.join(sample_dir, BUILD_MANIFEST), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(sample_dir, manifest):
+    path = os.path.join(sample_dir, BUILD_MANIFEST)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def build_sample(sample_dir, force=False, compress="DEFLATE", threads=1):
+    """Write COGs for the layers of one sample that changed since the last build.
+
+    Args:
+        sample_dir (str): sample folder.
+        force (bool): rebuild even if inputs are unchanged.
+        compress (str): GDAL COG compression.
+        threads (int): GDAL threads for compression and overviews.
+
+    Returns:
+        tuple[str, list[str]]: sample folder and the layers that were built.
+    """
+    manifest = _load_manifest(sample_dir)
+    built = []
+    for layer, file_name in LAYER_FILES.items():
+        src = os.path.join(sample_dir, file_name)
+        if not os.path.exists(src):
+            continue
+        dst = cog_path(src)
+        stat = os.stat(src)
+        signature = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "compress": compress}
+        if not force and manifest.get(layer) == signature and os.path.exists(dst):
+            continue
+
+        tmp = f"{dst}.tmp.tif"
+        try:
+            with rasterio.Env(GDAL_NUM_THREADS=str(threads)):
+                rio_copy(
+                    src,
+                    tmp,
+                    driver="COG",
+                    BLOCKSIZE=256,
+                    COMPRESS=compress,
+                    PREDICTOR="YES",
+                    OVERVIEWS="AUTO",
+                    OVERVIEW_RESAMPLING=OVERVIEW_RESAMPLING[layer],
+                    BIGTIFF="IF_SAFER",
+                )
+            os.replace(tmp, dst)
+        finally:
+            # a failed or interrupted copy must not leave a partial file behind
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        manifest[layer] = signature
+        built.append(layer)
+
+    if built:
+        _write_manifest(sample_dir, manifest)
+    return sample_dir, built
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("samples", nargs="*", help="sample names (default: all)")
+    parser.add_argument("--root", default=DATABASE_DIR, help="database folder")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads", type=int, help="GDAL threads per worker (default: CPUs / workers)")
+    parser.add_argument("--force", action="store_true", help="rebuild unchanged samples")
+    parser.add_argument("--compress", default="DEFLATE", help="COG compression (DEFLATE, ZSTD, LZW...)")
+    args = parser.parse_args()
+
+    if args.samples:
+        sample_dirs = [os.path.join(args.root, s) for s in args.samples]
+    else:
+        sample_dirs = sorted(d for d in glob.glob(os.path.join(args.root, "*")) if os.path.isdir(d))
+    threads = args.threads or max(1, (os.cpu_count() or 1) // args.workers)
+    print(f"🧱 Building COGs for {len(sample_dirs)} sample(s) with {args.workers} worker(s) x {threads} thread(s)")
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {
+            pool.submit(build_sample, d, args.force, args.compress, threads): d for d in sample_dirs
+        }
+        for future in as_completed(futures):
+            sample = os.path.basename(futures[future])
+            try:
+                _, built = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"❌ {sample}: {e}")
+                continue
+            if built:
+                print(f"✅ {sample}: built {', '.join(built)}")
+            else:
+                print(f"♻️ {sample}: up to date")
+
+    print(f"🏁 Done ({failed} failed)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
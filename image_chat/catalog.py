@@ -0,0 +1,205 @@
+"""Local snapshot of the dataset catalog (the lab's published Google Sheet).
+
+Usage:
+    python catalog.py                     # download the sheet into the snapshot
+    python catalog.py --csv catalog.csv   # import an exported CSV (offline)
+
+The landing page queries the snapshot through ``/api/catalog`` instead of
+downloading and filtering the whole sheet in the browser. Rows are stored in
+SQLite with indexed filter columns; a refresh builds a new database next to
+the old one and swaps it in atomically, so readers never see a partial
+catalog and a failed download keeps the previous snapshot.
+"""
+import os
+import io
+import csv
+import json
+import time
+import sqlite3
+import argparse
+import urllib.request
+from contextlib import closing
+
+SHEET_CSV_URL = (
+    "https://docs.google.com/spreadsheets/d/e/2PACX-1vS6BxRrR8H56sDOg9LZA8WGVrQlbVg6vRMxtWgqG1Yo4W3IwgWHS7n6ajB4FNIKyHRwqZXjF9w7hdiN/pub?gid=0&single=true&output=csv"
+)
+CATALOG_DB = os.environ.get("CATALOG_DB", "./catalog/catalog.sqlite3")
+
+# filter name in the API -> sheet column
+FILTER_COLUMNS = {
+    "technology": "technology",
+    "tissue": "general tissue",
+    "species": "species",
+    "status": "cancer or normal or other disease",
+}
+
+MAX_PER_PAGE = 200
+
+
+def _normalize(row):
+    """Strip header whitespace and the UTF-8 BOM, like the old landing page did."""
+    return {(k or "").strip().replace("\ufeff", ""): (v or "").strip() for k, v in row.items()}
+
+
+def parse_csv(text):
+    """Catalog rows of a sheet CSV export (rows without a dataset are skipped)."""
+    rows = [_normalize(row) for row in csv.DictReader(io.StringIO(text))]
+    return [row for row in rows if row.get("dataset_name") or row.get("adata_filename")]
+
+
+def fetch_sheet(url=SHEET_CSV_URL, timeout=30):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.read().decode("utf-8-sig")
+
+
+def write_snapshot(rows, path=CATALOG_DB, source=""):
+    """Replace the snapshot with ``rows``.
+
+    Returns:
+        int: number of rows written.
+    """
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    db = sqlite3.connect(tmp)
+    try:
+        db.execute(
+            "CREATE TABLE datasets ("
+            " id INTEGER PRIMARY KEY,"
+            " technology TEXT, tissue TEXT, species TEXT, status TEXT,"
+            " search TEXT NOT NULL,"
+            " row TEXT NOT NULL)"
+        )
+        for name in FILTER_COLUMNS:
+            db.execute(f"CREATE INDEX datasets_{name} ON datasets ({name})")
+        db.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        db.executemany(
+            "INSERT INTO datasets (technology, tissue, species, status, search, row)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    *(row.get(column, "") for column in FILTER_COLUMNS.values()),
+                    " ".join(row.values()).lower(),
+                    json.dumps(row),
+                )
+                for row in rows
+            ],
+        )
+        db.executemany(
+            "INSERT INTO meta (key, value) VALUES (?, ?)",
+            [("updated", str(time.time())), ("source", source), ("rows", str(len(rows)))],
+        )
+        db.commit()
+    finally:
+        db.close()
+    os.replace(tmp, path)
+    return len(rows)
+
+
+def refresh_catalog(url=SHEET_CSV_URL, csv_path=None, path=CATALOG_DB):
+    """Rebuild the snapshot from the published sheet or a local CSV file."""
+    if csv_path:
+        with open(csv_path, "r", encoding="utf-8-sig") as f:
+            text = f.read()
+        source = os.path.abspath(csv_path)
+    else:
+        text = fetch_sheet(url)
+        source = url
+    return write_snapshot(parse_csv(text), path, source)
+
+
+class Catalog:
+    """Read-only queries against the catalog snapshot.
+
+    Args:
+        path (str): SQLite snapshot.
+    """
+
+    def __init__(self, path=CATALOG_DB):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def _connect(self):
+        # a new connection per query also picks up a swapped-in snapshot
+        return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=10)
+
+    @staticmethod
+    def _where(filters, q):
+        clauses, params = [], []
+        for name, values in filters.items():
+            values = [v for v in values or [] if v]
+            if name in FILTER_COLUMNS and values:
+                clauses.append(f"{name} IN ({', '.join('?' * len(values))})")
+                params += values
+        if q:
+            clauses.append("search LIKE ? ESCAPE '\\'")
+            escaped = q.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{escaped}%")
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, filters=None, q="", page=1, per_page=50):
+        """One page of datasets matching the filters, in sheet order.
+
+        Args:
+            filters (dict): filter name (``FILTER_COLUMNS``) -> accepted values.
+            q (str): case-insensitive substring searched in every column.
+            page (int): 1-based page number.
+            per_page (int): rows per page (at most ``MAX_PER_PAGE``).
+
+        Returns:
+            dict: {"rows", "total", "page", "per_page", "pages"}.
+        """
+        per_page = max(1, min(int(per_page), MAX_PER_PAGE))
+        page = max(1, int(page))
+        where, params = self._where(filters or {}, q)
+        with closing(self._connect()) as db, db:
+            total = db.execute(f"SELECT COUNT(*) FROM datasets{where}", params).fetchone()[0]
+            rows = db.execute(
+                f"SELECT row FROM datasets{where} ORDER BY id LIMIT ? OFFSET ?",
+                params + [per_page, (page - 1) * per_page],
+            ).fetchall()
+        return {
+            "rows": [json.loads(r[0]) for r in rows],
+            "total": total,
+            "page": page,
+            "per_page": per_page,
+            "pages": max(1, -(-total // per_page)),
+        }
+
+    def facets(self):
+        """Distinct values of each filter column, in order of first appearance."""
+        with closing(self._connect()) as db, db:
+            return {
+                name: [
+                    r[0] for r in db.execute(
+                        f"SELECT {name} FROM datasets WHERE {name} != ''"
+                        f" GROUP BY {name} ORDER BY MIN(id)"
+                    )
+                ]
+                for name in FILTER_COLUMNS
+            }
+
+    def info(self):
+        with closing(self._connect()) as db, db:
+            return dict(db.execute("SELECT key, value FROM meta").fetchall())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=SHEET_CSV_URL, help="published sheet CSV URL")
+    parser.add_argument("--csv", help="import this CSV file instead of downloading")
+    parser.add_argument("--db", default=CATALOG_DB, help="snapshot file")
+    args = parser.parse_args()
+
+    print(f"📚 Refreshing catalog snapshot {args.db}")
+    count = refresh_catalog(args.url, args.csv, args.db)
+    print(f"✅ {count} dataset(s) in the catalog")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,167 @@
+import os
+import json
+import threading
+from collections import OrderedDict
+
+from file_lock import shared_lock
+
+
+class ChatStore:
+    """Append-only chat history, one JSONL file per session.
+
+    Each turn appends its messages as lines (flushed and fsynced), so a turn
+    costs O(1) I/O no matter how long the session is. Recently used sessions
+    stay in memory and are re-read when another process has appended to them.
+    A per-session lock (thread and file lock, the file under
+    ``APP_STATE_DIR``) keeps concurrent requests for the same session from
+    interleaving, also across worker processes. Legacy ``<sid>.json`` files
+    (whole-list rewrites) are migrated the first time they are touched.
+
+    Args:
+        root (str): history folder.
+        max_cached_sessions (int): sessions kept in memory.
+    """
+
+    def __init__(self, root, max_cached_sessions=256):
+        self.root = root
+        self.max_cached_sessions = max_cached_sessions
+        os.makedirs(root, exist_ok=True)
+        self._cache = OrderedDict()  # sid -> (file signature, list of messages)
+        self._guard = threading.Lock()
+
+    def _path(self, session_id):
+        return os.path.join(self.root, f"{session_id}.jsonl")
+
+    def _legacy_path(self, session_id):
+        return os.path.join(self.root, f"{session_id}.json")
+
+    def lock(self, session_id):
+        """Per-session re-entrant lock; hold it across a whole chat turn."""
+        return shared_lock("chat", os.path.join(os.path.abspath(self.root), session_id))
+
+    def _signature(self, session_id):
+        try:
+            stat = os.stat(self._path(session_id))
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _remember(self, session_id, messages):
+        with self._guard:
+            self._cache[session_id] = (self._signature(session_id), messages)
+            self._cache.move_to_end(session_id)
+            while len(self._cache) > self.max_cached_sessions:
+                self._cache.popitem(last=False)
+
+    def _read(self, session_id):
+        self._migrate(session_id)
+        messages = []
+        path = self._path(session_id)
+        if not os.path.exists(path):
+            return messages
+        with open(path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    messages.append(json.loads(line))
+                except ValueError:
+                    # a torn last line from a crash mid-append
+                    print(f"⚠️ Skipping corrupt history line for {session_id}")
+        return messages
+
+    def load(self, session_id):
+        """Return a copy of the session's messages (safe to modify)."""
+        with self.lock(session_id):
+            signature = self._signature(session_id)
+            with self._guard:
+                cached = None
+                entry = self._cache.get(session_id)
+                if entry is not None and entry[0] == signature:
+                    cached = entry[1]
+                    self._cache.move_to_end(session_id)
+            if cached is None:
+                cached = self._read(session_id)
+                self._remember(session_id, cached)
+            return [dict(m) for m in cached]
+
+    def append(self, session_id, messages):
+        """Durably append messages to the session."""
+        if not messages:
+            return
+        with self.lock(session_id):
+            current = self.load(session_id)
+            data = "".join(json.dumps(m) + "\n" for m in messages)
+            with open(self._path(session_id), "a") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            self._remember(session_id, current + [dict(m) for m in messages])
+
+    def _summary_path(self, session_id):
+        return os.path.join(self.root, f"{session_id}.summary.json")
+
+    def load_summary(self, session_id):
+        """Rolling summary of the session's older turns.
+
+        Returns:
+            dict: {"content": str, "covers": number of leading messages
+            folded into the summary}; empty content if there is none.
+        """
+        try:
+            with open(self._summary_path(session_id), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"content": "", "covers": 0}
+
+    def save_summary(self, session_id, content, covers):
+        """Replace the session's rolling summary."""
+        path = self._summary_path(session_id)
+        with self.lock(session_id):
+            with open(f"{path}.tmp", "w") as f:
+                json.dump({"content": content, "covers": covers}, f)
+            os.replace(f"{path}.tmp", path)
+
+    def reset(self, session_id):
+        """Delete the session's history. Returns True if anything was removed."""
+        with self.lock(session_id):
+            removed = False
+            paths = (self._path(session_id), self._legacy_path(session_id), self._summary_path(session_id))
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+                    removed = True
+            with self._guard:
+                self._cache.pop(session_id, None)
+            return removed
+
+    def _migrate(self, session_id):
+        legacy = self._legacy_path(session_id)
+        if not os.path.exists(legacy):
+            return
+        try:
+            with open(legacy, "r") as f:
+                messages = json.load(f)
+        except Exception as e:
+            print(f"⚠️ Failed to migrate history for {session_id}: {e}")
+            return
+        tmp = f"{self._path(session_id)}.tmp"
+        with open(tmp, "w") as f:
+            f.write("".join(json.dumps(m) + "\n" for m in messages))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._path(session_id))
+        os.remove(legacy)
+        print(f"📦 Migrated {session_id}.json → {session_id}.jsonl ({len(messages)} messages)")
+
+    def migrate_all(self):
+        """Convert every legacy ``.json`` history in ``root`` to JSONL."""
+        count = 0
+        for name in os.listdir(self.root):
+            if name.endswith(".json") and not name.endswith(".summary.json"):
+                session_id = name[: -len(".json")]
+                with self.lock(session_id):
+                    self._migrate(session_id)
+                count += 1
+        return count
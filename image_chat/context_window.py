@@ -0,0 +1,117 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "8000"))
+CONTEXT_MAX_TURNS = int(os.environ.get("CONTEXT_MAX_TURNS", "12"))
+# an attached ROI costs about max_pixels / (28 * 28) tokens on Qwen2.5-VL
+IMAGE_TOKENS = int(os.environ.get("CONTEXT_IMAGE_TOKENS", "1280"))
+# messages that must have left the window before the summary is updated
+SUMMARY_BATCH = int(os.environ.get("CONTEXT_SUMMARY_BATCH", "6"))
+# batches the summary may lag behind before the oldest unsummarized
+# messages are dropped from the prompt
+SUMMARY_MAX_LAG_BATCHES = int(os.environ.get("CONTEXT_SUMMARY_MAX_LAG_BATCHES", "3"))
+
+
+def estimate_tokens(message):
+    """Rough token count of a chat message (~4 characters per token)."""
+    text = message.get("content") or ""
+    return 4 + len(text) // 4 + IMAGE_TOKENS * len(message.get("images") or [])
+
+
+class HistoryWindow:
+    """Token-budgeted view of a chat session for the model.
+
+    The newest messages are sent verbatim, up to ``max_turns`` messages and
+    ``token_budget`` estimated tokens (the current message is always kept).
+    Everything older is represented by a rolling summary that is generated
+    in the background once ``summary_batch`` messages have left the window,
+    and stored next to the history, so prompt size, and therefore prefill
+    time, stays flat as a session grows. Messages the summary does not cover
+    yet (it lags or is pending) are sent verbatim, but at most
+    ``max_lag_batches * summary_batch`` of them beyond the window: if
+    summaries keep failing, the oldest of those are dropped so the prompt
+    stays bounded.
+
+    Args:
+        store (ChatStore): history store (provides summary persistence).
+        summarize (callable): ``summarize(previous_summary, messages) -> str``
+            producing the new summary text; runs on a background thread.
+        token_budget (int): token budget for verbatim messages.
+        max_turns (int): maximum verbatim messages.
+        summary_batch (int): messages folded into the summary at a time.
+        max_lag_batches (int): summary batches sent verbatim at most while
+            the summary lags behind.
+    """
+
+    def __init__(self, store, summarize, token_budget=CONTEXT_TOKEN_BUDGET, max_turns=CONTEXT_MAX_TURNS,
+                 summary_batch=SUMMARY_BATCH, max_lag_batches=SUMMARY_MAX_LAG_BATCHES):
+        self.store = store
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.max_turns = max_turns
+        self.summary_batch = summary_batch
+        self.max_lag = max_lag_batches * summary_batch
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-summary")
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def window_start(self, history):
+        """Index of the first message sent verbatim."""
+        used = 0
+        start = len(history)
+        for i in range(len(history) - 1, -1, -1):
+            cost = estimate_tokens(history[i])
+            kept = len(history) - i
+            if kept > 1 and (kept > self.max_turns or used + cost > self.token_budget):
+                break
+            used += cost
+            start = i
+        return start
+
+    def build(self, session_id, history):
+        """Messages to send to the model for ``history`` (current message last)."""
+        window = self.window_start(history)
+        summary = self.store.load_summary(session_id) if window else {}
+        covers = min(summary.get("covers", 0), window) if summary.get("content") else 0
+        # messages the summary does not cover yet go verbatim, up to max_lag
+        start = max(covers, window - self.max_lag)
+        messages = history[start:]
+        if covers:
+            messages = [{
+                "role": "system",
+                "content": "Summary of the earlier conversation:\n" + summary["content"],
+            }] + messages
+        if start > covers:
+            print(f"⚠️ Summary for {session_id} lags: dropped {start - covers} unsummarized message(s)")
+        print(f"🪟 Context for {session_id}: {len(messages)} message(s), {covers} folded into summary")
+        return messages
+
+    def schedule_summary(self, session_id):
+        """Fold messages that left the window into the summary, asynchronously."""
+        with self._lock:
+            if session_id in self._pending:
+                return
+            self._pending.add(session_id)
+        self._pool.submit(self._update_summary, session_id)
+
+    def _update_summary(self, session_id):
+        try:
+            history = self.store.load(session_id)
+            start = self.window_start(history)
+            summary = self.store.load_summary(session_id)
+            covers = summary.get("covers", 0)
+            if start - covers < self.summary_batch:
+                return
+            folded = [
+                {"role": m.get("role"), "content": m.get("content", "")}
+                for m in history[covers:start]
+            ]
+            content = self.summarize(summary.get("content", ""), folded)
+            self.store.save_summary(session_id, content, start)
+            print(f"📝 Summarized {start - covers} message(s) for {session_id}")
+        except Exception as e:
+            print(f"⚠️ History summary failed for {session_id}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(session_id)
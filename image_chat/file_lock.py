@@ -0,0 +1,201 @@
+import os
+import time
+import fcntl
+import hashlib
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+
+# Lock and slot files shared by all worker processes on this host. Keep it on
+# local disk: flock is unreliable on NFS.
+APP_STATE_DIR = os.environ.get(
+    "APP_STATE_DIR", os.path.join(tempfile.gettempdir(), f"image_chat_{os.getuid()}")
+)
+# recently used locks kept per process (see shared_lock)
+LOCK_CACHE_SIZE = int(os.environ.get("FILE_LOCK_CACHE_SIZE", "256"))
+# lock files unused this long are deleted (see prune_lock_files)
+LOCK_MAX_AGE_SECONDS = int(os.environ.get("FILE_LOCK_MAX_AGE_SECONDS", "86400"))
+LOCK_PRUNE_SECONDS = 600
+
+_shared_locks = weakref.WeakValueDictionary()  # path -> FileLock still referenced
+_recent_locks = OrderedDict()  # path -> FileLock, LRU order
+_shared_guard = threading.Lock()
+_last_prune = 0.0
+_prune_lock = threading.Lock()
+
+
+def lock_path(kind, key):
+    """Lock file for ``key`` (e.g. a folder or session) under ``APP_STATE_DIR``.
+
+    Named by a hash of ``key``, so locks for data on network storage still
+    live on local disk.
+
+    Args:
+        kind (str): subfolder, e.g. "roi" or "chat".
+        key (str): what the lock protects.
+
+    Returns:
+        str: path of the lock file (its folder is created).
+    """
+    folder = os.path.join(APP_STATE_DIR, "locks", kind)
+    os.makedirs(folder, exist_ok=True)
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+    return os.path.join(folder, f"{digest}.lock")
+
+
+class FileLock:
+    """Re-entrant lock shared by threads and by worker processes.
+
+    A thread-level ``RLock`` serializes threads of this process; the
+    outermost acquire additionally takes an exclusive ``flock`` on
+    ``path``, so other processes on the host (e.g. gunicorn workers) wait
+    too. flock locks are released by the kernel if a process dies. Lock
+    files are touched on every acquire, so ``prune_lock_files`` can delete
+    unused ones; an acquire that lands on a file deleted meanwhile retries
+    on the new one.
+
+    Args:
+        path (str): lock file, created if missing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._rlock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def acquire(self):
+        self._rlock.acquire()
+        if self._depth == 0:
+            try:
+                fd = self._lock_file()
+            except BaseException:
+                self._rlock.release()
+                raise
+            self._fd = fd
+        self._depth += 1
+
+    def _lock_file(self):
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                if _same_file(fd, self.path):
+                    os.utime(fd)
+                    return fd
+            except BaseException:
+                os.close(fd)
+                raise
+            # pruned while we waited: lock the file that replaced it
+            os.close(fd)
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            fd, self._fd = self._fd, None
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+        self._rlock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def _same_file(fd, path):
+    try:
+        return os.fstat(fd).st_ino == os.stat(path).st_ino
+    except FileNotFoundError:
+        return False
+
+
+def shared_lock(kind, key):
+    """The process-wide ``FileLock`` of ``key`` (see ``lock_path``).
+
+    Every caller gets the same object while any of them still references
+    it, so re-entrant use within a thread works. Only the
+    ``LOCK_CACHE_SIZE`` most recently used locks are kept beyond that, so
+    one lock per session does not pile up in memory.
+
+    Returns:
+        FileLock: lock for ``key``.
+    """
+    path = lock_path(kind, key)
+    with _shared_guard:
+        lock = _shared_locks.get(path)
+        if lock is None:
+            lock = _shared_locks[path] = FileLock(path)
+        _recent_locks[path] = lock
+        _recent_locks.move_to_end(path)
+        while len(_recent_locks) > LOCK_CACHE_SIZE:
+            _recent_locks.popitem(last=False)
+    maybe_prune_lock_files()
+    return lock
+
+
+def maybe_prune_lock_files():
+    """Run ``prune_lock_files`` at most every ``LOCK_PRUNE_SECONDS``."""
+    global _last_prune
+    with _prune_lock:
+        if time.monotonic() - _last_prune < LOCK_PRUNE_SECONDS:
+            return
+        _last_prune = time.monotonic()
+    prune_lock_files()
+
+
+def prune_lock_files(max_age=None):
+    """Delete lock files under ``APP_STATE_DIR`` not acquired for ``max_age`` seconds.
+
+    A file is only deleted while holding its flock, so no current holder
+    is affected; waiters move on to a fresh file (see ``FileLock``).
+
+    Args:
+        max_age (float, optional): ``LOCK_MAX_AGE_SECONDS`` by default.
+
+    Returns:
+        int: number of lock files removed.
+    """
+    max_age = LOCK_MAX_AGE_SECONDS if max_age is None else max_age
+    root = os.path.join(APP_STATE_DIR, "locks")
+    cutoff = time.time() - max_age
+    removed = 0
+    for folder, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(folder, name)
+            try:
+                if not name.endswith(".lock") or os.stat(path).st_mtime >= cutoff:
+                    continue
+            except OSError:
+                continue
+            fd = try_flock(path)
+            if fd is None:
+                continue  # in use
+            try:
+                if _same_file(fd, path):
+                    os.remove(path)
+                    removed += 1
+            finally:
+                os.close(fd)
+    if removed:
+        print(f"🧹 Pruned {removed} unused lock file(s)")
+    return removed
+
+
+def try_flock(path):
+    """Take an exclusive ``flock`` on ``path`` without blocking.
+
+    Returns:
+        int or None: open file descriptor holding the lock (close it to
+        release), or None if another process holds it.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
@@ -0,0 +1,41 @@
+"""gunicorn settings for ``wsgi:application`` (see run_website.sh, SERVER_MODE=prod).
+
+Run from the repository root so relative data folders (chat_sessions, ...)
+resolve like they do for ``python image_chat/image_chat_app.py``.
+"""
+import os
+import multiprocessing
+
+pythonpath = os.path.dirname(os.path.abspath(__file__))
+bind = f"0.0.0.0:{os.environ.get('DASH_PORT', '8050')}"
+
+# threads keep long model calls and SSE streams from blocking a worker
+worker_class = "gthread"
+workers = int(os.environ.get("WEB_WORKERS", str(min(multiprocessing.cpu_count(), 8))))
+threads = int(os.environ.get("WEB_THREADS", "8"))
+
+# 72B generations can take minutes
+timeout = int(os.environ.get("WEB_TIMEOUT", "600"))
+graceful_timeout = 30
+keepalive = 5
+
+# import the app in each worker: module-level pools and threads don't survive fork
+preload_app = False
+
+accesslog = "-"
+errorlog = "-"
+
+if os.environ.get("TILE_BACKEND") == "localtileserver" and workers > 1:
+    # the TileClient registry lives in one process only
+    print("⚠️ TILE_BACKEND=localtileserver needs a single worker; using workers=1")
+    workers = 1
+
+# In-memory caches are per worker: split these host-wide totals (MB) between
+# the workers unless a budget is set explicitly. Workers inherit the env.
+CACHE_BUDGETS_MB = {
+    "TILE_CACHE_MB": 1024,
+    "ROI_IMAGE_CACHE_MB": 1024,
+    "IMAGE_PAYLOAD_CACHE_MB": 512,
+}
+for var, total in CACHE_BUDGETS_MB.items():
+    os.environ.setdefault(var, str(max(total // workers, 32)))
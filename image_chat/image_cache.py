@@ -0,0 +1,142 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+def _nbytes(value):
+    """Best-effort size of a cached value in bytes."""
+    nbytes = getattr(value, "nbytes", None)
+    if nbytes is not None:
+        return int(nbytes)
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    return 0
+
+
+class ByteLRUCache:
+    """Thread-safe LRU cache bounded by the total size of its values.
+
+    Values are shared between callers (and therefore between Dash sessions),
+    so NumPy arrays are stored read-only. Concurrent misses on the same key
+    are collapsed into a single load.
+
+    Args:
+        max_bytes (int): memory cap for all entries.
+        name (str, optional): label used in log lines.
+    """
+
+    def __init__(self, max_bytes, name="cache"):
+        self.max_bytes = int(max_bytes)
+        self.name = name
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._loading = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached value for ``key`` or None, updating recency."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """Insert a value, evicting least recently used entries to fit.
+
+        Values larger than the whole cache are not stored.
+        """
+        size = _nbytes(value)
+        if size > self.max_bytes:
+            return value
+        if hasattr(value, "flags"):
+            value.flags.writeable = False
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                old_key, (_, old_size) = self._entries.popitem(last=False)
+                self._bytes -= old_size
+                self.evictions += 1
+                print(f"♻️ [{self.name}] Evicted {old_key}")
+        return value
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for ``key``, calling ``loader()`` on a miss.
+
+        Only one thread runs the loader for a given key; others wait for it
+        and share the result.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            event = self._loading.get(key)
+            owner = event is None
+            if owner:
+                event = self._loading[key] = threading.Event()
+
+        if not owner:
+            event.wait()
+            value = self.peek(key)
+            if value is not None:
+                return value
+            return loader()
+
+        try:
+            value = loader()
+            if value is not None:
+                self.put(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+            event.set()
+
+    def peek(self, key):
+        """Return the cached value without touching counters or recency."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[0] if entry else None
+
+    def discard(self, key):
+        """Drop ``key`` from the cache if present."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry:
+                self._bytes -= entry[1]
+
+    def clear(self):
+        """Drop all entries (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Return hit/miss/eviction counters and current usage."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "name": self.name,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            }
+
+
+def file_key(path):
+    """Cache key for a file: (absolute path, mtime in ns)."""
+    path = os.path.abspath(path)
+    return path, os.stat(path).st_mtime_ns
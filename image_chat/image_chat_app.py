@@ -1,18 +1,61 @@
 import os
 import random
 import json
-import glob
 import uuid
+import mimetypes
+import threading
+import time
 import dash
-import ollama
-from flask import request, jsonify, send_file
+from flask import Response, request, jsonify, send_file, stream_with_context
 from urllib.parse import urlparse, parse_qs
 from dash import html, dcc, Input, Output, State
-from localtileserver import TileClient, get_leaflet_tile_layer
-from leaflet import create_leaflet_map
-from roi_extract import save_roi
+from localtileserver import get_leaflet_tile_layer
+from leaflet import MAP_CACHE_STATS, create_leaflet_map, get_default_zoom
+from tile_server import TileSource, tiles_bp, warm_sample, prefetch_viewport
+from tile_clients import (
+    attach_tile_session, get_or_create_tile_client, start_janitor as start_tile_janitor,
+    tile_client_stats, touch_tile_session,
+)
+from admission import AdmissionQueue, QueueFull
+from file_lock import APP_STATE_DIR
+from chat_store import ChatStore
+from image_payloads import PAYLOAD_CACHE, with_encoded_images
+from response_cache import ResponseCache, response_key
+from sample_index import SAMPLE_INDEX, LAYER_TYPES
+from catalog import Catalog, FILTER_COLUMNS, refresh_catalog
+from roi_stats import roi_stats, format_stats
+from roi_jobs import JobQueue
+from raster_pool import RASTER_POOL
+from context_window import HistoryWindow
+from ollama_pool import get_ollama_client
+from thumbnails import get_thumbnail, file_etag
+from roi_extract import save_roi, clear_rois, REAL_IMAGE_CACHE
+from sse import sse_event
 import urllib.parse
 
+# ----------------------------------------------------------------------------
+# Model settings
+# ----------------------------------------------------------------------------
+DEFAULT_MODEL = "qwen2.5vl:72b"
+
+# Largest ROI (width * height) worth sending to each vision model; the model
+# downsamples anything bigger, so ROIs are extracted at this size at most.
+MODEL_MAX_PIXELS = {
+    "qwen2.5vl:72b": 1280 * 28 * 28,
+}
+
+# Format ROI images are re-encoded to before they are sent to each model.
+MODEL_IMAGE_FORMAT = {
+    "qwen2.5vl:72b": "png",
+}
+
+# ----------------------------------------------------------------------------
+# Shared state
+# ----------------------------------------------------------------------------
+# Lock, slot and job files shared by all worker processes on this host
+# (APP_STATE_DIR, on local disk; see file_lock.py).
+os.makedirs(APP_STATE_DIR, exist_ok=True)
+
 # ----------------------------------------------------------------------------
 # Dash setup
 # ----------------------------------------------------------------------------
@@ -52,10 +95,16 @@ app.layout = html.Div([
     dcc.Location(id="url", refresh=False),
 
     dcc.Store(id="roi-data"),
+    dcc.Store(id="roi-job"),
+    dcc.Interval(id="roi-job-poll", interval=500, disabled=True),
     html.Div(id="roi-data-mirror", style={"display": "none"}),
 
     dcc.Store(id="session-id"),
     html.Div(id="session-id-mirror", style={"display": "none"}),
+    # kept in sessionStorage: one id per browser tab across page loads
+    dcc.Store(id="tab-id", storage_type="session"),
+
+    dcc.Store(id="tile-prefetch"),
 
     html.Header(html.H1("Wang Lab - Image Viewer & AI Chat")),
     html.Main(className="split-layout", children=[
@@ -96,6 +145,26 @@ def create_session_id(_):
     return sid
 
 
+@app.callback(
+    Output("tab-id", "data"),
+    Input("url", "href"),
+    State("tab-id", "data"),
+    prevent_initial_call=False,
+)
+def create_tab_id(_, tab_id):
+    """Stable id of the browser tab, unlike session-id which changes per page load.
+
+    Server-side state that follows what a tab is looking at (tile client
+    references, tile warm-up) is keyed on it, so opening another sample in
+    the same tab releases the previous one.
+    """
+    if tab_id:
+        return tab_id
+    tab_id = str(uuid.uuid4())[:8]
+    print(f"🧠 Created tab ID → {tab_id}")
+    return tab_id
+
+
 @app.callback(
     Output("session-id-mirror", "data-dash-store"),
     Input("session-id", "data"),
@@ -159,14 +228,22 @@ def mirror_session_id_to_dom(session_id):
 #         return html.Div(f"Error loading image: {e}")
 
 
-# Global registry
-TILE_CLIENT_REGISTRY = {}
+# "inprocess" serves tiles from /tiles on this server (see tile_server.py);
+# "localtileserver" keeps the previous per-raster TileClient on port 9015.
+TILE_BACKEND = os.environ.get("TILE_BACKEND", "inprocess")
+server.register_blueprint(tiles_bp)
 
+# Runs once the tab id exists (create_tab_id fills it from the same url), so
+# tile clients and warm-ups are recorded under the tab: opening another
+# sample in the tab releases the previous one and cancels its warm-up.
 @app.callback(
     Output("map-container", "children"),
     Input("url", "href"),
+    Input("tab-id", "data"),
 )
-def load_image_from_url(href):
+def load_image_from_url(href, tab_id=None):
+    if not tab_id:
+        return dash.no_update
     if not href:
         return html.Div("No sample specified in URL")
 
@@ -175,39 +252,52 @@ def load_image_from_url(href):
     if not sample_name:
         return html.Div("Missing ?file= parameter")
 
-    base_dir = "/condo/wanglab/shared/database"
-    base_path = os.path.join(base_dir, sample_name, "raster_resized.tif")
-    overlay_path = os.path.join(base_dir, sample_name, "raster_resized_overlay.tif")
-    json_path = os.path.join(base_dir, sample_name, "present_cell_types.json")
-
     port = 9015
     ip = "localhost"
 
     try:
-        # --- Read JSON file with present cell types ---
-        if os.path.exists(json_path):
-            with open(json_path, "r") as f:
-                classes = json.load(f)
-            print(f"🟢 Loaded {len(classes)} cell types from {json_path}")
+        # --- Paths, raster metadata and cell types from the sample index ---
+        sample = SAMPLE_INDEX.get(sample_name)
+        layers = sample["layers"]
+        base_path = layers["base"]["source"]
+        overlay_path = layers["overlay"]["source"]
+        classes = sample["classes"]
+        if classes:
+            print(f"🟢 Loaded {len(classes)} cell types for {sample_name}")
         else:
-            classes = []
             print("⚠️ No present_cell_types.json found — classes set to empty list")
 
-        # --- Reuse or create base client ---
-        base_client = get_or_create_tile_client(base_path, ip, port)
-        base_layer = get_leaflet_tile_layer(base_client)
+        if TILE_BACKEND == "localtileserver":
+            # --- Reuse or create base client ---
+            base_client = get_or_create_tile_client(base_path, ip, port, tab_id)
+            base_layer = get_leaflet_tile_layer(base_client)
 
-        # --- Reuse or create overlay client (same port) ---
-        overlay_client = get_or_create_tile_client(overlay_path, ip, port)
-        overlay_layer = get_leaflet_tile_layer(overlay_client)
+            # --- Reuse or create overlay client (same port) ---
+            overlay_client = get_or_create_tile_client(overlay_path, ip, port, tab_id)
+            overlay_layer = get_leaflet_tile_layer(overlay_client)
+            # the tab moves its references here, releasing its previous sample
+            attach_tile_session(tab_id, [base_path, overlay_path])
+            map_key = None  # client ports/URLs are per TileClient
+        else:
+            # --- Tiles served by this Flask server (/tiles/...) ---
+            base_client = base_layer = TileSource(sample_name, "base", layers["base"])
+            overlay_layer = TileSource(sample_name, "overlay", layers["overlay"])
+            warm_sample(
+                tab_id,
+                [base_layer, overlay_layer],
+                get_default_zoom(base_client, base_layer),
+            )
+            # tile URLs carry the raster mtimes, so a rebuilt raster misses
+            map_key = (sample_name, base_layer.url, overlay_layer.url, tuple(classes))
 
-        # --- Create map, pass classes ---
+        # --- Create map (memoized per sample), pass classes ---
         leaflet_map = create_leaflet_map(
             "map",
             base_client,
             base_layer,
             [(overlay_layer, "cell types")],
-            classes=classes
+            classes=classes,
+            cache_key=map_key,
         )
         return leaflet_map
 
@@ -216,58 +306,95 @@ def load_image_from_url(href):
         return html.Div(f"Error loading image: {e}")
 
 
-def get_or_create_tile_client(file_path, ip, port):
-    """Reuses or creates a TileClient, with validation and registry tracking."""
-    if file_path in TILE_CLIENT_REGISTRY:
-        info = TILE_CLIENT_REGISTRY[file_path]
-        client = info["client"]
-        info["count"] += 1
-        try:
-            _ = client.center()
-            print(f"♻️ Reusing valid TileClient for {file_path}")
-            return client
-        except Exception as e:
-            print(f"⚠️ Client invalid ({e}), recreating...")
-    client = TileClient(file_path, cors_all=True, host="0.0.0.0", port=port, client_host=ip, client_port=port)
-    TILE_CLIENT_REGISTRY[file_path] = {"client": client, "port": port, "count": 1}
-    print(f"✅ Created new TileClient on {ip}:{port} for {file_path}")
-    return client
+if TILE_BACKEND == "localtileserver":
+    start_tile_janitor()
+
+
+TILE_PREFETCH = os.environ.get("TILE_PREFETCH", "1") == "1"
 
+@app.callback(
+    Output("tile-prefetch", "data"),
+    Input("map", "bounds"),
+    State("map", "zoom"),
+    State("url", "href"),
+    State("tab-id", "data"),
+    prevent_initial_call=True,
+)
+def prefetch_tiles_around_viewport(bounds, zoom, href, tab_id):
+    """Render the tiles around the reported viewport before the user pans there."""
+    if not TILE_PREFETCH or TILE_BACKEND == "localtileserver" or not tab_id or not bounds or zoom is None:
+        return dash.no_update
+    sample_name = parse_qs(urlparse(href).query).get("file", [None])[0]
+    if not sample_name:
+        return dash.no_update
+    try:
+        layers = SAMPLE_INDEX.get(sample_name)["layers"]
+        paths = [layers["base"]["path"], layers["overlay"]["path"]]
+        queued = prefetch_viewport(tab_id, paths, bounds, zoom)
+    except Exception as e:
+        print(f"⚠️ Tile prefetch failed: {e}")
+        return dash.no_update
+    return {"queued": queued, "zoom": zoom}
 
 
 # ----------------------------------------------------------------------------
 # ROI extraction (multi-user safe)
 # ----------------------------------------------------------------------------
+# "" (default) saves plain bounding-box crops, "fill" keeps only the pixels
+# inside each drawn polygon (white outside), "alpha" makes the outside
+# transparent.
+ROI_MASK_MODE = os.environ.get("ROI_MASK_MODE", "")
+
+# Drawn ROIs are cropped on a small background pool so the callback returns
+# at once; the page polls the job and a newer drawing cancels the old job.
+ROI_JOB_WORKERS = int(os.environ.get("ROI_JOB_WORKERS", "2"))
+ROI_JOBS = JobQueue(
+    os.path.join(APP_STATE_DIR, "roi_jobs"), max_workers=ROI_JOB_WORKERS, name="roi-jobs"
+)
+
 @app.callback(
-    [Output("roi-data", "data"), Output("status5", "children")],
+    Output("roi-job", "data"),
     Input("editControl", "geojson"),
     Input("layer-overlay", "baseLayer"),
     State("url", "href"),
     State("session-id", "data"),
+    State("tab-id", "data"),
     prevent_initial_call=True,
 )
-def extract_roi_from_draw(drawn_geojson, layer_name, href, session_id):
+def extract_roi_from_draw(drawn_geojson, layer_name, href, session_id, tab_id=None):
     if not session_id:
         session_id = "default"
     print(f"🟢 ROI event triggered (session: {session_id})")
+    if tab_id:
+        touch_tile_session(tab_id)
 
     # --- Match the same logic as load_image_from_url ---
     query = parse_qs(urlparse(href).query)
     sample_name = query.get("file", [None])[0]
     if not sample_name:
-        return {}, "❌ Missing ?file= parameter"
+        return {"error": "❌ Missing ?file= parameter"}
 
-    base_dir = "/condo/wanglab/shared/database"
-    base_path = os.path.join(base_dir, sample_name, "raster_resized.tif")
-    overlay_path = os.path.join(base_dir, sample_name, "raster_resized_overlay.tif")
+    try:
+        sample = SAMPLE_INDEX.get(sample_name)
+    except KeyError:
+        return {"error": f"❌ Unknown sample {sample_name}"}
 
     # --- determine which layer the user was drawing on ---
-    if layer_name == "cell types":
-        layer_type = "cell_types"
-        file_path = overlay_path
-    else:
-        layer_type = "base_layer"
-        file_path = base_path
+    layer = "overlay" if layer_name == "cell types" else "base"
+
+    # --- one live job per session: this supersedes any earlier one ---
+    job_id = ROI_JOBS.submit(session_id, extract_rois, sample, layer, drawn_geojson, session_id)
+    return {"job_id": job_id}
+
+def extract_rois(sample, layer, drawn_geojson, session_id, cancel_event=None, progress=None):
+    """Save a session's drawn ROIs and their stats (runs as an ROI job).
+
+    Returns:
+        dict: {"data": roi-data store contents, "message": status line}.
+    """
+    layer_type = LAYER_TYPES[layer]
+    layer_info = sample["layers"][layer]
+    file_path = layer_info["source"]
 
     # --- build proper ROI folder ---
     parent = os.path.dirname(file_path)
@@ -276,21 +403,99 @@ def extract_roi_from_draw(drawn_geojson, layer_name, href, session_id):
 
     # --- clear all ROIs if nothing drawn ---
     if not drawn_geojson or not drawn_geojson.get("features"):
-        for f in glob.glob(os.path.join(roi_dir, "*.png")):
-            os.remove(f)
+        clear_rois(roi_dir)
         print(f"🗑️ Cleared all ROIs for session {session_id} ({layer_type})")
-        return {"paths": []}, f"🗑️ Cleared ROIs for {layer_type} (session {session_id})"
+        return {
+            "data": {"paths": [], "rois": [], "stats": []},
+            "message": f"🗑️ Cleared ROIs for {layer_type} (session {session_id})",
+        }
 
-    # --- save new ROIs ---
-    saved_paths = save_roi(
+    # --- save new/changed ROIs, keep unchanged ones ---
+    rois = save_roi(
         drawn_geojson,
         file_path,
         output_dir=roi_dir,
-        cleanup_old=True
+        incremental=True,
+        max_pixels=MODEL_MAX_PIXELS.get(DEFAULT_MODEL),
+        real_img_file=sample["real_images"].get(layer_type),
+        transform=layer_info["transform"],
+        mask_mode=ROI_MASK_MODE or None,
+        details=True,
+        cancel_event=cancel_event,
+        progress=progress,
     )
+    saved_paths = [roi["path"] for roi in rois]
     print(f"✅ Session {session_id} ({layer_type}): saved {len(saved_paths)} ROI(s).")
 
-    return {"paths": saved_paths}, f"✅ {len(saved_paths)} ROI(s) saved ({layer_type}, session {session_id})."
+    # --- cell-type composition of each polygon, from the overlay ---
+    if cancel_event is not None:
+        cancel_event.check()
+    stats = sample_roi_stats(sample, drawn_geojson)
+
+    return {
+        "data": {"paths": saved_paths, "rois": rois, "stats": stats},
+        "message": f"✅ {len(saved_paths)} ROI(s) saved ({layer_type}, session {session_id}).",
+    }
+
+@app.callback(
+    [Output("roi-data", "data"), Output("status5", "children"), Output("roi-job-poll", "disabled")],
+    Input("roi-job", "data"),
+    Input("roi-job-poll", "n_intervals"),
+    prevent_initial_call=True,
+)
+def poll_roi_job(job, _):
+    """Show the current ROI job's progress and publish its result when done."""
+    if not job:
+        return dash.no_update, dash.no_update, True
+    if job.get("error"):
+        return {}, job["error"], True
+
+    status = ROI_JOBS.status(job["job_id"])
+    if status is None:
+        return dash.no_update, "⚠️ ROI job expired, draw again to retry", True
+    state = status["status"]
+    if state in ("queued", "running"):
+        done, total = status["progress"]["done"], status["progress"]["total"]
+        counter = f" {done}/{total}" if total else ""
+        return dash.no_update, f"⏳ Extracting ROIs{counter}…", False
+    if state == "done":
+        return status["result"]["data"], status["result"]["message"], True
+    if state == "cancelled":
+        # superseded; the newer job's id is already in the store
+        return dash.no_update, dash.no_update, True
+    return dash.no_update, f"❌ ROI extraction failed: {status['error']}", True
+
+@server.route("/api/roi_jobs/<job_id>")
+def roi_job_status(job_id):
+    """Status, progress and (when done) result of an ROI extraction job."""
+    status = ROI_JOBS.status(job_id)
+    if status is None:
+        return jsonify({"error": f"unknown job {job_id}"}), 404
+    return jsonify(status)
+
+def sample_roi_stats(sample, drawn_geojson):
+    """``roi_stats`` of drawn polygons over a sample's overlay ([] on failure)."""
+    overlay = sample["layers"].get("overlay")
+    if not overlay:
+        return []
+    try:
+        started = time.perf_counter()
+        stats = roi_stats(drawn_geojson, overlay["path"], overlay["transform"])
+        print(f"📊 ROI stats for {len(stats)} region(s) in {(time.perf_counter() - started) * 1000:.0f} ms")
+        return stats
+    except Exception as e:
+        print(f"⚠️ ROI stats failed: {e}")
+        return []
+
+@server.route("/api/roi_stats", methods=["POST"])
+def roi_stats_api():
+    """Cell-type composition of polygons: ``{"sample": ..., "geojson": ...}``."""
+    data = request.get_json(force=True)
+    try:
+        sample = SAMPLE_INDEX.get(data.get("sample", ""))
+    except KeyError as e:
+        return jsonify({"error": str(e)}), 404
+    return jsonify({"stats": sample_roi_stats(sample, data.get("geojson"))})
 
 
 
@@ -322,26 +527,51 @@ def clear_after_send(_, __):
 # Chat history helpers
 # ----------------------------------------------------------------------------
 CHAT_HISTORY_DIR = "./chat_sessions"
-os.makedirs(CHAT_HISTORY_DIR, exist_ok=True)
+CHAT_STORE = ChatStore(CHAT_HISTORY_DIR)
+CHAT_STORE.migrate_all()
 
 def load_history(session_id: str):
-    path = os.path.join(CHAT_HISTORY_DIR, f"{session_id}.json")
-    if os.path.exists(path):
-        try:
-            with open(path, "r") as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"⚠️ Failed to load history for {session_id}: {e}")
+    try:
+        return CHAT_STORE.load(session_id)
+    except Exception as e:
+        print(f"⚠️ Failed to load history for {session_id}: {e}")
     return []
 
-def save_history(session_id: str, history):
-    path = os.path.join(CHAT_HISTORY_DIR, f"{session_id}.json")
+def append_history(session_id: str, messages):
+    """Append this turn's messages to the session (no full rewrite)."""
     try:
-        with open(path, "w") as f:
-            json.dump(history, f, indent=2)
+        CHAT_STORE.append(session_id, messages)
     except Exception as e:
         print(f"⚠️ Failed to save history for {session_id}: {e}")
 
+# Summaries are text-only: a small text model does them without taking one
+# of the vision model's slots (they get a queue of their own, below).
+SUMMARY_MODEL = os.environ.get("SUMMARY_MODEL", "qwen2.5:7b")
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a conversation between a pathologist "
+    "and an image-analysis assistant. Merge the previous summary with the new "
+    "messages. Keep sample names, regions, cell types, counts and conclusions; "
+    "drop pleasantries. Answer with the summary only, under 200 words."
+)
+
+def summarize_history(previous_summary, messages, ollama_host="http://localhost:11434"):
+    """Fold ``messages`` into ``previous_summary`` with a text-only model call.
+
+    Runs on the history window's background thread. Uses ``SUMMARY_QUEUE``,
+    or a slot in the vision model's queue if ``SUMMARY_MODEL`` is that model.
+    """
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    request_messages = [
+        {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+        {"role": "user", "content": f"Previous summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}"},
+    ]
+    queue = CHAT_QUEUE if SUMMARY_MODEL == DEFAULT_MODEL else SUMMARY_QUEUE
+    with queue.slot("__summary__", timeout=CHAT_QUEUE_TIMEOUT):
+        response = get_ollama_client(ollama_host).chat(model=SUMMARY_MODEL, messages=request_messages)
+    return response["message"]["content"].strip()
+
+HISTORY_WINDOW = HistoryWindow(CHAT_STORE, summarize_history)
+
 def clean_history_images(history):
     """Remove old or missing ROI image references from previous messages."""
     for i, msg in enumerate(history):
@@ -361,6 +591,148 @@ def clean_history_images(history):
 # ----------------------------------------------------------------------------
 # Ollama Vision (persistent chat via JSON)
 # ----------------------------------------------------------------------------
+# The 72B model serves only a couple of generations at once; everything else
+# waits in a FIFO queue (one request per session) or is rejected.
+# The in-flight cap is host-wide (slot files under APP_STATE_DIR), so it holds
+# when several server workers run, see wsgi.py.
+CHAT_QUEUE = AdmissionQueue(
+    max_in_flight=int(os.environ.get("OLLAMA_MAX_IN_FLIGHT", "2")),
+    max_queue=int(os.environ.get("OLLAMA_MAX_QUEUE", "16")),
+    name="vision",
+    slot_dir=os.path.join(APP_STATE_DIR, "slots"),
+)
+CHAT_QUEUE_TIMEOUT = float(os.environ.get("OLLAMA_QUEUE_TIMEOUT", "300"))
+SUMMARY_QUEUE = AdmissionQueue(
+    max_in_flight=int(os.environ.get("SUMMARY_MAX_IN_FLIGHT", "1")),
+    max_queue=int(os.environ.get("SUMMARY_MAX_QUEUE", "16")),
+    name="summary",
+    slot_dir=os.path.join(APP_STATE_DIR, "slots"),
+)
+
+def model_messages(model, messages):
+    """Attach ROI images as cached base64 payloads sized for ``model``."""
+    return with_encoded_images(
+        messages,
+        max_pixels=MODEL_MAX_PIXELS.get(model),
+        image_format=MODEL_IMAGE_FORMAT.get(model, "png"),
+    )
+
+# Opt-in (ROI_STATS_IN_PROMPT=1): give the model the ROI composition computed
+# from the overlay, so counting/composition questions don't depend on it
+# reading pixels. Sent with the current turn only, never saved to history.
+ROI_STATS_IN_PROMPT = os.environ.get("ROI_STATS_IN_PROMPT", "0") == "1"
+
+def session_roi_stats(session_id):
+    """``roi_stats`` of the session's current ROIs, from its latest ROI job.
+
+    Stats never come from the browser; [] while the latest job is not done.
+    """
+    job = ROI_JOBS.latest(session_id)
+    if not job or job["status"] != "done":
+        return []
+    return (job.get("result") or {}).get("data", {}).get("stats") or []
+
+def roi_context_message(session_id):
+    """System message with the ROI composition of the session's drawn regions.
+
+    Returns:
+        dict or None: None when disabled or there are no stats.
+    """
+    if not ROI_STATS_IN_PROMPT:
+        return None
+    try:
+        stats = session_roi_stats(session_id)
+        if not stats:
+            return None
+        summary = format_stats(stats)
+    except Exception as e:
+        print(f"⚠️ ROI context skipped for {session_id}: {e}")
+        return None
+    return {
+        "role": "system",
+        "content": (
+            "Cell-type composition of the selected regions, measured on the cell-type overlay "
+            f"(fractions of labeled pixels, approximate cell counts):\n{summary}"
+        ),
+    }
+
+def _normalize_images(images):
+    if isinstance(images, str):
+        return [images]
+    return images or []
+
+class ModelUnavailable(Exception):
+    """Raised when the vision model fails; nothing is written to history."""
+
+    def __init__(self, message, status=502):
+        super().__init__(message)
+        self.status = status
+
+# Opt-in (RESPONSE_CACHE=1) cache of replies to the same prompt on the same
+# ROIs with the same conversation so far; survives restarts.
+RESPONSE_CACHE = (
+    ResponseCache(
+        os.environ.get("RESPONSE_CACHE_PATH", "./response_cache/responses.sqlite3"),
+        ttl_seconds=float(os.environ.get("RESPONSE_CACHE_TTL", str(7 * 86400))),
+        max_entries=int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "5000")),
+    )
+    if os.environ.get("RESPONSE_CACHE", "0") == "1"
+    else None
+)
+
+def _prepare_turn(session_id, prompt, images):
+    """Load the session and build this turn's user message and model window.
+
+    The ROI context (see ``roi_context_message``) goes into the window just
+    before the user message; only ``user_message`` is saved to history.
+    Call with the session lock held.
+    """
+    history = clean_history_images(load_history(session_id))
+    new_images = [p for p in _normalize_images(images) if os.path.exists(p)]
+    user_message = {"role": "user", "content": prompt, "images": new_images}
+    history.append(user_message)
+    window = HISTORY_WINDOW.build(session_id, history)
+    context = roi_context_message(session_id)
+    if context is not None:
+        window = window[:-1] + [context, window[-1]]
+    return user_message, window
+
+def _turn_key(model, user_message, window):
+    return response_key(model, user_message["content"], user_message["images"], window[:-1])
+
+def cached_reply(model, prompt, images=None, session_id="default"):
+    """Answer from ``RESPONSE_CACHE`` if this exact turn was seen before.
+
+    On a hit the turn is appended to the session like a generated one.
+
+    Returns:
+        str or None: cached reply.
+    """
+    if RESPONSE_CACHE is None:
+        return None
+    with CHAT_STORE.lock(session_id):
+        user_message, window = _prepare_turn(session_id, prompt, images)
+        try:
+            reply = RESPONSE_CACHE.get(_turn_key(model, user_message, window))
+        except Exception as e:
+            print(f"⚠️ Response cache lookup failed: {e}")
+            return None
+        if reply is None:
+            return None
+        append_history(session_id, [user_message, {"role": "assistant", "content": reply}])
+        HISTORY_WINDOW.schedule_summary(session_id)
+        print(f"♻️ Cached response [session={session_id}] → {reply[:120]}...")
+        return reply
+
+def _remember_reply(model, user_message, window, reply):
+    """Cache a complete model reply (empty replies are never cached)."""
+    if RESPONSE_CACHE is None or not reply:
+        return
+    try:
+        RESPONSE_CACHE.put(_turn_key(model, user_message, window), model, reply)
+    except Exception as e:
+        print(f"⚠️ Response cache write failed: {e}")
+
 def ollama_vision_generate(
     model: str,
     prompt: str,
@@ -368,62 +740,176 @@ def ollama_vision_generate(
     session_id: str = "default",
     ollama_host: str = "http://localhost:11434",
 ):
-    os.environ["OLLAMA_HOST"] = ollama_host
-    client = ollama.Client()
+    client = get_ollama_client(ollama_host)
 
-    if isinstance(images, str):
-        images = [images]
-    elif images is None:
-        images = []
+    # one turn at a time per session, so concurrent requests can't interleave
+    with CHAT_STORE.lock(session_id):
+        # load + clean history, append new message with current ROI
+        user_message, window = _prepare_turn(session_id, prompt, images)
 
-    # load + clean history
-    history = clean_history_images(load_history(session_id))
-
-    # append new message with current ROI
-    new_images = [p for p in images if os.path.exists(p)]
-    history.append({"role": "user", "content": prompt, "images": new_images})
+        try:
+            print(f"📡 Querying Ollama model ({model}) via {ollama_host} [session={session_id}]")
+            response = client.chat(model=model, messages=model_messages(model, window))
+            reply = response["message"]["content"].strip()
+        except Exception as e:
+            # the turn is not recorded, so a retry starts from the same history
+            print(f"❌ Model offline or unreachable: {e}")
+            raise ModelUnavailable(f"Model unavailable: {e}") from e
 
-    try:
-        print(f"📡 Querying Ollama model ({model}) via {ollama_host} [session={session_id}]")
-        response = client.chat(model=model, messages=history)
-        reply = response["message"]["content"].strip()
-        history.append({"role": "assistant", "content": reply})
-        save_history(session_id, history)
+        append_history(session_id, [user_message, {"role": "assistant", "content": reply}])
+        _remember_reply(model, user_message, window, reply)
+        HISTORY_WINDOW.schedule_summary(session_id)
         print(f"🧠 Model response → {reply[:120]}...")
         return reply
 
-    except Exception as e:
-        print(f"❌ Model offline or unreachable: {e}")
-        roi_info = (
-            "No ROI images attached."
-            if not new_images
-            else "\n• " + "\n• ".join(os.path.basename(p) for p in new_images)
-        )
-        mock_reply = f"(Offline mode) '{prompt[:50]}...'\nImages:{roi_info}"
-        history.append({"role": "assistant", "content": mock_reply})
-        save_history(session_id, history)
-        print(f"🧪 Mock response:\n{mock_reply}")
-        return mock_reply
+def ollama_vision_stream(
+    model: str,
+    prompt: str,
+    images=None,
+    session_id: str = "default",
+    ollama_host: str = "http://localhost:11434",
+):
+    """Streaming variant of ``ollama_vision_generate``.
+
+    Yields reply text chunks as Ollama produces them. The turn is written to
+    history once, when the stream ends (or is closed by the client), with
+    whatever the model produced; if the model fails ``ModelUnavailable`` is
+    raised and a turn without any reply is not recorded.
+    """
+    client = get_ollama_client(ollama_host)
+
+    with CHAT_STORE.lock(session_id):
+        user_message, window = _prepare_turn(session_id, prompt, images)
+
+        parts = []
+        try:
+            print(f"📡 Streaming Ollama model ({model}) via {ollama_host} [session={session_id}]")
+            messages = model_messages(model, window)
+            finished = False
+            for chunk in client.chat(model=model, messages=messages, stream=True):
+                token = chunk["message"]["content"]
+                if token:
+                    parts.append(token)
+                    yield token
+                finished = bool(chunk.get("done"))
+            # only a stream Ollama ended itself is a complete reply
+            if finished:
+                _remember_reply(model, user_message, window, "".join(parts).strip())
+        except Exception as e:
+            print(f"❌ Model offline or unreachable: {e}")
+            raise ModelUnavailable(f"Model unavailable: {e}") from e
+        finally:
+            reply = "".join(parts).strip()
+            if reply:
+                append_history(session_id, [user_message, {"role": "assistant", "content": reply}])
+                HISTORY_WINDOW.schedule_summary(session_id)
+                print(f"🧠 Streamed response → {reply[:120]}...")
 
 # ----------------------------------------------------------------------------
 # REST endpoint → JS calls this
 # ----------------------------------------------------------------------------
+def _timing(ticket):
+    return {
+        "queue_wait_s": round(ticket.get("wait", 0.0), 3),
+        "service_s": round(ticket.get("service", 0.0), 3),
+    }
+
 @server.route("/api/chat", methods=["POST"])
 def chat_api():
     try:
         data = request.get_json(force=True)
-        model = data.get("model", "qwen2.5vl:72b")
-        prompt = data.get("prompt", "")
+        model = data.get("model", DEFAULT_MODEL)
         images = data.get("images", [])
         session_id = data.get("session_id", "default")
+        prompt = data.get("prompt", "")
 
         print(f"💬 Incoming chat:\n - Model: {model}\n - Session: {session_id}\n - Prompt: {prompt}\n - Images: {images}")
-        reply = ollama_vision_generate(model=model, prompt=prompt, images=images, session_id=session_id)
-        return jsonify({"response": reply})
+        reply = cached_reply(model=model, prompt=prompt, images=images, session_id=session_id)
+        if reply is not None:
+            return jsonify({"response": reply, "timing": _timing({}), "cached": True})
+        with CHAT_QUEUE.slot(session_id, timeout=CHAT_QUEUE_TIMEOUT) as ticket:
+            reply = ollama_vision_generate(model=model, prompt=prompt, images=images, session_id=session_id)
+        print(f"⏱️ Chat timing [session={session_id}]: {_timing(ticket)}")
+        return jsonify({"response": reply, "timing": _timing(ticket), "cached": False})
+    except QueueFull as e:
+        print(f"🚦 Chat rejected [session={session_id}]: {e}")
+        return jsonify({"error": str(e), "queue": CHAT_QUEUE.stats()}), e.status
+    except ModelUnavailable as e:
+        return jsonify({"error": str(e)}), e.status
     except Exception as e:
         print(f"❌ Chat API error: {e}")
         return jsonify({"error": str(e)}), 500
 
+@server.route("/api/chat/stream", methods=["POST"])
+def chat_stream_api():
+    """Same payload as /api/chat; replies as Server-Sent Events.
+
+    Events: ``event: queue`` with the queue position while waiting for the
+    model, ``data: {"token": ...}`` per chunk, then ``event: done`` with the
+    full response, timing and ``cached`` flag, or ``event: error``. Cached
+    replies skip the queue and arrive as a single token.
+    """
+    data = request.get_json(force=True)
+    model = data.get("model", DEFAULT_MODEL)
+    images = data.get("images", [])
+    session_id = data.get("session_id", "default")
+    prompt = data.get("prompt", "")
+    print(f"💬 Incoming streaming chat:\n - Model: {model}\n - Session: {session_id}\n - Prompt: {prompt}\n - Images: {images}")
+
+    reply = cached_reply(model=model, prompt=prompt, images=images, session_id=session_id)
+    if reply is not None:
+        body = sse_event({"token": reply}) + sse_event({"response": reply, "timing": _timing({}), "cached": True}, event="done")
+        response = Response(body, mimetype="text/event-stream")
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    try:
+        ticket = CHAT_QUEUE.enqueue(session_id)
+    except QueueFull as e:
+        print(f"🚦 Chat rejected [session={session_id}]: {e}")
+        return jsonify({"error": str(e), "queue": CHAT_QUEUE.stats()}), e.status
+
+    def events():
+        parts = []
+        try:
+            # report the queue position until a model slot frees up
+            last_position = None
+            while not CHAT_QUEUE.wait(ticket, timeout=1.0):
+                position = CHAT_QUEUE.position(ticket)
+                if position != last_position:
+                    last_position = position
+                    yield sse_event({"position": position}, event="queue")
+                if time.monotonic() - ticket["enqueued"] > CHAT_QUEUE_TIMEOUT:
+                    raise QueueFull("Timed out waiting for the model")
+
+            for token in ollama_vision_stream(model=model, prompt=prompt, images=images, session_id=session_id):
+                parts.append(token)
+                yield sse_event({"token": token})
+            CHAT_QUEUE.release(ticket)
+            print(f"⏱️ Chat timing [session={session_id}]: {_timing(ticket)}")
+            yield sse_event({"response": "".join(parts).strip(), "timing": _timing(ticket), "cached": False}, event="done")
+        except Exception as e:
+            print(f"❌ Chat stream error: {e}")
+            yield sse_event({"error": str(e)}, event="error")
+        finally:
+            CHAT_QUEUE.release(ticket)
+
+    response = Response(stream_with_context(events()), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    # frees the queue place even if the client leaves before streaming starts
+    response.call_on_close(lambda: CHAT_QUEUE.release(ticket))
+    return response
+
+@server.route("/api/chat/queue")
+def chat_queue_status():
+    """Queue stats, plus the caller's position with ``?session_id=``."""
+    session_id = request.args.get("session_id")
+    payload = {"queue": CHAT_QUEUE.stats()}
+    if session_id:
+        payload["position"] = CHAT_QUEUE.session_position(session_id)
+    return jsonify(payload)
+
 # ----------------------------------------------------------------------------
 # Optional route: Clear chat
 # ----------------------------------------------------------------------------
@@ -432,9 +918,7 @@ def reset_chat():
     try:
         data = request.get_json(force=True)
         session_id = data.get("session_id", "default")
-        path = os.path.join(CHAT_HISTORY_DIR, f"{session_id}.json")
-        if os.path.exists(path):
-            os.remove(path)
+        if CHAT_STORE.reset(session_id):
             print(f"🗑️ Cleared chat for {session_id}")
         return jsonify({"status": "cleared"})
     except Exception as e:
@@ -446,6 +930,11 @@ def reset_chat():
 # ----------------------------------------------------------------------------
 @server.route("/preview")
 def preview_image():
+    """Serve an ROI image, or a cached thumbnail of it with ``?size=<px>``.
+
+    Responses carry an ETag (path + mtime) and ``Cache-Control: no-cache``,
+    so browsers revalidate and get a bodyless 304 when nothing changed.
+    """
     path = request.args.get("path")
     if not path:
         return "Missing path", 400
@@ -453,8 +942,87 @@ def preview_image():
     if not os.path.exists(path):
         print(f"❌ Image not found: {path}")
         return f"Not found: {path}", 404
-    print(f"🖼️ Serving preview: {path}")
-    return send_file(path, mimetype="image/png")
+
+    size = request.args.get("size", type=int)
+    try:
+        if size:
+            serve_path, etag = get_thumbnail(path, size)
+            mimetype = "image/png"
+        else:
+            serve_path, etag = path, file_etag(path)
+            mimetype = mimetypes.guess_type(path)[0] or "image/png"
+    except Exception as e:
+        print(f"❌ Preview failed for {path}: {e}")
+        return f"Preview failed: {e}", 500
+
+    print(f"🖼️ Serving preview: {path} (size={size or 'full'})")
+    response = send_file(serve_path, mimetype=mimetype, etag=etag, conditional=True)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+# ----------------------------------------------------------------------------
+# Dataset catalog (landing page)
+# ----------------------------------------------------------------------------
+CATALOG = Catalog()
+CATALOG_LOCK = threading.Lock()
+
+def _catalog_response(payload, status=200):
+    # the landing page is served from the HTTP preview server (another port)
+    response = jsonify(payload)
+    response.status_code = status
+    response.headers["Access-Control-Allow-Origin"] = "*"
+    return response
+
+def _ensure_catalog():
+    """Build the snapshot from the sheet on first use if none exists yet."""
+    if CATALOG.exists():
+        return
+    with CATALOG_LOCK:
+        if not CATALOG.exists():
+            print("📚 No catalog snapshot yet — downloading the sheet")
+            refresh_catalog()
+
+@server.route("/api/catalog")
+def catalog_api():
+    """One page of datasets.
+
+    Query args: ``technology``, ``tissue``, ``species``, ``status`` (repeat
+    for several values), ``q`` (search), ``page``, ``per_page`` and
+    ``facets=1`` to include the filter values.
+    """
+    try:
+        _ensure_catalog()
+        filters = {name: request.args.getlist(name) for name in FILTER_COLUMNS}
+        result = CATALOG.query(
+            filters,
+            q=request.args.get("q", "").strip(),
+            page=request.args.get("page", 1, type=int),
+            per_page=request.args.get("per_page", 50, type=int),
+        )
+        if request.args.get("facets") == "1":
+            result["facets"] = CATALOG.facets()
+        return _catalog_response(result)
+    except Exception as e:
+        print(f"❌ Catalog API error: {e}")
+        return _catalog_response({"error": str(e)}, 503)
+
+# ----------------------------------------------------------------------------
+# Cache monitoring
+# ----------------------------------------------------------------------------
+@server.route("/api/cache_stats")
+def cache_stats():
+    return jsonify({
+        "real_image": REAL_IMAGE_CACHE.stats(),
+        "tile_clients": tile_client_stats(),
+        "chat_queue": CHAT_QUEUE.stats(),
+        "summary_queue": SUMMARY_QUEUE.stats(),
+        "image_payloads": PAYLOAD_CACHE.stats(),
+        "maps": MAP_CACHE_STATS,
+        "rasters": RASTER_POOL.stats(),
+        "roi_jobs": ROI_JOBS.stats(),
+        "responses": RESPONSE_CACHE.stats() if RESPONSE_CACHE else None,
+    })
 
 # ----------------------------------------------------------------------------
 # Run
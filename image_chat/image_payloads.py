@@ -0,0 +1,60 @@
+import os
+import base64
+
+import cv2
+
+from image_cache import ByteLRUCache
+from roi_extract import fit_pixel_budget
+
+# base64 image payloads sent to the vision model, keyed by file identity and
+# the encoding settings, so follow-up questions on an ROI skip NFS and encode
+PAYLOAD_CACHE = ByteLRUCache(
+    int(os.environ.get("IMAGE_PAYLOAD_CACHE_MB", "256")) * 1024 ** 2,
+    name="image_payloads",
+)
+
+
+def encode_image(path, max_pixels=None, image_format="png"):
+    """Return an image as a base64 string ready for ``ollama`` messages.
+
+    The image is downscaled to ``max_pixels`` and re-encoded to
+    ``image_format`` once; later calls for the same (path, mtime, size) and
+    settings are served from ``PAYLOAD_CACHE``.
+
+    Args:
+        path (str): image file.
+        max_pixels (int, optional): pixel budget of the model.
+        image_format (str): "png" or "jpeg".
+
+    Returns:
+        str: base64-encoded image.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, max_pixels, image_format)
+
+    def _encode():
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError(f"❌ Failed to read image {path}")
+        height, width = image.shape[:2]
+        out_w, out_h = fit_pixel_budget(width, height, max_pixels)
+        if (out_w, out_h) != (width, height):
+            image = cv2.resize(image, (out_w, out_h), interpolation=cv2.INTER_AREA)
+        params = [cv2.IMWRITE_JPEG_QUALITY, 95] if image_format == "jpeg" else []
+        ok, data = cv2.imencode(f".{image_format}", image, params)
+        if not ok:
+            raise ValueError(f"❌ Failed to encode image {path}")
+        return base64.b64encode(data.tobytes()).decode("ascii")
+
+    return PAYLOAD_CACHE.get_or_load(key, _encode)
+
+
+def with_encoded_images(messages, max_pixels=None, image_format="png"):
+    """Copy of ``messages`` with image paths replaced by cached payloads."""
+    prepared = []
+    for message in messages:
+        if message.get("images"):
+            message = dict(message)
+            message["images"] = [encode_image(p, max_pixels, image_format) for p in message["images"]]
+        prepared.append(message)
+    return prepared
@@ -1,15 +1,115 @@
 
-from niceview.utils.tools import CMAX, CMIN, get_hex_values
+import threading
+from collections import OrderedDict
+
+from niceview.utils.tools import CMAX, CMIN
 import dash_leaflet as dl
+from dash import html
+
+from cell_palette import legend_entries
+
+# built maps keyed by the caller's cache key (see create_leaflet_map)
+MAP_CACHE_SIZE = 64
+_MAP_CACHE = OrderedDict()
+_MAP_CACHE_LOCK = threading.Lock()
+MAP_CACHE_STATS = {"hits": 0, "misses": 0}
+
+def _tile_url(layer, base_client):
+    """Tile URL template for a layer as seen from the browser.
+
+    Layers served by this app's ``/tiles`` endpoint already have relative
+    URLs. localtileserver layers point at the TileClient's bind host, which
+    is rewritten to ``localhost`` so it resolves through the SSH tunnel.
+    """
+    url = layer.url
+    if not hasattr(base_client, "client_port"):
+        return url
+    return url.replace(
+        f"http://{base_client.client_host}:{base_client.client_port}",
+        f"http://localhost:{base_client.client_port}"
+    )
+
+def get_default_zoom(base_client, base_layer):
+    """Initial (and minimum) zoom of the map for a base layer.
+
+    Args:
+        base_client (TileClient or TileSource): Base client.
+        base_layer (TileLayer or TileSource): Base layer.
+
+    Returns:
+        float: zoom level.
+    """
+    (south, west), (north, east) = base_layer.bounds
+    vert_dst = east - west
+    hori_dst = north - south
+    zoom_factor = 1 * ((vert_dst + hori_dst) / 2) / 0.0085
+    return base_client.default_zoom + zoom_factor
+
+def create_legend(classes):
+    """One legend control listing the present cell types.
+
+    Args:
+        classes (list[int]): class ids present in the sample.
+
+    Returns:
+        list: ``[html.Div]``, or ``[]`` if no class has a legend entry.
+    """
+    entries = legend_entries(classes)
+    if not entries:
+        return []
+    rows = [
+        html.Div(
+            [html.Span(className="legend-swatch", style={"background": hex_color}), name],
+            className="legend-row",
+        )
+        for _, name, hex_color in entries
+    ]
+    return [html.Div(rows, className="map-legend")]
+
+def create_leaflet_map(*args, cache_key=None, **kwargs):
+    """Create leaflet map, memoized per ``cache_key``.
 
-def create_leaflet_map(
+    The map for a key is built once and returned as-is afterwards, so the key
+    must cover everything the map depends on: sample, layers, classes and
+    the raster mtimes (a rebuilt raster then simply misses). Without a key
+    the map is always rebuilt. See ``build_leaflet_map`` for the arguments.
+
+    A cached map is the same ``dl.Map`` object for every session (Dash only
+    serializes it per response), so callers must treat it as read-only:
+    never change its ``children`` or props, build a map without a key
+    instead.
+
+    Args:
+        cache_key (hashable, optional): identity of the map to build.
+
+    Returns:
+        Map: shared and read-only when ``cache_key`` is given.
+    """
+    if cache_key is None:
+        return build_leaflet_map(*args, **kwargs)
+    key = cache_key
+    with _MAP_CACHE_LOCK:
+        cached = _MAP_CACHE.get(key)
+        if cached is not None:
+            _MAP_CACHE.move_to_end(key)
+            MAP_CACHE_STATS["hits"] += 1
+            return cached
+        MAP_CACHE_STATS["misses"] += 1
+
+    leaflet_map = build_leaflet_map(*args, **kwargs)
+    with _MAP_CACHE_LOCK:
+        _MAP_CACHE[key] = leaflet_map
+        while len(_MAP_CACHE) > MAP_CACHE_SIZE:
+            _MAP_CACHE.popitem(last=False)
+    return leaflet_map
+
+def build_leaflet_map(
     map_id,
     base_client,
     base_layer,
     list_of_layers,
     cmax=CMAX,
     classes=None,
-    cmap=None,
     geojson_coords=None,
     token="",
     overlay=False
@@ -18,11 +118,11 @@ def create_leaflet_map(
     
     Args:
         map_id (str): Map ID.
-        base_client (TileClient): Base client.
-        base_layer (TileLayer): Base layer.
+        base_client (TileClient or TileSource): Base client.
+        base_layer (TileLayer or TileSource): Base layer.
         list_of_layers (list[tuple]): List of layers.
         cmax (int, optional): Max value.
-        cmap: (str, optional): Color map.
+        classes (list[int], optional): cell-type class ids for the legend.
         geojson_coords: input coordinate 
         token: user token
         
@@ -45,25 +145,12 @@ def create_leaflet_map(
     expanded_bounds[0][0] -= hori_dst
     expanded_bounds[1][1] += hori_dst
     # zoom factor
-    zoom_factor = 1 * ((vert_dst + hori_dst) / 2) / 0.0085
-    default_zoom = base_client.default_zoom + zoom_factor
+    default_zoom = get_default_zoom(base_client, base_layer)
     
     # overlay
 
     overlay_layers = []
-    url = base_layer.url
-    print("initial url:", url)
-    #url = url.replace("0.0.0.0","3.23.18.185")
-#     url = url.replace(
-#     f"http://{base_client.client_host}:{base_client.client_port}",
-#     f"https://wanglab.tech/tiles/{token}"
-# )
-    url = url.replace(
-    f"http://{base_client.client_host}:{base_client.client_port}",
-    f"http://localhost:{base_client.client_port}"
-    )
-
-    print("after url:", url)
+    url = _tile_url(base_layer, base_client)
     base_input = dl.BaseLayer(
         dl.TileLayer(
                 url=url,
@@ -74,19 +161,7 @@ def create_leaflet_map(
     overlay_layers.append(base_input)
     for index, (arg_layer, arg_name) in enumerate(list_of_layers):
         checked = index == len(list_of_layers) - 1
-        layer_url = arg_layer.url
-        #layer_url = layer_url.replace("0.0.0.0","3.23.18.185")
-#         layer_url = layer_url.replace(
-#     f"http://{base_client.client_host}:{base_client.client_port}",
-#     f"https://wanglab.tech/tiles/{token}"
-# )
-        print("initial layer url:", layer_url)
-        layer_url = layer_url.replace(
-         f"http://{base_client.client_host}:{base_client.client_port}",
-          f"http://localhost:{base_client.client_port}"
-         )
-
-        print("after layer url:", layer_url)
+        layer_url = _tile_url(arg_layer, base_client)
 
         if overlay is False:
             layer = dl.BaseLayer(
@@ -113,103 +188,7 @@ def create_leaflet_map(
 
         overlay_layers.append(layer)
     
-    width, height = 20, 200
-    if classes is None:
-        if cmap is not None:
-            colorbar1 = dl.Colorbar(
-                    colorscale=get_hex_values(cmap), width=width, height=height, position='bottomleft',nTicks=2, tickText=['MIN', 'MAX'], style={"color":"#1EC01E"}
-                    )
-            colorbar2 = []
-            colorbar3 = []
-        else:
-            colorbar1 = []
-            colorbar2 = []
-            colorbar3 = []
-    else:
-        COLOR_DICT_CELLS = {
-            0: [92, 20, 186],      # Deep purple — Neoplastic
-            1: [255, 0, 0],        # Bright red — Immune
-            2: [34, 221, 77],      # Bright green — Stromal
-            3: [35, 92, 236],      # Strong blue — Epithelial
-            4: [255, 209, 102],    # Soft yellow-orange — Fibroblast
-            5: [255, 159, 68],     # Warm orange — Endothelial
-            6: [200, 50, 50],      # Medium red — Cardiomyocyte (distinct from Immune)
-            7: [60, 40, 120],      # Deep indigo — Cardiac Fibroblast
-            8: [35, 192, 236],     # Sky blue — Smooth Muscle
-            9: [254, 255, 100],    # Pale yellow — Adipose
-            10: [153, 102, 255],   # Lavender — Oligodendrocyte
-            11: [255, 159, 168],   # Light pink — Astrocyte
-            12: [255, 59, 68],     # Bright coral red — Neuron
-            13: [92, 200, 186],    # Teal — Vascular Smooth Muscle
-            14: [255, 0, 100],     # Magenta — Alveolar pneumocytes
-            15: [34, 221, 177],    # Aqua green — Chondrocytes
-            16: [35, 92, 136],     # Steel blue — Hepatocyte
-            17: [254, 55, 0],      # Vivid orange-red — Glia
-            18: [120, 68, 229],    # Violet — Pericentral hepatocytes
-            19: [68, 133, 229],    # Azure — Proliferating keratinocytes
-            20: [120, 229, 68],    # Lime green — Spinous keratinocytes
-            21: [0, 180, 229],     # Aqua-blue — Connective
-            22: [120, 0, 68],      # Maroon — Lamina propria
-            23: [229, 180, 68],    # Golden tan — Reserved / extra
-            24: [229, 68, 180],    # Hot pink — Reserved / extra
-            25: [68, 229, 120],    # Mint green — Reserved / extra
-        }
-
-
-    TYPE_NUCLEI_DICT_PANNUKE = {
-        1: "Neoplastic", 2: "Immune", 3: "Stromal", 4: "Epithelial", 5: "Fibroblast",
-        6: "Endothelial", 7: "Cardiomyocyte", 8: "Cardiac Fibroblast", 9: "Smooth Muscle",
-        10: "Adipose", 11: "Oligodendrocyte", 12: "Astrocyte", 13: "Neuron",
-        14: "Vascular Smooth Muscle", 15: "Alveolar pneumocytes", 16: "Chondrocytes",
-        17: "Hepatocyte", 18: "Glia", 19: "Pericentral hepatocytes",
-        20: "Proliferating keratinocytes", 21: "Spinous keratinocytes",
-        22: "Connective", 23: "Lamina propria",
-    }
-
-    # Generate colorbars only for present classes
-    colorbars = []
-    offset = 0  # vertical stacking offset
-    for idx in classes:
-        if idx in TYPE_NUCLEI_DICT_PANNUKE and idx in COLOR_DICT_CELLS:
-            name = TYPE_NUCLEI_DICT_PANNUKE[idx]
-            # print(name)
-            rgb = COLOR_DICT_CELLS[idx]
-            hex_color = '#%02x%02x%02x' % tuple(rgb)  # dynamic hex color
-
-            # EXACT same format as your example + proper stacking offset
-            cb = dl.Colorbar(
-                colorscale=[hex_color],
-                width=20,
-                height=20,
-                min=0,
-                max=1,
-                position="bottomleft",
-                nTicks=3,
-                tickText=['', name, ''],
-                style={
-                    # readable modern text
-                    "color": "#1e1e1e",  # neutral dark gray for contrast
-                    "fontFamily": "SF Pro Text, -apple-system, BlinkMacSystemFont, sans-serif",
-                    "fontWeight": "500",
-                    "fontSize": "13px",
-                    "letterSpacing": "-0.25px",
-
-                    # clean container look
-                    "backgroundColor": "rgba(255, 255, 255, 0.9)",
-                    "borderRadius": "6px",
-                    "padding": "4px 10px",
-                    "boxShadow": "0 2px 6px rgba(0,0,0,0.08)",
-
-                    # alignment tweaks
-                    "margin": "0px",
-                    "transform": f"translateY(-{offset}px)",
-                }
-            )
-
-
-
-            colorbars.append(cb)
-            offset += 0  # pixel spacing between colorbars
+    legend = create_legend(classes)
 
     # create map
     # PZhang added this (deal with empty input regions)
@@ -220,7 +199,7 @@ def create_leaflet_map(
     thor_map = dl.Map(
         id=map_id,
         children=[
-            *reversed(colorbars),
+            *legend,
             dl.LayersControl(
                 overlay_layers, hideSingleBase=True, id="layer-overlay"
             ),
@@ -0,0 +1,45 @@
+import os
+import threading
+
+import httpx
+import ollama
+
+# Generations on the 72B model can take minutes; connecting through the SSH
+# tunnel should not.
+OLLAMA_CONNECT_TIMEOUT = float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", "10"))
+OLLAMA_READ_TIMEOUT = float(os.environ.get("OLLAMA_READ_TIMEOUT", "600"))
+OLLAMA_MAX_CONNECTIONS = int(os.environ.get("OLLAMA_MAX_CONNECTIONS", "16"))
+OLLAMA_KEEPALIVE_SECONDS = float(os.environ.get("OLLAMA_KEEPALIVE_SECONDS", "300"))
+
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_ollama_client(host):
+    """Return the shared ``ollama.Client`` for ``host``, creating it once.
+
+    Each client wraps one ``httpx.Client`` (thread-safe) whose connection pool
+    keeps connections to the host alive between chats. The host is passed to
+    the client directly; ``OLLAMA_HOST`` in the environment is never touched.
+
+    Args:
+        host (str): Ollama base URL, e.g. "http://localhost:11434".
+
+    Returns:
+        ollama.Client: pooled client.
+    """
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(host)
+        if client is None:
+            client = ollama.Client(
+                host=host,
+                timeout=httpx.Timeout(OLLAMA_READ_TIMEOUT, connect=OLLAMA_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=OLLAMA_MAX_CONNECTIONS,
+                    max_keepalive_connections=OLLAMA_MAX_CONNECTIONS,
+                    keepalive_expiry=OLLAMA_KEEPALIVE_SECONDS,
+                ),
+            )
+            _CLIENTS[host] = client
+            print(f"🔌 Created pooled Ollama client for {host}")
+        return client
@@ -0,0 +1,143 @@
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import rasterio
+
+
+class RasterPool:
+    """Bounded, thread-safe pool of open rasterio datasets.
+
+    A GDAL dataset handle must not be used by two threads at once, so each
+    ``dataset()`` call checks out a handle of its own: an idle one for the
+    same file if there is one, otherwise a newly opened one. Handles go back
+    to the pool afterwards and the least recently used idle ones are closed
+    once more than ``max_open`` are open. Handles of a file whose mtime
+    changed are never reused. Files are opened and closed outside the pool's
+    lock, so a slow open never blocks other threads.
+
+    Args:
+        max_open (int): open datasets kept (busy handles may exceed it
+            briefly; they are closed on return).
+        name (str): label used in log lines.
+        opener (callable): ``opener(path)`` returns a new handle with a
+            ``close()`` method; ``rasterio.open`` by default, or e.g. a
+            rio-tiler ``Reader``.
+    """
+
+    def __init__(self, max_open=32, name="rasters", opener=None):
+        self.max_open = max_open
+        self.name = name
+        self.opener = opener or rasterio.open
+        self._lock = threading.Lock()
+        self._idle = OrderedDict()  # id(dataset) -> (key, dataset), LRU order
+        self._busy = 0
+        self._meta = {}  # key -> metadata of the file
+        self.opened = 0
+        self.closed = 0
+        self.reused = 0
+
+    @staticmethod
+    def _key(path):
+        path = os.path.abspath(path)
+        return path, os.stat(path).st_mtime_ns
+
+    def _checkout(self, key):
+        with self._lock:
+            for handle_id, (handle_key, dataset) in reversed(self._idle.items()):
+                if handle_key == key:
+                    del self._idle[handle_id]
+                    self._busy += 1
+                    self.reused += 1
+                    return dataset
+            self._busy += 1
+        try:
+            dataset = self.opener(key[0])
+        except BaseException:
+            with self._lock:
+                self._busy -= 1
+            raise
+        with self._lock:
+            self.opened += 1
+        return dataset
+
+    def _checkin(self, key, dataset):
+        to_close = []
+        with self._lock:
+            self._busy -= 1
+            self._idle[id(dataset)] = (key, dataset)
+            while self._idle and len(self._idle) + self._busy > self.max_open:
+                to_close.append(self._idle.popitem(last=False)[1][1])
+            # drop handles of files that changed since they were opened
+            for handle_id, (handle_key, old) in list(self._idle.items()):
+                if handle_key[0] == key[0] and handle_key != key:
+                    del self._idle[handle_id]
+                    to_close.append(old)
+            self.closed += len(to_close)
+        for old in to_close:
+            old.close()
+
+    @contextmanager
+    def dataset(self, path):
+        """``with pool.dataset(path) as src:`` an open dataset for this thread."""
+        key = self._key(path)
+        dataset = self._checkout(key)
+        try:
+            yield dataset
+        except BaseException:
+            # a failed read may leave the handle in a bad state
+            with self._lock:
+                self._busy -= 1
+                self.closed += 1
+            dataset.close()
+            raise
+        else:
+            self._checkin(key, dataset)
+
+    def metadata(self, path):
+        """Cached size, band count, CRS and affine transform of a raster.
+
+        Returns:
+            dict: {"width", "height", "count", "crs", "transform"}.
+        """
+        key = self._key(path)
+        with self._lock:
+            meta = self._meta.get(key)
+        if meta is None:
+            with self.dataset(path) as src:
+                meta = {
+                    "width": src.width,
+                    "height": src.height,
+                    "count": src.count,
+                    "crs": src.crs,
+                    "transform": src.transform,
+                }
+            with self._lock:
+                self._meta[key] = meta
+        return meta
+
+    def close_all(self):
+        """Close every idle handle (busy ones close when they are returned)."""
+        with self._lock:
+            idle = [dataset for _, dataset in self._idle.values()]
+            self._idle.clear()
+            self._meta.clear()
+            self.closed += len(idle)
+        for dataset in idle:
+            dataset.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "idle": len(self._idle),
+                "busy": self._busy,
+                "max_open": self.max_open,
+                "opened": self.opened,
+                "reused": self.reused,
+                "closed": self.closed,
+            }
+
+
+RASTER_POOL = RasterPool(int(os.environ.get("RASTER_POOL_SIZE", "32")), name="rasters")
@@ -0,0 +1,167 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import closing
+
+from image_cache import ByteLRUCache
+
+# sha256 of image files, keyed by (path, mtime, size) so unchanged ROIs are
+# not re-read on every lookup
+_DIGESTS = ByteLRUCache(16 * 1024 ** 2, name="image_digests")
+
+
+def file_digest(path):
+    """sha256 hex digest of a file's content (memoized per path, mtime and size)."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+    def _hash():
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    return _DIGESTS.get_or_load(key, _hash)
+
+
+def normalize_prompt(prompt):
+    """Case- and whitespace-insensitive form of a prompt."""
+    return re.sub(r"\s+", " ", prompt or "").strip().lower()
+
+
+def _message_fingerprint(message):
+    images = []
+    for path in message.get("images") or []:
+        try:
+            images.append(file_digest(path))
+        except OSError:
+            images.append(f"missing:{path}")
+    return [message.get("role"), message.get("content", ""), images]
+
+
+def response_key(model, prompt, images, history):
+    """Cache key of one chat turn.
+
+    Args:
+        model (str): model name.
+        prompt (str): user prompt (normalized before hashing).
+        images (list[str]): ROI images attached to the prompt.
+        history (list[dict]): messages sent to the model before the prompt
+            (the effective window, including any summary message).
+
+    Returns:
+        str: sha256 hex digest.
+    """
+    payload = {
+        "model": model,
+        "prompt": normalize_prompt(prompt),
+        "images": _message_fingerprint({"images": images})[2],
+        "history": [_message_fingerprint(m) for m in history],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Model replies stored in a local SQLite file, with TTL and size eviction.
+
+    Each operation opens its own connection, so the cache is safe to share
+    between threads and between worker processes on the same host.
+
+    Args:
+        path (str): SQLite database file.
+        ttl_seconds (float): age after which entries are ignored and purged.
+        max_entries (int): entries kept; the least recently used are evicted.
+    """
+
+    def __init__(self, path, ttl_seconds=7 * 86400, max_entries=5000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with closing(self._connect()) as db, db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " model TEXT NOT NULL,"
+                " response TEXT NOT NULL,"
+                " created REAL NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, key):
+        """Return the cached reply for ``key`` or None."""
+        now = time.time()
+        with closing(self._connect()) as db, db:
+            row = db.execute(
+                "SELECT response FROM responses WHERE key = ? AND created >= ?",
+                (key, now - self.ttl_seconds),
+            ).fetchone()
+            if row is not None:
+                db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0]
+
+    def put(self, key, model, response):
+        """Store a reply, then drop expired and least recently used entries.
+
+        Empty replies are not stored (they would be served as hits).
+        """
+        if not response:
+            return
+        now = time.time()
+        with closing(self._connect()) as db, db:
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created, last_used)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now),
+            )
+            removed = db.execute(
+                "DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,)
+            ).rowcount
+            removed += db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+        if removed:
+            with self._lock:
+                self.evictions += removed
+
+    def clear(self):
+        with closing(self._connect()) as db, db:
+            db.execute("DELETE FROM responses")
+
+    def stats(self):
+        with closing(self._connect()) as db, db:
+            entries = db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": "responses",
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
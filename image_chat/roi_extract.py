@@ -1,59 +1,443 @@
 
-import copy
 import json
-import rasterio
+import hashlib
+from rasterio.errors import RasterioIOError
+from rasterio.enums import Resampling
+from rasterio.windows import Window
+from rasterio.transform import Affine
 import os
 import cv2
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from image_cache import ByteLRUCache, file_key
+from file_lock import shared_lock
+from raster_pool import RASTER_POOL
+from roi_jobs import JobCancelled
+
+# Decoded real images shared by all sessions, keyed by (path, mtime).
+REAL_IMAGE_CACHE = ByteLRUCache(
+    int(os.environ.get("ROI_IMAGE_CACHE_MB", "512")) * 1024 ** 2,
+    name="real_image",
+)
+# Only images up to this decoded size are decoded whole; anything larger that
+# rasterio can read is cropped with windowed reads, so cost follows the ROI.
+ROI_FULL_DECODE_MB = int(os.environ.get("ROI_FULL_DECODE_MB", "64"))
+
+# cv2 releases the GIL while reading and encoding, so ROIs of one save run in
+# parallel; the pool is shared so concurrent sessions stay bounded.
+ENCODE_POOL = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("ROI_ENCODE_WORKERS", min(8, os.cpu_count() or 1))),
+    thread_name_prefix="roi-encode",
+)
+ROI_PNG_COMPRESSION = int(os.environ.get("ROI_PNG_COMPRESSION", "1"))
+ROI_EXTENSIONS = (".png", ".webp")
+ROI_INDEX_FILE = ".roi_index.json"
+# BGR colour of pixels outside the polygon in masked ROIs (slide background)
+ROI_MASK_FILL = (255, 255, 255)
+
+def geo_to_pixel(coords, transform, floor=True):
+    """Map geographic vertices to pixel coordinates in one affine transform.
 
-def get_coord_mapping(file_path):
-        """Get coordinate mapping from geographic to pixel.
-        
-        Args:
-            sample_id (str): sample id.
-        
-        Returns:
-            func: coordinate mapping function.
-        """
-        raster = rasterio.open(
-            file_path
-        )
-        return raster.index
-
-def get_bounding_box(coords):
-    """Get bounding box of coordinates.
-    
     Args:
-        coords (list of tuple): list of coordinates.
-    
+        coords (array-like): (N, 2+) vertices in the raster's CRS.
+        transform (Affine or list): raster affine transform (a, b, c, d, e, f).
+        floor (bool): floor to integer pixels like ``DatasetReader.index``.
+
+    Returns:
+        np.ndarray: (N, 2) pixel coordinates as (x=col, y=row).
+    """
+    if not isinstance(transform, Affine):
+        transform = Affine(*transform[:6])
+    xy = np.asarray(coords, dtype=np.float64)[:, :2]
+    # apply the inverse coefficients directly: affine>=3 no longer maps
+    # tuples of arrays through ``*``
+    a, b, c, d, e, f = (~transform)[:6]
+    cols = a * xy[:, 0] + b * xy[:, 1] + c
+    rows = d * xy[:, 0] + e * xy[:, 1] + f
+    pixels = np.column_stack([cols, rows])
+    return np.floor(pixels).astype(np.int64) if floor else pixels
+
+def fit_pixel_budget(width, height, max_pixels=None):
+    """Output size of a ``width`` x ``height`` crop scaled to a pixel budget.
+
+    Args:
+        width (int): crop width.
+        height (int): crop height.
+        max_pixels (int, optional): maximum width * height; None disables.
+
+    Returns:
+        tuple[int, int]: (width, height), unchanged if already within budget.
+    """
+    if not max_pixels or width * height <= max_pixels:
+        return width, height
+    scale = (max_pixels / float(width * height)) ** 0.5
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+def read_window(image_path, x1, y1, x2, y2, max_pixels=None):
+    """Decode only the pixels inside a bounding box of the real image.
+
+    Uses a rasterio ``Window`` so that GDAL only decodes the tiles (or strips)
+    covering the box, instead of the whole slide. The result has the same
+    layout as ``cv2.imread``: uint8, (H, W, 3), BGR channel order.
+    With ``max_pixels`` the window is decimated during the read; GDAL then
+    serves it from the closest overview level when the file has one.
+
+    Args:
+        image_path (str): path to the real image.
+        x1, y1, x2, y2 (int): bounding box in pixel space.
+        max_pixels (int, optional): pixel budget of the returned crop.
+
+    Returns:
+        np.ndarray: cropped BGR image (may be empty if the box is off-image).
+    """
+    with RASTER_POOL.dataset(image_path) as src:
+        col_off = min(max(int(x1), 0), src.width)
+        row_off = min(max(int(y1), 0), src.height)
+        col_end = min(max(int(x2), 0), src.width)
+        row_end = min(max(int(y2), 0), src.height)
+        window = Window(col_off, row_off, col_end - col_off, row_end - row_off)
+
+        bands = [1, 2, 3] if src.count >= 3 else [1]
+        out_w, out_h = fit_pixel_budget(window.width, window.height, max_pixels)
+        if (out_w, out_h) == (window.width, window.height):
+            data = src.read(bands, window=window)
+        else:
+            data = src.read(
+                bands,
+                window=window,
+                out_shape=(len(bands), out_h, out_w),
+                resampling=Resampling.average,
+            )
+
+    if data.dtype != np.uint8:
+        data = cv2.normalize(data, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+    if data.shape[0] == 1:
+        data = np.repeat(data, 3, axis=0)
+    # (bands, H, W) RGB -> (H, W, bands) BGR, same as cv2.imread
+    return np.ascontiguousarray(data[::-1].transpose(1, 2, 0))
+
+def supports_windowed_read(image_path):
+    """Check whether GDAL can open the real image for windowed reads.
+
+    Args:
+        image_path (str): path to the real image.
+
+    Returns:
+        bool: True if ``read_window`` can be used.
+    """
+    try:
+        RASTER_POOL.metadata(image_path)
+        return True
+    except (RasterioIOError, OSError):
+        return False
+
+def image_size(image_path, real_image=None):
+    """Width and height of the real image, without decoding it if possible.
+
+    Args:
+        image_path (str): path to the real image.
+        real_image (np.ndarray, optional): already decoded image.
+
     Returns:
-        tuple: bounding box.
+        tuple[int, int]: (width, height).
     """
-    x_coords, y_coords = zip(*coords)
-    x1, y1 = min(x_coords), min(y_coords)
-    x2, y2 = max(x_coords), max(y_coords)
+    if real_image is None and supports_windowed_read(image_path):
+        meta = RASTER_POOL.metadata(image_path)
+        return meta["width"], meta["height"]
+    if real_image is None:
+        real_image = load_real_image(image_path)
+    return real_image.shape[1], real_image.shape[0]
+
+def clamp_box(box, width, height):
+    """Clip a pixel bounding box to the image.
+
+    Returns:
+        tuple or None: (x1, y1, x2, y2) inside the image, or None if the box
+        is empty once clipped (fully off-image or zero width/height).
+    """
+    x1, y1, x2, y2 = box
+    x1, x2 = min(max(x1, 0), width), min(max(x2, 0), width)
+    y1, y2 = min(max(y1, 0), height), min(max(y2, 0), height)
+    if x2 <= x1 or y2 <= y1:
+        return None
     return x1, y1, x2, y2
 
-def save_roi(drawn_geojson, file_path, output_dir=None, cleanup_old=False):
+def load_real_image(image_path):
+    """Return the decoded real image from the process-wide cache.
+
+    Images rasterio can read whose decoded size exceeds ``ROI_FULL_DECODE_MB``
+    (or the cache budget) are not decoded at all and None is returned, so the
+    caller falls back to ``read_window``.
+
+    Args:
+        image_path (str): path to the real image.
+
+    Returns:
+        np.ndarray or None: read-only BGR image shared between sessions.
+    """
+    def _decode():
+        windowed = supports_windowed_read(image_path)
+        if windowed:
+            meta = RASTER_POOL.metadata(image_path)
+            width, height = meta["width"], meta["height"]
+            limit = min(ROI_FULL_DECODE_MB * 1024 ** 2, REAL_IMAGE_CACHE.max_bytes)
+            if width * height * 3 > limit:
+                return None
+
+        print(f"🖼️ Decoding real image into cache: {image_path}")
+        image = cv2.imread(image_path)
+        if image is None and windowed:
+            image = read_window(image_path, 0, 0, width, height)
+        if image is None:
+            raise ValueError("❌ Failed to read real image file")
+        return image
+
+    return REAL_IMAGE_CACHE.get_or_load(file_key(image_path), _decode)
+
+def find_real_image(parent, layer_type):
+    """Locate the full-resolution real image for a layer.
+
+    Args:
+        parent (str): sample folder.
+        layer_type (str): "base_layer" or "cell_types".
+
+    Returns:
+        str: path to the real image file.
+    """
+    real_img_path = os.path.join(parent, "real_image", layer_type)
+    if not os.path.isdir(real_img_path):
+        # fallback to single real_image folder if layer-specific one doesn't exist
+        real_img_path = os.path.join(parent, "real_image")
+
+    if not os.path.isdir(real_img_path):
+        raise FileNotFoundError(f"Missing folder: {real_img_path}")
+
+    real_img_file = os.listdir(real_img_path)[0]
+    return os.path.join(real_img_path, real_img_file)
+
+def encode_params(image_format="png", png_compression=None):
+    """Build the file extension and ``cv2.imwrite`` flags for an ROI format.
+
+    Args:
+        image_format (str): "png" or "webp" (lossless WebP, faster to encode
+            than PNG at comparable size).
+        png_compression (int, optional): PNG zlib level 0-9; lower is faster.
+
+    Returns:
+        tuple[str, list[int]]: extension (with dot) and imwrite params.
+    """
+    image_format = image_format.lower()
+    if image_format == "png":
+        level = ROI_PNG_COMPRESSION if png_compression is None else png_compression
+        return ".png", [cv2.IMWRITE_PNG_COMPRESSION, int(level)]
+    if image_format == "webp":
+        # quality > 100 selects lossless WebP
+        return ".webp", [cv2.IMWRITE_WEBP_QUALITY, 101]
+    raise ValueError(f"Unsupported ROI format: {image_format}")
+
+def polygon_area(polygon):
+    """Area in pixels of a polygon given as (N, 2) pixel coordinates (shoelace)."""
+    x, y = polygon[:, 0], polygon[:, 1]
+    return float(abs(np.dot(x, np.roll(y, 1)) - np.dot(y, np.roll(x, 1))) / 2)
+
+def mask_polygon(cropped, polygon, box, mode="fill", fill=ROI_MASK_FILL):
+    """Blank the pixels of a crop that lie outside the drawn polygon.
+
+    Args:
+        cropped (np.ndarray): BGR crop of ``box`` (possibly downscaled).
+        polygon (np.ndarray): (N, 2) polygon in full-resolution pixel (x, y).
+        box (tuple): (x1, y1, x2, y2) the crop was taken from.
+        mode (str): "fill" paints outside pixels with ``fill``; "alpha"
+            also adds an alpha channel that makes them transparent.
+        fill (tuple): BGR colour for outside pixels.
+
+    Returns:
+        np.ndarray: new BGR or BGRA image.
+    """
+    x1, y1, x2, y2 = box
+    h, w = cropped.shape[:2]
+    scale = np.array([w / max(x2 - x1, 1), h / max(y2 - y1, 1)])
+    local = np.round((polygon - [x1, y1]) * scale).astype(np.int32)
+    mask = np.zeros((h, w), dtype=np.uint8)
+    cv2.fillPoly(mask, [local], 255)
+
+    inside = mask.astype(bool)
+    masked = np.empty_like(cropped)
+    masked[:] = fill
+    masked[inside] = cropped[inside]
+    if mode == "alpha":
+        masked = np.dstack([masked, mask])
+    return masked
+
+def crop_and_encode(real_image, real_img_file, box, save_path, params, max_pixels=None,
+                    polygon=None, mask_mode=None):
+    """Crop one ROI and write it to disk (runs on the encode pool).
+
+    Args:
+        real_image (np.ndarray or None): cached full image, or None to use
+            a windowed read of ``real_img_file``.
+        real_img_file (str): path to the real image.
+        box (tuple): (x1, y1, x2, y2) in pixel space, clamped to the image.
+        save_path (str): output file.
+        params (list[int]): ``cv2.imwrite`` flags.
+        max_pixels (int, optional): downscale crops larger than this.
+        polygon (np.ndarray, optional): drawn polygon in pixel (x, y).
+        mask_mode (str, optional): "fill" or "alpha" to keep only the
+            pixels inside ``polygon`` (see ``mask_polygon``).
+
+    Returns:
+        str: ``save_path``.
+    """
+    x1, y1, x2, y2 = box
+    if real_image is None:
+        cropped = read_window(real_img_file, x1, y1, x2, y2, max_pixels)
+    else:
+        # a view into the shared image, no copy
+        cropped = real_image[y1:y2, x1:x2]
+        out_w, out_h = fit_pixel_budget(cropped.shape[1], cropped.shape[0], max_pixels)
+        if (out_w, out_h) != (cropped.shape[1], cropped.shape[0]):
+            cropped = cv2.resize(cropped, (out_w, out_h), interpolation=cv2.INTER_AREA)
+    if not cropped.size:
+        raise ValueError(f"❌ Empty ROI crop {box}")
+    if mask_mode and polygon is not None:
+        cropped = mask_polygon(cropped, polygon, box, mask_mode)
+    if not cv2.imwrite(save_path, cropped, params):
+        raise ValueError(f"❌ Failed to write ROI {save_path}")
+    return save_path
+
+def feature_hash(region, file_path, source_mtime, ext, params, max_pixels=None, occurrence=0,
+                 mask_mode=None):
+    """Content hash of one drawn feature and the settings used to crop it.
+
+    Args:
+        region (dict): GeoJSON feature.
+        file_path (str): raster the feature was drawn on (source layer).
+        source_mtime (int): mtime of the real image, so edits re-crop.
+        ext (str): output extension.
+        params (list[int]): encode flags.
+        max_pixels (int, optional): pixel budget of the crop.
+        occurrence (int): index among features with identical geometry.
+        mask_mode (str, optional): polygon masking mode.
+
+    Returns:
+        str: hex digest.
+    """
+    fields = [region["geometry"], file_path, source_mtime, ext, params, max_pixels, occurrence]
+    if mask_mode:
+        fields.append(mask_mode)
+    payload = json.dumps(fields, sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+def load_roi_index(roi_path):
+    """Read the {feature hash: file name} index of an ROI folder."""
+    try:
+        with open(os.path.join(roi_path, ROI_INDEX_FILE), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def write_roi_index(roi_path, index):
+    """Atomically replace the ROI index of a folder."""
+    path = os.path.join(roi_path, ROI_INDEX_FILE)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp, path)
+
+def _roi_dir_lock(roi_path):
+    """Lock of an ROI folder, held against other threads and worker processes."""
+    # one lock per ROI folder so overlapping draw events don't interleave
+    return shared_lock("roi", os.path.abspath(roi_path))
+
+def clear_rois(roi_path):
+    """Delete every saved ROI image and the index of an ROI folder.
+
+    Returns:
+        int: number of images removed.
+    """
+    removed = 0
+    with _roi_dir_lock(roi_path):
+        for f in os.listdir(roi_path):
+            if f.endswith(ROI_EXTENSIONS):
+                os.remove(os.path.join(roi_path, f))
+                removed += 1
+        index_path = os.path.join(roi_path, ROI_INDEX_FILE)
+        if os.path.exists(index_path):
+            os.remove(index_path)
+    return removed
+
+def save_roi(
+    drawn_geojson,
+    file_path,
+    output_dir=None,
+    cleanup_old=False,
+    image_format="png",
+    png_compression=None,
+    incremental=False,
+    max_pixels=None,
+    real_img_file=None,
+    transform=None,
+    mask_mode=None,
+    details=False,
+    cancel_event=None,
+    progress=None,
+):
     """
     Process drawn ROI polygons and return list of cropped image paths.
     Supports session isolation (via output_dir) and layer separation (base vs cell_types).
+    Crops are encoded in parallel on a bounded thread pool.
+
+    With ``incremental=True`` the folder keeps an index of content hashes
+    (geometry + source layer + encode settings): unchanged features are kept
+    (renamed if their position in the list moved), only new or modified ones
+    are cropped, and files of removed features are deleted.
 
     Args:
         drawn_geojson (dict): GeoJSON from EditControl.
         file_path (str): Full path to original image.
         output_dir (str, optional): Custom output directory for multi-user/session-safe saving.
         cleanup_old (bool): If True, delete stale ROIs before saving new ones.
+        image_format (str): "png" (default) or "webp" (lossless).
+        png_compression (int, optional): PNG compression level 0-9.
+        incremental (bool): Only crop features that changed since the last call.
+        max_pixels (int, optional): Pixel budget per ROI (e.g. the vision
+            model's input size). Larger regions are read decimated, from
+            raster overviews when available, and saved at reduced size.
+            File names keep full-resolution bounding-box coordinates.
+        real_img_file (str, optional): Source image to crop from (e.g. from
+            the sample index); looked up in ``real_image/`` if not given.
+        transform (list, optional): Affine coefficients (a, b, c, d, e, f)
+            of ``file_path``; read through ``RASTER_POOL`` if not given.
+        mask_mode (str, optional): "fill" (outside pixels painted with
+            ``ROI_MASK_FILL``) or "alpha" (also transparent) to keep only the
+            pixels inside each polygon instead of its whole bounding box.
+        details (bool): Return one dict per ROI instead of paths.
+        cancel_event (threading.Event, optional): Checked between crops; once
+            set, pending crops are dropped and ``JobCancelled`` is raised.
+            With ``incremental=True`` the index keeps every finished crop.
+        progress (callable, optional): ``progress(done, total)`` after each
+            ROI is saved or reused.
 
     Returns:
-        list[str]: Saved cropped image paths.
+        list[str]: Saved cropped image paths, or with ``details=True``
+        ``[{"path", "box", "area", "box_area"}]`` where ``area`` is the
+        polygon's (masked) area in full-resolution pixels. Boxes are clipped
+        to the image; features entirely outside it are skipped.
     """
     if not drawn_geojson or "features" not in drawn_geojson:
         print("⚠️ No ROI drawn.")
         return []
 
-    # --- Setup paths ---
-    mapper = get_coord_mapping(file_path)
+    # --- Map every vertex of every feature to pixels at once ---
+    if transform is None:
+        transform = RASTER_POOL.metadata(file_path)["transform"]
+    features = drawn_geojson["features"]
+    rings = [np.asarray(f["geometry"]["coordinates"][0], dtype=np.float64)[:, :2] for f in features]
+    polygons = []
+    if rings:
+        pixels = geo_to_pixel(np.concatenate(rings), transform)
+        polygons = np.split(pixels, np.cumsum([len(r) for r in rings])[:-1])
+
     parent = os.path.dirname(file_path)
 
     # detect which layer we’re saving from
@@ -65,46 +449,146 @@ def save_roi(drawn_geojson, file_path, output_dir=None, cleanup_old=False):
     roi_path = output_dir or os.path.join(parent, "roi", layer_type)
     os.makedirs(roi_path, exist_ok=True)
 
-    real_img_path = os.path.join(parent, "real_image", layer_type)
-    if not os.path.isdir(real_img_path):
-        # fallback to single real_image folder if layer-specific one doesn't exist
-        real_img_path = os.path.join(parent, "real_image")
-
-    if not os.path.isdir(real_img_path):
-        raise FileNotFoundError(f"Missing folder: {real_img_path}")
-
-    real_img_file = os.listdir(real_img_path)[0]
-    real_image = cv2.imread(os.path.join(real_img_path, real_img_file))
-    if real_image is None:
-        raise ValueError("❌ Failed to read real image file")
-
-    # --- Optionally clear old ROIs ---
-    if cleanup_old:
-        for f in os.listdir(roi_path):
-            if f.startswith("roi_") and f.endswith(".png"):
+    if real_img_file is None:
+        real_img_file = find_real_image(parent, layer_type)
+    ext, params = encode_params(image_format, png_compression)
+
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    with _roi_dir_lock(roi_path):
+        if cancelled():
+            raise JobCancelled(roi_path)
+
+        # --- Optionally clear old ROIs ---
+        if cleanup_old and not incremental:
+            for f in os.listdir(roi_path):
+                if f.startswith("roi_") and f.endswith(ROI_EXTENSIONS):
+                    try:
+                        os.remove(os.path.join(roi_path, f))
+                        print(f"🗑️ Removed old ROI → {f}")
+                    except Exception:
+                        pass
+
+        # --- Plan visible ROIs ---
+        source_mtime = os.stat(real_img_file).st_mtime_ns
+        width, height = image_size(real_img_file)
+        old_index = load_roi_index(roi_path) if incremental else {}
+        new_index = {}
+        seen = {}
+        jobs = []  # (feature number, box, target name, hash)
+        for i, (region, polygon) in enumerate(zip(features, polygons)):
+            # the crop and the polygon mask both use the box clipped to the
+            # image, so polygons crossing the edge keep their shape
+            box = clamp_box(
+                tuple(int(v) for v in np.concatenate([polygon.min(axis=0), polygon.max(axis=0)])),
+                width, height,
+            )
+            if box is None:
+                print(f"⚠️ ROI #{i+1} lies outside the image, skipped.")
+                continue
+            x1, y1, x2, y2 = box
+
+            coord_name = f"{x1}_{y1}_{x2}_{y2}"
+            name = f"roi_{i}_{coord_name}{ext}"
+            geometry_key = json.dumps(region["geometry"], sort_keys=True)
+            occurrence = seen.get(geometry_key, 0)
+            seen[geometry_key] = occurrence + 1
+            digest = feature_hash(
+                region, file_path, source_mtime, ext, params, max_pixels, occurrence, mask_mode
+            )
+            new_index[digest] = name
+            jobs.append((i, box, name, digest, polygon.astype(np.float64)))
+
+        # --- Reuse unchanged ROIs (two-phase rename avoids name clashes) ---
+        reused = {
+            digest for digest, old_name in old_index.items()
+            if digest in new_index and os.path.exists(os.path.join(roi_path, old_name))
+        }
+        for digest, old_name in old_index.items():
+            if digest not in reused:
                 try:
-                    os.remove(os.path.join(roi_path, f))
-                    print(f"🗑️ Removed old ROI → {f}")
-                except Exception:
+                    os.remove(os.path.join(roi_path, old_name))
+                    print(f"🗑️ Removed old ROI → {old_name}")
+                except OSError:
                     pass
-
-    # --- Save visible ROIs ---
-    saved_paths = []
-    for i, region in enumerate(drawn_geojson["features"]):
-        coords = region["geometry"]["coordinates"][0]
-        coords = [mapper(*p) for p in coords]
-        coords = [[p[1], p[0]] for p in coords]  # flip to (x, y)
-        x1, y1, x2, y2 = get_bounding_box(coords)
-
-        cropped = copy.deepcopy(real_image)[y1:y2, x1:x2]
-        coord_name = f"{int(x1)}_{int(y1)}_{int(x2)}_{int(y2)}"
-        save_path = os.path.join(roi_path, f"roi_{i}_{coord_name}.png")
-
-        cv2.imwrite(save_path, cropped)
-        saved_paths.append(save_path)
-        print(f"✅ ROI #{i+1} saved → {save_path}")
-
-    return saved_paths
+        moved = []
+        for digest in reused:
+            old_name, new_name = old_index[digest], new_index[digest]
+            if old_name != new_name:
+                tmp_name = f".{digest}{ext}"
+                os.replace(os.path.join(roi_path, old_name), os.path.join(roi_path, tmp_name))
+                moved.append((tmp_name, new_name))
+        for tmp_name, new_name in moved:
+            os.replace(os.path.join(roi_path, tmp_name), os.path.join(roi_path, new_name))
+
+        # --- Crop new or modified ROIs ---
+        todo = [job for job in jobs if job[3] not in reused]
+        real_image = None
+        if todo:
+            # Images that fit the cache are decoded once and shared; larger
+            # slides are read tile-by-tile under each ROI instead.
+            real_image = load_real_image(real_img_file)
+        futures = {
+            digest: ENCODE_POOL.submit(
+                crop_and_encode, real_image, real_img_file, box,
+                os.path.join(roi_path, name), params, max_pixels, polygon, mask_mode,
+            )
+            for _, box, name, digest, polygon in todo
+        }
+
+        def wait(future):
+            while True:
+                try:
+                    return future.result(timeout=0.1)
+                except FutureTimeout:
+                    if not cancelled():
+                        continue
+                for pending in futures.values():
+                    pending.cancel()
+                if incremental:
+                    # keep what is on disk usable by the next call
+                    done = {
+                        d: n for d, n in new_index.items()
+                        if d in reused or (d in futures and futures[d].done()
+                                           and not futures[d].cancelled()
+                                           and futures[d].exception() is None)
+                    }
+                    write_roi_index(roi_path, done)
+                raise JobCancelled(roi_path)
+
+        saved_paths = []
+        saved = []
+        for n_done, (i, box, name, digest, polygon) in enumerate(jobs, 1):
+            save_path = os.path.join(roi_path, name)
+            if digest in futures:
+                wait(futures[digest])
+                print(f"✅ ROI #{i+1} saved → {save_path}")
+            else:
+                print(f"♻️ ROI #{i+1} unchanged → {save_path}")
+            saved_paths.append(save_path)
+            x1, y1, x2, y2 = box
+            saved.append({
+                "path": save_path,
+                "box": [int(x1), int(y1), int(x2), int(y2)],
+                "area": round(polygon_area(polygon)),
+                "box_area": int((x2 - x1) * (y2 - y1)),
+            })
+            if progress is not None:
+                progress(n_done, len(jobs))
+
+        if incremental:
+            # drop files left over from non-incremental saves
+            keep = set(new_index.values())
+            for f in os.listdir(roi_path):
+                if f.startswith("roi_") and f.endswith(ROI_EXTENSIONS) and f not in keep:
+                    try:
+                        os.remove(os.path.join(roi_path, f))
+                    except OSError:
+                        pass
+            write_roi_index(roi_path, new_index)
+
+    return saved if details else saved_paths
 
 
 
@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function once its job has been superseded."""
+
+
+class CancelToken:
+    """``is_set()`` is True once the job was cancelled or its owner moved on.
+
+    The owner's latest job id is kept in a file, so a newer job submitted in
+    another worker process cancels this one too.
+    """
+
+    def __init__(self, latest_path, job_id):
+        self._event = threading.Event()
+        self._latest_path = latest_path
+        self._job_id = job_id
+
+    def set(self):
+        self._event.set()
+
+    def is_set(self):
+        if self._event.is_set():
+            return True
+        try:
+            with open(self._latest_path, "r") as f:
+                latest = f.read().strip()
+        except OSError:
+            return False
+        if latest and latest != self._job_id:
+            self._event.set()
+        return self._event.is_set()
+
+    def check(self):
+        """Raise ``JobCancelled`` if the job was cancelled."""
+        if self.is_set():
+            raise JobCancelled(self._job_id)
+
+
+class JobQueue:
+    """Background jobs on a bounded pool, at most one live job per owner.
+
+    Submitting a job for an owner (a session) cancels that owner's previous
+    job: still-queued jobs never start and running ones stop at their next
+    ``cancel_event`` check. Job state is mirrored to ``state_dir`` so any
+    worker process can answer a status poll.
+
+    Args:
+        state_dir (str): folder for job status and owner files.
+        max_workers (int): jobs running at once.
+        keep_seconds (float): how long finished jobs stay queryable (an
+            owner's latest job is kept as long as its owner).
+        owner_seconds (float): how long an owner's latest job id is kept.
+        name (str): label used in log lines.
+    """
+
+    def __init__(self, state_dir, max_workers=2, keep_seconds=600, owner_seconds=86400, name="jobs"):
+        self.state_dir = state_dir
+        self.keep_seconds = keep_seconds
+        self.owner_seconds = owner_seconds
+        self.name = name
+        os.makedirs(state_dir, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._jobs = {}  # job id -> job
+        self._latest = {}  # owner -> job id
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.cancelled = 0
+
+    def _status_path(self, job_id):
+        return os.path.join(self.state_dir, f"{job_id}.json")
+
+    def _latest_path(self, owner):
+        return os.path.join(self.state_dir, f"owner-{owner.replace(os.sep, '_')}.latest")
+
+    @staticmethod
+    def _public(job):
+        return {k: job[k] for k in ("id", "owner", "status", "progress", "result", "error", "created", "updated")}
+
+    def _save(self, job):
+        job["updated"] = time.time()
+        path = self._status_path(job["id"])
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(self._public(job), f)
+        os.replace(f"{path}.tmp", path)
+
+    def submit(self, owner, fn, *args, **kwargs):
+        """Run ``fn(*args, cancel_event=..., progress=..., **kwargs)`` in the background.
+
+        ``progress(done, total)`` updates the job's progress; ``fn`` should
+        raise ``JobCancelled`` (or return) once ``cancel_event.is_set()``.
+
+        Returns:
+            str: job id.
+        """
+        job_id = uuid.uuid4().hex[:12]
+        latest_path = self._latest_path(owner)
+        with open(f"{latest_path}.tmp", "w") as f:
+            f.write(job_id)
+        os.replace(f"{latest_path}.tmp", latest_path)
+
+        job = {
+            "id": job_id,
+            "owner": owner,
+            "status": "queued",
+            "progress": {"done": 0, "total": 0},
+            "result": None,
+            "error": None,
+            "created": time.time(),
+            "updated": time.time(),
+            "cancel": CancelToken(latest_path, job_id),
+        }
+        with self._lock:
+            previous = self._jobs.get(self._latest.get(owner))
+            if previous is not None and previous["status"] in ("queued", "running"):
+                previous["cancel"].set()
+            self._jobs[job_id] = job
+            self._latest[owner] = job_id
+            self.submitted += 1
+        self._save(job)
+        self._purge()
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job_id
+
+    def _run(self, job, fn, args, kwargs):
+        cancel = job["cancel"]
+        if cancel.is_set():
+            self._finish(job, "cancelled")
+            return
+        job["status"] = "running"
+        self._save(job)
+
+        def progress(done, total):
+            job["progress"] = {"done": done, "total": total}
+            self._save(job)
+
+        try:
+            result = fn(*args, cancel_event=cancel, progress=progress, **kwargs)
+        except JobCancelled:
+            self._finish(job, "cancelled")
+        except Exception as e:
+            print(f"❌ {self.name} job {job['id']} failed: {e}")
+            self._finish(job, "failed", error=str(e))
+        else:
+            self._finish(job, "cancelled" if cancel.is_set() else "done", result=result)
+
+    def _finish(self, job, status, result=None, error=None):
+        job["status"] = status
+        job["result"] = result
+        job["error"] = error
+        if status == "cancelled":
+            with self._lock:
+                self.cancelled += 1
+            print(f"🛑 {self.name} job {job['id']} cancelled (superseded)")
+        self._save(job)
+
+    def status(self, job_id):
+        """Public state of a job (from any process), or None if unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return self._public(job)
+        try:
+            with open(self._status_path(job_id), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def latest(self, owner):
+        """Public state of ``owner``'s most recent job (from any process), or None."""
+        try:
+            with open(self._latest_path(owner), "r") as f:
+                job_id = f.read().strip()
+        except OSError:
+            return None
+        return self.status(job_id) if job_id else None
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            job["cancel"].set()
+        return job is not None
+
+    def _purge(self):
+        now = time.time()
+        cutoff = now - self.keep_seconds
+        # owners' latest jobs stay, so ``latest()`` keeps answering
+        latest = set()
+        for name in os.listdir(self.state_dir):
+            if not name.endswith(".latest"):
+                continue
+            path = os.path.join(self.state_dir, name)
+            try:
+                if os.stat(path).st_mtime < now - self.owner_seconds:
+                    os.remove(path)
+                    continue
+                with open(path, "r") as f:
+                    latest.add(f.read().strip())
+            except OSError:
+                pass
+        with self._lock:
+            for job_id, job in list(self._jobs.items()):
+                if job["status"] not in ("queued", "running") and job["updated"] < cutoff and job_id not in latest:
+                    del self._jobs[job_id]
+        for name in os.listdir(self.state_dir):
+            path = os.path.join(self.state_dir, name)
+            if name.endswith(".latest") or name[: -len(".json")] in latest:
+                continue
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            states = [job["status"] for job in self._jobs.values()]
+            return {
+                "name": self.name,
+                "queued": states.count("queued"),
+                "running": states.count("running"),
+                "submitted": self.submitted,
+                "cancelled": self.cancelled,
+            }
@@ -0,0 +1,154 @@
+import os
+
+import cv2
+import numpy as np
+from rasterio.enums import Resampling
+from rasterio.windows import Window
+
+from cell_palette import COLOR_DICT_CELLS, TYPE_NUCLEI_DICT_PANNUKE
+from raster_pool import RASTER_POOL
+from roi_extract import fit_pixel_budget, geo_to_pixel
+
+# Overlay pixels read per ROI; larger regions are read decimated (nearest
+# neighbour, so class colours are never blended) and counts scaled back.
+ROI_STATS_MAX_PIXELS = int(os.environ.get("ROI_STATS_MAX_PIXELS", str(4096 * 4096)))
+
+# palette as sorted 24-bit RGB codes -> class ids, for searchsorted lookups
+_CLASS_IDS = np.array(sorted(COLOR_DICT_CELLS), dtype=np.int64)
+_CODES = np.array(
+    [(r << 16) | (g << 8) | b for r, g, b in (COLOR_DICT_CELLS[i] for i in sorted(COLOR_DICT_CELLS))],
+    dtype=np.int64,
+)
+_ORDER = np.argsort(_CODES)
+_SORTED_CODES = _CODES[_ORDER]
+_SORTED_IDS = _CLASS_IDS[_ORDER]
+
+
+def class_name(class_id):
+    return TYPE_NUCLEI_DICT_PANNUKE.get(int(class_id), f"class {int(class_id)}")
+
+
+def classify_pixels(rgb):
+    """Map RGB pixels to palette class ids.
+
+    Args:
+        rgb (np.ndarray): (N, 3) uint8 pixels.
+
+    Returns:
+        np.ndarray: (N,) class ids, -1 where the colour is not in the palette.
+    """
+    rgb = rgb.astype(np.int64)
+    codes = (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+    pos = np.clip(np.searchsorted(_SORTED_CODES, codes), 0, len(_SORTED_CODES) - 1)
+    return np.where(_SORTED_CODES[pos] == codes, _SORTED_IDS[pos], -1)
+
+
+def roi_composition(overlay_path, transform, coords, max_pixels=ROI_STATS_MAX_PIXELS, count_cells=True):
+    """Cell-type composition of one polygon over the overlay raster.
+
+    Reads only the window under the polygon's bounding box, rasterizes the
+    polygon into a mask and counts palette classes with ``np.bincount``.
+
+    Args:
+        overlay_path (str): cell-type overlay raster.
+        transform (Affine or list): its affine transform.
+        coords (list): polygon ring in geographic coordinates.
+        max_pixels (int): read budget; larger windows are decimated.
+        count_cells (bool): also estimate cells per class as connected
+            components of labeled pixels (full-resolution reads only; a blob
+            of touching cells counts once for each class it contains).
+
+    Returns:
+        dict: {"pixels", "unlabeled_pixels", "scale", "classes": [{"id",
+        "name", "pixels", "fraction", "cells"}, ...]} sorted by pixels.
+    """
+    pixels = geo_to_pixel(coords, transform, floor=False)
+    with RASTER_POOL.dataset(overlay_path) as src:
+        col0 = int(np.clip(np.floor(pixels[:, 0].min()), 0, src.width))
+        row0 = int(np.clip(np.floor(pixels[:, 1].min()), 0, src.height))
+        col1 = int(np.clip(np.ceil(pixels[:, 0].max()), 0, src.width))
+        row1 = int(np.clip(np.ceil(pixels[:, 1].max()), 0, src.height))
+        width, height = col1 - col0, row1 - row0
+        if width <= 0 or height <= 0:
+            return {"pixels": 0, "unlabeled_pixels": 0, "scale": 1.0, "classes": []}
+
+        out_w, out_h = fit_pixel_budget(width, height, max_pixels)
+        bands = [1, 2, 3] if src.count >= 3 else [1, 1, 1]
+        data = src.read(
+            bands,
+            window=Window(col0, row0, width, height),
+            out_shape=(3, out_h, out_w),
+            resampling=Resampling.nearest,
+        )
+
+    # polygon in window-local, output-resolution pixel coordinates
+    sx, sy = out_w / width, out_h / height
+    local = (pixels - [col0, row0]) * [sx, sy]
+    mask = np.zeros((out_h, out_w), dtype=np.uint8)
+    cv2.fillPoly(mask, [np.round(local).astype(np.int32)], 1)
+    inside = mask.astype(bool)
+
+    rgb = data.transpose(1, 2, 0)[inside]
+    ids = classify_pixels(rgb)
+    counts = np.bincount(ids + 1, minlength=int(_CLASS_IDS.max()) + 2)
+
+    scale = 1.0 / (sx * sy)  # full-resolution pixels per read pixel
+    labeled = int(counts[1:].sum())
+
+    cells = None
+    if count_cells and scale == 1.0:
+        # label all cell pixels once, then count distinct (component, class) pairs
+        n_classes = len(counts) - 1
+        cell_mask = np.zeros_like(mask)
+        cell_mask[inside] = ids >= 0
+        n_labels, labels = cv2.connectedComponents(cell_mask, connectivity=8)
+        inside_labels = labels[inside]
+        valid = inside_labels > 0
+        pairs = np.unique(inside_labels[valid].astype(np.int64) * n_classes + ids[valid])
+        cells = np.bincount(pairs % n_classes, minlength=n_classes)
+    classes = []
+    for class_id in np.nonzero(counts[1:])[0]:
+        n = int(counts[class_id + 1])
+        entry = {
+            "id": int(class_id),
+            "name": class_name(class_id),
+            "pixels": int(round(n * scale)),
+            "fraction": round(n / labeled, 4),
+            "cells": int(cells[class_id]) if cells is not None else None,
+        }
+        classes.append(entry)
+    classes.sort(key=lambda c: c["pixels"], reverse=True)
+
+    return {
+        "pixels": int(round(int(inside.sum()) * scale)),
+        "unlabeled_pixels": int(round(int(counts[0]) * scale)),
+        "scale": round(scale, 3),
+        "classes": classes,
+    }
+
+
+def roi_stats(drawn_geojson, overlay_path, transform, **kwargs):
+    """``roi_composition`` of every polygon in an EditControl GeoJSON.
+
+    Returns:
+        list[dict]: one entry per feature, with its "index".
+    """
+    stats = []
+    for i, feature in enumerate((drawn_geojson or {}).get("features", [])):
+        coords = feature["geometry"]["coordinates"][0]
+        entry = roi_composition(overlay_path, transform, coords, **kwargs)
+        entry["index"] = i
+        stats.append(entry)
+    return stats
+
+
+def format_stats(stats, top=8):
+    """Plain-text summary of ``roi_stats`` output for the model prompt."""
+    lines = []
+    for entry in stats:
+        parts = []
+        for c in entry["classes"][:top]:
+            cells = f", ~{c['cells']} cells" if c["cells"] is not None else ""
+            parts.append(f"{c['name']} {c['fraction'] * 100:.1f}%{cells}")
+        lines.append(f"ROI {entry['index'] + 1} ({entry['pixels']} px): " + ("; ".join(parts) or "no labeled cells"))
+    return "\n".join(lines)
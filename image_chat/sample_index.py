@@ -0,0 +1,276 @@
+"""Manifest of every sample in the database, so page loads skip NFS probing.
+
+Usage:
+    python sample_index.py                 # refresh changed samples
+    python sample_index.py TCGA-XX-XXXX    # only these samples
+    python sample_index.py --force
+
+For each sample folder the index records the base/overlay raster paths (and
+the prebuilt COG the tile server will use), their size, CRS, affine
+transform, geographic bounds and zoom range, the real images used for ROI
+crops, and the classes from ``present_cell_types.json``. A sample is
+re-scanned only when the mtime of one of those inputs changed.
+
+The viewer loads the index once into memory (``SAMPLE_INDEX``) and reloads
+it when the file is rewritten. Samples missing from it are scanned on first
+use and kept in memory, and an entry whose inputs changed since it was
+indexed is re-scanned on use (checked at most every ``RELOAD_SECONDS``).
+"""
+import os
+import json
+import glob
+import time
+import argparse
+import threading
+
+import rasterio
+from rio_tiler.io import Reader
+
+from tile_server import DATABASE_DIR, LAYER_FILES, cog_path
+
+INDEX_PATH = os.environ.get("SAMPLE_INDEX_PATH", os.path.join(DATABASE_DIR, ".sample_index.json"))
+INDEX_VERSION = 1
+
+CLASSES_FILE = "present_cell_types.json"
+
+# layer name -> ROI layer type (folder names under real_image/ and roi/)
+LAYER_TYPES = {
+    "base": "base_layer",
+    "overlay": "cell_types",
+}
+
+# seconds between checks of the index file (and of a sample's inputs) for
+# a newer version
+RELOAD_SECONDS = float(os.environ.get("SAMPLE_INDEX_RELOAD_SECONDS", "30"))
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _real_image(sample_dir, layer_type):
+    """Real image of a layer: ``real_image/<layer_type>/`` or ``real_image/``."""
+    for folder in (os.path.join(sample_dir, "real_image", layer_type), os.path.join(sample_dir, "real_image")):
+        if os.path.isdir(folder):
+            files = sorted(f for f in os.listdir(folder) if os.path.isfile(os.path.join(folder, f)))
+            if files:
+                return os.path.join(folder, files[0])
+    return None
+
+
+def _signature(sample_dir):
+    """mtimes of everything a sample entry is derived from."""
+    paths = [os.path.join(sample_dir, CLASSES_FILE), os.path.join(sample_dir, "real_image")]
+    paths += [os.path.join(sample_dir, "real_image", t) for t in LAYER_TYPES.values()]
+    for file_name in LAYER_FILES.values():
+        src = os.path.join(sample_dir, file_name)
+        paths += [src, cog_path(src)]
+    return {os.path.relpath(p, sample_dir): _mtime(p) for p in paths}
+
+
+def _raster_info(src):
+    # same choice as tile_server.raster_path: the COG if it is up to date
+    path = src
+    cog = cog_path(src)
+    if (_mtime(cog) or 0) >= _mtime(src):
+        path = cog
+    with rasterio.open(src) as ds:
+        info = {
+            "source": src,
+            "path": path,
+            "mtime_ns": _mtime(path),
+            "width": ds.width,
+            "height": ds.height,
+            "count": ds.count,
+            "crs": ds.crs.to_string() if ds.crs else None,
+            "transform": list(ds.transform)[:6],
+        }
+    with Reader(path) as reader:
+        west, south, east, north = reader.geographic_bounds
+        info["bounds"] = [[south, west], [north, east]]
+        info["min_zoom"] = reader.minzoom
+        info["max_zoom"] = reader.maxzoom
+    return info
+
+
+def scan_sample(sample_dir):
+    """Build the index entry of one sample folder.
+
+    Returns:
+        dict: entry with "layers", "real_images", "classes" and "signature".
+    """
+    entry = {"signature": _signature(sample_dir), "layers": {}, "real_images": {}, "classes": []}
+    for layer, file_name in LAYER_FILES.items():
+        src = os.path.join(sample_dir, file_name)
+        if os.path.exists(src):
+            entry["layers"][layer] = _raster_info(src)
+    for layer_type in LAYER_TYPES.values():
+        entry["real_images"][layer_type] = _real_image(sample_dir, layer_type)
+
+    classes_path = os.path.join(sample_dir, CLASSES_FILE)
+    if os.path.exists(classes_path):
+        with open(classes_path, "r") as f:
+            entry["classes"] = json.load(f)
+    return entry
+
+
+def load_index(path=INDEX_PATH):
+    try:
+        with open(path, "r") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if index.get("version") != INDEX_VERSION:
+        return {}
+    return index.get("samples", {})
+
+
+def write_index(samples, path=INDEX_PATH):
+    """Atomically replace the index file."""
+    with open(f"{path}.tmp", "w") as f:
+        json.dump({"version": INDEX_VERSION, "built": time.time(), "samples": samples}, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def refresh_index(root=DATABASE_DIR, samples=None, force=False, path=INDEX_PATH):
+    """Re-scan samples whose inputs changed and rewrite the index.
+
+    Args:
+        root (str): database folder.
+        samples (list[str], optional): sample names (default: all folders).
+        force (bool): re-scan unchanged samples too.
+        path (str): index file.
+
+    Returns:
+        tuple[int, int, int]: samples scanned, unchanged and failed.
+    """
+    index = load_index(path)
+    if samples:
+        names = samples
+    else:
+        names = sorted(
+            os.path.basename(d) for d in glob.glob(os.path.join(root, "*")) if os.path.isdir(d)
+        )
+        # drop samples that were removed from the database
+        index = {name: entry for name, entry in index.items() if name in set(names)}
+
+    scanned = unchanged = failed = 0
+    for name in names:
+        sample_dir = os.path.join(root, name)
+        old = index.get(name)
+        if not force and old and old.get("signature") == _signature(sample_dir):
+            unchanged += 1
+            continue
+        try:
+            index[name] = scan_sample(sample_dir)
+            scanned += 1
+            print(f"✅ {name}: indexed")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {name}: {e}")
+
+    write_index(index, path)
+    return scanned, unchanged, failed
+
+
+class SampleIndex:
+    """In-memory view of the manifest, reloaded when the file changes.
+
+    Entries are re-validated against their sample's signature on use, at
+    most every ``RELOAD_SECONDS`` per sample, so a rebuilt raster or edited
+    class list is picked up before the next ``refresh_index`` run.
+
+    Args:
+        path (str): index file.
+        root (str): database folder (for samples scanned on demand).
+    """
+
+    def __init__(self, path=INDEX_PATH, root=DATABASE_DIR):
+        self.path = path
+        self.root = root
+        self._samples = {}
+        self._extra = {}  # samples scanned on demand, newer than the file
+        self._verified = {}  # sample -> time its signature was last checked
+        self._mtime = -1  # never loaded
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if self._checked and now - self._checked < RELOAD_SECONDS:
+            return
+        self._checked = now
+        mtime = _mtime(self.path)
+        if mtime != self._mtime:
+            self._samples = load_index(self.path)
+            self._extra = {}
+            self._verified = {}
+            self._mtime = mtime
+            print(f"📇 Loaded sample index ({len(self._samples)} samples) from {self.path}")
+
+    def get(self, sample):
+        """Index entry of ``sample`` (scanned and memoized if not indexed yet).
+
+        Raises:
+            KeyError: the sample folder does not exist in the database.
+        """
+        with self._lock:
+            self._maybe_reload()
+            entry = self._extra.get(sample) or self._samples.get(sample)
+            now = time.monotonic()
+            stale_check = now - self._verified.get(sample, -RELOAD_SECONDS) >= RELOAD_SECONDS
+            if entry is not None and not stale_check:
+                return entry
+            self._verified[sample] = now
+
+        sample_dir = os.path.realpath(os.path.join(self.root, sample))
+        if not sample_dir.startswith(os.path.realpath(self.root) + os.sep) or not os.path.isdir(sample_dir):
+            raise KeyError(f"Unknown sample: {sample}")
+        if entry is not None:
+            if entry.get("signature") == _signature(sample_dir):
+                return entry
+            print(f"🔄 {sample} changed since it was indexed; re-scanning it")
+        else:
+            print(f"⚠️ {sample} not in the sample index; scanning it now")
+        entry = scan_sample(sample_dir)
+        with self._lock:
+            self._extra[sample] = entry
+        return entry
+
+    def invalidate(self, sample=None):
+        """Forget an on-demand entry (or force a reload of the whole index)."""
+        with self._lock:
+            if sample is None:
+                self._mtime = -1
+                self._checked = 0.0
+            self._extra.pop(sample, None)
+            self._verified.pop(sample, None)
+
+    def __len__(self):
+        with self._lock:
+            self._maybe_reload()
+            return len(self._samples)
+
+
+SAMPLE_INDEX = SampleIndex()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("samples", nargs="*", help="sample names (default: all)")
+    parser.add_argument("--root", default=DATABASE_DIR, help="database folder")
+    parser.add_argument("--index", default=INDEX_PATH, help="index file")
+    parser.add_argument("--force", action="store_true", help="re-scan unchanged samples")
+    args = parser.parse_args()
+
+    print(f"📇 Refreshing sample index {args.index}")
+    scanned, unchanged, failed = refresh_index(args.root, args.samples, args.force, args.index)
+    print(f"🏁 Done ({scanned} scanned, {unchanged} unchanged, {failed} failed)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,18 @@
+import json
+
+
+def sse_event(data, event=None):
+    """Format one Server-Sent Event.
+
+    ``data`` is sent as one line of JSON (newlines inside strings are
+    escaped), so a token can never end the event early.
+
+    Args:
+        data: JSON-serializable payload.
+        event (str, optional): event name; omitted for plain messages.
+
+    Returns:
+        str: the event, terminated by a blank line.
+    """
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(data)}\n\n"
@@ -0,0 +1,112 @@
+import threading
+
+import pytest
+
+from admission import AdmissionQueue, QueueFull
+
+
+def test_one_request_per_session():
+    queue = AdmissionQueue(max_in_flight=1, max_queue=4)
+    queue.enqueue("a")
+    with pytest.raises(QueueFull) as exc:
+        queue.enqueue("a")
+    assert exc.value.status == 429
+    queue.enqueue("b")  # other sessions are not affected
+
+
+def test_queue_full_is_rejected():
+    queue = AdmissionQueue(max_in_flight=1, max_queue=2)
+    queue.enqueue("a")
+    queue.enqueue("b")
+    with pytest.raises(QueueFull) as exc:
+        queue.enqueue("c")
+    assert exc.value.status == 503
+    assert queue.stats()["rejected"] == 1
+
+
+def test_admission_is_fifo():
+    queue = AdmissionQueue(max_in_flight=1, max_queue=8)
+    first = queue.enqueue("first")
+    assert queue.wait(first, timeout=0)
+
+    order = []
+    tickets = [queue.enqueue(f"s{i}") for i in range(3)]
+    assert [queue.position(t) for t in tickets] == [1, 2, 3]
+
+    def worker(ticket):
+        assert queue.wait(ticket, timeout=5)
+        order.append(ticket["session_id"])
+        queue.release(ticket)
+
+    # start the threads in reverse to show admission follows queue order
+    threads = [threading.Thread(target=worker, args=(t,)) for t in reversed(tickets)]
+    for thread in threads:
+        thread.start()
+    queue.release(first)
+    for thread in threads:
+        thread.join(5)
+
+    assert order == ["s0", "s1", "s2"]
+
+
+def test_wait_times_out_and_keeps_place():
+    queue = AdmissionQueue(max_in_flight=1, max_queue=4)
+    running = queue.enqueue("a")
+    assert queue.wait(running, timeout=0)
+    waiting = queue.enqueue("b")
+    assert not queue.wait(waiting, timeout=0.01)
+    assert queue.position(waiting) == 1
+    queue.release(running)
+    assert queue.wait(waiting, timeout=1)
+
+
+def test_double_release_keeps_next_request_of_session():
+    queue = AdmissionQueue(max_in_flight=1, max_queue=4)
+    ticket = queue.enqueue("a")
+    assert queue.wait(ticket, timeout=0)
+    queue.release(ticket)
+
+    following = queue.enqueue("a")
+    queue.release(ticket)  # e.g. finally + call_on_close on the old request
+    queue.release(ticket)
+
+    assert queue.session_position("a") == 1
+    with pytest.raises(QueueFull):
+        queue.enqueue("a")
+    assert queue.wait(following, timeout=0)
+    stats = queue.stats()
+    assert stats["in_flight"] == 1
+
+
+def test_release_of_waiting_ticket_frees_its_place():
+    queue = AdmissionQueue(max_in_flight=1, max_queue=4)
+    running = queue.enqueue("a")
+    assert queue.wait(running, timeout=0)
+    waiting = queue.enqueue("b")
+    queue.release(waiting)
+    assert queue.session_position("b") is None
+    assert queue.stats()["waiting"] == 0
+
+
+def test_slot_timeout_counts_rejection():
+    queue = AdmissionQueue(max_in_flight=1, max_queue=4)
+    running = queue.enqueue("a")
+    assert queue.wait(running, timeout=0)
+    with pytest.raises(QueueFull):
+        with queue.slot("b", timeout=0.01):
+            pass
+    assert queue.stats()["rejected"] == 1
+    assert queue.session_position("b") is None
+
+
+def test_host_wide_slots_are_shared(tmp_path):
+    first = AdmissionQueue(max_in_flight=1, name="model", slot_dir=str(tmp_path))
+    second = AdmissionQueue(max_in_flight=1, name="model", slot_dir=str(tmp_path))
+    running = first.enqueue("a")
+    assert first.wait(running, timeout=0)
+
+    waiting = second.enqueue("b")
+    assert not second.wait(waiting, timeout=0.1)
+    first.release(running)
+    assert second.wait(waiting, timeout=1)
+    second.release(waiting)
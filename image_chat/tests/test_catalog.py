@@ -0,0 +1,68 @@
+import pytest
+
+from catalog import Catalog, MAX_PER_PAGE, parse_csv, write_snapshot
+
+CSV = (
+    "\ufeffdataset_name ,technology,general tissue,species,cancer or normal or other disease\n"
+    "breast_1,Visium,breast,human,cancer\n"
+    "breast_2,Xenium,breast,human,normal\n"
+    "brain_1,Visium,brain,mouse,normal\n"
+    ",Visium,lung,human,cancer\n"
+    "lung_100%,Visium,lung,human,cancer\n"
+)
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    path = str(tmp_path / "catalog.sqlite3")
+    write_snapshot(parse_csv(CSV), path, source="test")
+    return Catalog(path)
+
+
+def names(result):
+    return [row["dataset_name"] for row in result["rows"]]
+
+
+def test_parse_csv_normalizes_headers_and_skips_empty_rows():
+    rows = parse_csv(CSV)
+    assert len(rows) == 4
+    assert rows[0]["dataset_name"] == "breast_1"
+
+
+def test_filters_combine_across_columns(catalog):
+    result = catalog.query({"technology": ["Visium"], "species": ["human"]})
+    assert names(result) == ["breast_1", "lung_100%"]
+    assert result["total"] == 2
+
+
+def test_multiple_values_of_one_filter_are_alternatives(catalog):
+    result = catalog.query({"tissue": ["brain", "lung"]})
+    assert names(result) == ["brain_1", "lung_100%"]
+
+
+def test_unknown_filters_and_empty_values_are_ignored(catalog):
+    assert catalog.query({"dataset_name": ["x"], "tissue": [""]})["total"] == 4
+
+
+def test_search_is_case_insensitive_and_literal(catalog):
+    assert names(catalog.query(q="XENIUM")) == ["breast_2"]
+    assert names(catalog.query(q="100%")) == ["lung_100%"]
+    assert catalog.query(q="_")["total"] == 4  # every name has an underscore
+    assert catalog.query(q="%")["total"] == 1
+
+
+def test_paging(catalog):
+    first = catalog.query(page=1, per_page=3)
+    second = catalog.query(page=2, per_page=3)
+    assert names(first) == ["breast_1", "breast_2", "brain_1"]
+    assert names(second) == ["lung_100%"]
+    assert (first["total"], first["pages"]) == (4, 2)
+    assert catalog.query(page=9, per_page=3)["rows"] == []
+    assert catalog.query(page=0, per_page=10**6)["per_page"] == MAX_PER_PAGE
+
+
+def test_facets_and_info(catalog):
+    facets = catalog.facets()
+    assert facets["tissue"] == ["breast", "brain", "lung"]
+    assert facets["status"] == ["cancer", "normal"]
+    assert catalog.info()["rows"] == "4"
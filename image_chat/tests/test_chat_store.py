@@ -0,0 +1,63 @@
+import json
+import os
+
+import pytest
+
+import file_lock
+from chat_store import ChatStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_lock, "APP_STATE_DIR", str(tmp_path / "state"))
+    return ChatStore(str(tmp_path / "sessions"))
+
+
+def test_append_adds_lines_and_load_returns_copies(store, tmp_path):
+    store.append("s1", [{"role": "user", "content": "hi"}])
+    store.append("s1", [{"role": "assistant", "content": "hello"}])
+
+    with open(tmp_path / "sessions" / "s1.jsonl") as f:
+        assert [json.loads(line)["content"] for line in f] == ["hi", "hello"]
+    messages = store.load("s1")
+    messages[0]["content"] = "changed"
+    assert store.load("s1")[0]["content"] == "hi"
+
+
+def test_load_sees_appends_from_another_process(store, tmp_path):
+    store.append("s1", [{"role": "user", "content": "hi"}])
+    store.load("s1")
+    # another worker appends behind this process's cache
+    with open(tmp_path / "sessions" / "s1.jsonl", "a") as f:
+        f.write(json.dumps({"role": "assistant", "content": "late"}) + "\n")
+    assert [m["content"] for m in store.load("s1")] == ["hi", "late"]
+
+
+def test_torn_last_line_is_skipped(store, tmp_path):
+    with open(tmp_path / "sessions" / "s1.jsonl", "w") as f:
+        f.write(json.dumps({"role": "user", "content": "hi"}) + "\n" + '{"role": "assis')
+    assert store.load("s1") == [{"role": "user", "content": "hi"}]
+
+
+def test_legacy_json_is_migrated(store, tmp_path):
+    legacy = [{"role": "user", "content": "old"}, {"role": "assistant", "content": "reply"}]
+    with open(tmp_path / "sessions" / "s1.json", "w") as f:
+        json.dump(legacy, f)
+    with open(tmp_path / "sessions" / "s2.json", "w") as f:
+        json.dump(legacy[:1], f)
+
+    assert store.load("s1") == legacy
+    assert not os.path.exists(tmp_path / "sessions" / "s1.json")
+    assert store.migrate_all() == 1
+    assert sorted(os.listdir(tmp_path / "sessions")) == ["s1.jsonl", "s2.jsonl"]
+
+
+def test_reset_removes_history_and_summary(store, tmp_path):
+    store.append("s1", [{"role": "user", "content": "hi"}])
+    store.save_summary("s1", "earlier", 1)
+    assert store.load_summary("s1") == {"content": "earlier", "covers": 1}
+
+    assert store.reset("s1")
+    assert store.load("s1") == []
+    assert store.load_summary("s1") == {"content": "", "covers": 0}
+    assert not store.reset("s1")
@@ -0,0 +1,116 @@
+import pytest
+
+from context_window import HistoryWindow, estimate_tokens
+
+
+class FakeStore:
+    def __init__(self, history=None, summary=None):
+        self.history = history or []
+        self.summary = summary or {"content": "", "covers": 0}
+
+    def load(self, session_id):
+        return list(self.history)
+
+    def load_summary(self, session_id):
+        return dict(self.summary)
+
+    def save_summary(self, session_id, content, covers):
+        self.summary = {"content": content, "covers": covers}
+
+
+def turns(n):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}"} for i in range(n)]
+
+
+def make_window(store, summarize=None, **kwargs):
+    kwargs.setdefault("token_budget", 10_000)
+    kwargs.setdefault("max_turns", 4)
+    kwargs.setdefault("summary_batch", 2)
+    return HistoryWindow(store, summarize or (lambda previous, messages: "summary"), **kwargs)
+
+
+def test_short_history_is_sent_verbatim():
+    history = turns(3)
+    assert make_window(FakeStore(history)).build("s", history) == history
+
+
+def test_window_respects_max_turns_and_token_budget():
+    window = make_window(FakeStore(), max_turns=3)
+    assert window.window_start(turns(10)) == 7
+
+    heavy = turns(4)
+    heavy[2]["images"] = ["roi.png"]
+    window = make_window(FakeStore(), token_budget=estimate_tokens(heavy[3]) + 10)
+    assert window.window_start(heavy) == 3
+
+
+def test_current_message_is_always_kept():
+    history = [{"role": "user", "content": "x" * 100_000}]
+    assert make_window(FakeStore(history), token_budget=10).build("s", history) == history
+
+
+def test_messages_not_covered_by_summary_are_not_dropped():
+    history = turns(10)  # window keeps the last 4 (start = 6)
+    store = FakeStore(history, {"content": "old news", "covers": 3})
+
+    messages = make_window(store).build("s", history)
+
+    assert messages[0]["role"] == "system"
+    assert "old news" in messages[0]["content"]
+    assert messages[1:] == history[3:]
+
+
+def test_without_summary_everything_is_sent():
+    history = turns(10)
+    assert make_window(FakeStore(history)).build("s", history) == history
+
+
+def test_fully_covered_history_uses_the_window():
+    history = turns(10)
+    store = FakeStore(history, {"content": "old news", "covers": 6})
+    messages = make_window(store).build("s", history)
+    assert messages[1:] == history[6:]
+
+
+@pytest.mark.parametrize("covers, expected_calls", [(5, 0), (4, 1)])
+def test_summary_is_batched(covers, expected_calls):
+    history = turns(10)  # start = 6
+    store = FakeStore(history, {"content": "old", "covers": covers})
+    calls = []
+
+    def summarize(previous, messages):
+        calls.append(messages)
+        return "new"
+
+    make_window(store, summarize)._update_summary("s")
+
+    assert len(calls) == expected_calls
+    if expected_calls:
+        assert calls[0] == [{"role": m["role"], "content": m["content"]} for m in history[4:6]]
+        assert store.summary == {"content": "new", "covers": 6}
+
+
+def test_failed_summary_keeps_previous_one():
+    history = turns(10)
+    store = FakeStore(history, {"content": "old", "covers": 0})
+
+    def summarize(previous, messages):
+        raise RuntimeError("model down")
+
+    window = make_window(store, summarize)
+    window._update_summary("s")
+
+    assert store.summary == {"content": "old", "covers": 0}
+    assert window.build("s", history) == history
+
+
+@pytest.mark.parametrize("summary", [None, {"content": "old news", "covers": 2}])
+def test_lagging_summary_caps_unsummarized_messages(summary):
+    history = turns(20)  # window keeps the last 4 (start = 16)
+    store = FakeStore(history, summary)
+
+    messages = make_window(store, max_lag_batches=3).build("s", history)  # lag cap 3 * 2
+
+    verbatim = [m for m in messages if m["role"] != "system"]
+    assert verbatim == history[10:]
+    assert (messages[0]["role"] == "system") == bool(summary)
@@ -0,0 +1,85 @@
+import os
+import threading
+
+import file_lock
+from chat_store import ChatStore
+from file_lock import FileLock, lock_path, try_flock
+
+
+def test_lock_files_live_under_app_state_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_lock, "APP_STATE_DIR", str(tmp_path / "state"))
+    path = lock_path("roi", "/nfs/sample/roi/base_layer/abc")
+    assert path.startswith(str(tmp_path / "state"))
+    assert os.path.isdir(os.path.dirname(path))
+    assert lock_path("roi", "/nfs/sample/roi/base_layer/abc") == path
+    assert lock_path("roi", "/nfs/sample/roi/cell_types/abc") != path
+
+
+def test_chat_store_keeps_no_locks_in_history_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_lock, "APP_STATE_DIR", str(tmp_path / "state"))
+    store = ChatStore(str(tmp_path / "sessions"))
+    with store.lock("s1"):
+        store.append("s1", [{"role": "user", "content": "hi"}])
+    assert os.listdir(tmp_path / "sessions") == ["s1.jsonl"]
+    assert store.lock("s1").path.startswith(str(tmp_path / "state"))
+
+
+def test_file_lock_is_reentrant_and_excludes_other_holders(tmp_path):
+    path = str(tmp_path / "x.lock")
+    lock = FileLock(path)
+    with lock:
+        with lock:
+            assert try_flock(path) is None
+        blocked = []
+        thread = threading.Thread(target=lambda: blocked.append(lock._rlock.acquire(timeout=0.05)))
+        thread.start()
+        thread.join()
+        assert blocked == [False]
+    fd = try_flock(path)
+    assert fd is not None
+    os.close(fd)
+
+
+def test_shared_locks_are_bounded_but_stable_while_referenced(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_lock, "APP_STATE_DIR", str(tmp_path / "state"))
+    monkeypatch.setattr(file_lock, "LOCK_CACHE_SIZE", 2)
+    held = file_lock.shared_lock("chat", "s0")
+    for i in range(1, 10):
+        file_lock.shared_lock("chat", f"s{i}")
+    assert len(file_lock._recent_locks) == 2
+    # evicted from the LRU, but still referenced: the same object comes back
+    assert file_lock.shared_lock("chat", "s0") is held
+
+
+def test_prune_lock_files_skips_held_and_recent_locks(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_lock, "APP_STATE_DIR", str(tmp_path / "state"))
+    old, busy, fresh = (lock_path("chat", key) for key in ("old", "busy", "fresh"))
+    for path in (old, busy, fresh):
+        with FileLock(path):  # touches the file
+            pass
+    for path in (old, busy):
+        os.utime(path, (0, 0))
+    with FileLock(busy):
+        os.utime(busy, (0, 0))
+        assert file_lock.prune_lock_files(max_age=3600) == 1
+    assert not os.path.exists(old)
+    assert os.path.exists(busy) and os.path.exists(fresh)
+
+
+def test_lock_acquired_after_prune_uses_the_new_file(tmp_path):
+    path = str(tmp_path / "x.lock")
+    holder, waiter = FileLock(path), FileLock(path)
+    acquired = threading.Event()
+
+    def wait():
+        with waiter:
+            acquired.set()
+
+    with holder:
+        thread = threading.Thread(target=wait)
+        thread.start()
+        thread.join(0.1)
+        os.remove(path)  # pruned while the waiter blocks on the old file
+    assert acquired.wait(5)
+    thread.join()
+    assert os.path.exists(path)
@@ -0,0 +1,68 @@
+import threading
+import time
+
+from image_cache import ByteLRUCache
+
+
+def test_evicts_least_recently_used_to_fit_budget():
+    cache = ByteLRUCache(10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.get("a") == b"aaaa"  # a is now the most recent
+    cache.put("c", b"cccc")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aaaa"
+    stats = cache.stats()
+    assert stats["bytes"] == 8
+    assert stats["evictions"] == 1
+
+
+def test_value_larger_than_cache_is_not_stored():
+    cache = ByteLRUCache(4)
+    assert cache.put("big", b"x" * 5) == b"x" * 5
+    assert cache.peek("big") is None
+
+
+def test_replacing_a_key_updates_its_size():
+    cache = ByteLRUCache(10)
+    cache.put("a", b"aaaaaaaa")
+    cache.put("a", b"a")
+    cache.put("b", b"bbbbbbbbb")
+    assert cache.peek("a") == b"a"
+    assert cache.stats()["bytes"] == 10
+
+
+def test_concurrent_misses_load_once():
+    cache = ByteLRUCache(1024)
+    calls = []
+    started = threading.Event()
+
+    def loader():
+        calls.append(1)
+        started.set()
+        time.sleep(0.05)
+        return b"value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("k", loader))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == [b"value"] * 5
+
+
+def test_none_results_are_not_cached():
+    cache = ByteLRUCache(1024)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return None
+
+    assert cache.get_or_load("k", loader) is None
+    assert cache.get_or_load("k", loader) is None
+    assert len(calls) == 2
@@ -0,0 +1,53 @@
+import base64
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+pytest.importorskip("rasterio")
+
+import image_payloads
+from image_payloads import PAYLOAD_CACHE, encode_image, with_encoded_images
+
+
+@pytest.fixture
+def roi(tmp_path):
+    PAYLOAD_CACHE.clear()
+    path = str(tmp_path / "roi.png")
+    cv2.imwrite(path, np.random.default_rng(0).integers(0, 255, (100, 200, 3), dtype=np.uint8))
+    return path
+
+
+def decode(payload):
+    return cv2.imdecode(np.frombuffer(base64.b64decode(payload), np.uint8), cv2.IMREAD_COLOR)
+
+
+def test_payload_is_downscaled_to_the_pixel_budget(roi):
+    assert decode(encode_image(roi)).shape == (100, 200, 3)
+    height, width = decode(encode_image(roi, max_pixels=5000)).shape[:2]
+    assert width * height <= 5000 and abs(width / height - 2) < 0.1
+    assert decode(encode_image(roi, image_format="jpeg")).shape == (100, 200, 3)
+
+
+def test_payload_is_cached_until_the_file_changes(roi, monkeypatch):
+    first = encode_image(roi)
+    reads = []
+    imread = cv2.imread
+    monkeypatch.setattr(image_payloads.cv2, "imread", lambda *a: reads.append(a) or imread(*a))
+
+    assert encode_image(roi) == first
+    assert reads == []
+
+    cv2.imwrite(roi, np.zeros((10, 10, 3), np.uint8))
+    os.utime(roi, ns=(os.stat(roi).st_atime_ns, os.stat(roi).st_mtime_ns + 10**9))
+    assert decode(encode_image(roi)).shape == (10, 10, 3)
+    assert len(reads) == 1
+
+
+def test_with_encoded_images_leaves_history_untouched(roi):
+    messages = [{"role": "user", "content": "hi", "images": [roi]}, {"role": "assistant", "content": "ok"}]
+    prepared = with_encoded_images(messages)
+    assert messages[0]["images"] == [roi]
+    assert prepared[0]["images"] == [encode_image(roi)]
+    assert prepared[1] is messages[1]
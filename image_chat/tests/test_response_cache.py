@@ -0,0 +1,29 @@
+from response_cache import ResponseCache, normalize_prompt
+
+
+def test_put_get_and_eviction(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"), max_entries=2)
+    cache.put("a", "model", "reply a")
+    cache.put("b", "model", "reply b")
+    assert cache.get("a") == "reply a"  # a is now the most recently used
+    cache.put("c", "model", "reply c")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "reply a"
+    assert cache.get("c") == "reply c"
+
+
+def test_empty_reply_is_not_cached(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"))
+    cache.put("a", "model", "")
+    assert cache.get("a") is None
+
+
+def test_expired_entries_are_ignored(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"), ttl_seconds=-1)
+    cache.put("a", "model", "reply")
+    assert cache.get("a") is None
+
+
+def test_normalize_prompt_ignores_case_and_spacing():
+    assert normalize_prompt("  Count   the CELLS ") == normalize_prompt("count the cells")
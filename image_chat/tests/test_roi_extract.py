@@ -0,0 +1,106 @@
+import os
+import threading
+
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+rasterio = pytest.importorskip("rasterio")
+from rasterio.transform import Affine
+
+import file_lock
+import roi_extract
+from roi_jobs import JobCancelled
+
+NORTH_UP = Affine(1.0, 0.0, 0.0, 0.0, -1.0, 100.0)
+SQUARE = [[10, 90], [40, 90], [40, 60], [10, 60], [10, 90]]
+TRIANGLE = [[50, 50], [80, 50], [65, 20], [50, 50]]
+
+
+def geojson(*rings):
+    return {"features": [{"geometry": {"type": "Polygon", "coordinates": [ring]}} for ring in rings]}
+
+
+@pytest.fixture
+def sample(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_lock, "APP_STATE_DIR", str(tmp_path / "state"))
+    roi_extract.REAL_IMAGE_CACHE.clear()
+    data = np.random.default_rng(0).integers(0, 200, (3, 100, 100), dtype=np.uint8)
+    os.makedirs(tmp_path / "real_image" / "base_layer")
+    for path in (tmp_path / "raster_resized.tif", tmp_path / "real_image" / "base_layer" / "real.tif"):
+        with rasterio.open(
+            path, "w", driver="GTiff", width=100, height=100, count=3, dtype="uint8", transform=NORTH_UP,
+        ) as dst:
+            dst.write(data)
+    return str(tmp_path / "raster_resized.tif")
+
+
+def test_incremental_save_reuses_unchanged_rois(sample, tmp_path):
+    out = str(tmp_path / "out")
+    paths = roi_extract.save_roi(geojson(SQUARE, TRIANGLE), sample, output_dir=out, incremental=True)
+    assert [os.path.basename(p) for p in paths] == ["roi_0_10_10_40_40.png", "roi_1_50_50_80_80.png"]
+
+    # drop the square: the triangle moves to position 0 and is renamed, not re-cropped
+    again = roi_extract.save_roi(geojson(TRIANGLE), sample, output_dir=out, incremental=True)
+    assert [os.path.basename(p) for p in again] == ["roi_0_50_50_80_80.png"]
+    assert sorted(f for f in os.listdir(out) if f.endswith(".png")) == ["roi_0_50_50_80_80.png"]
+    assert not any(f.endswith(".lock") for f in os.listdir(out))
+
+
+def test_clear_rois(sample, tmp_path):
+    out = str(tmp_path / "out")
+    roi_extract.save_roi(geojson(SQUARE, TRIANGLE), sample, output_dir=out, incremental=True)
+    assert roi_extract.clear_rois(out) == 2
+    assert os.listdir(out) == []
+
+
+def test_details_report_box_and_polygon_area(sample, tmp_path):
+    rois = roi_extract.save_roi(
+        geojson(SQUARE, TRIANGLE), sample, output_dir=str(tmp_path / "out"), details=True,
+    )
+    assert [r["box"] for r in rois] == [[10, 10, 40, 40], [50, 50, 80, 80]]
+    assert rois[1]["area"] == 450
+    square = np.array([[0, 0], [10, 0], [10, 10], [0, 10]], dtype=np.float64)
+    assert roi_extract.polygon_area(square) == 100
+
+
+def test_fill_mask_blanks_pixels_outside_polygon(sample, tmp_path):
+    rois = roi_extract.save_roi(
+        geojson(TRIANGLE), sample, output_dir=str(tmp_path / "out"), mask_mode="fill", details=True,
+    )
+    image = cv2.imread(rois[0]["path"])
+    assert tuple(image[-1, 0]) == roi_extract.ROI_MASK_FILL  # bottom-left corner is outside
+    assert tuple(image[0, 15]) != roi_extract.ROI_MASK_FILL
+
+
+def test_save_reports_progress(sample, tmp_path):
+    progress = []
+    roi_extract.save_roi(
+        geojson(SQUARE, TRIANGLE), sample, output_dir=str(tmp_path / "out"), incremental=True,
+        progress=lambda done, total: progress.append((done, total)),
+    )
+    assert progress == [(1, 2), (2, 2)]
+
+
+def test_cancelled_save_raises(sample, tmp_path):
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(JobCancelled):
+        roi_extract.save_roi(geojson(SQUARE), sample, output_dir=str(tmp_path / "out"),
+                             incremental=True, cancel_event=cancel)
+
+
+@pytest.mark.parametrize("full_decode_mb", [64, 0])  # cached image, windowed read
+def test_edge_crossing_polygon_is_clipped_not_squeezed(sample, tmp_path, monkeypatch, full_decode_mb):
+    monkeypatch.setattr(roi_extract, "ROI_FULL_DECODE_MB", full_decode_mb)
+    crossing = [[-20, 90], [30, 90], [30, 60], [-20, 60], [-20, 90]]
+    outside = [[150, 90], [180, 90], [180, 60], [150, 90]]
+    rois = roi_extract.save_roi(
+        geojson(crossing, outside), sample, output_dir=str(tmp_path / "out"), mask_mode="fill", details=True,
+    )
+
+    assert [r["box"] for r in rois] == [[0, 10, 30, 40]]
+    image = cv2.imread(rois[0]["path"])
+    with rasterio.open(sample) as src:
+        expected = src.read(window=((10, 40), (0, 30)))[::-1].transpose(1, 2, 0)
+    assert np.array_equal(image, expected)  # every pixel is inside the polygon
@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+rasterio = pytest.importorskip("rasterio")
+from rasterio.transform import Affine
+
+from raster_pool import RasterPool
+from roi_extract import fit_pixel_budget, geo_to_pixel
+
+# rotated/sheared on purpose, so both axes mix
+TRANSFORM = Affine(0.5, 0.1, 100.0, 0.05, -0.25, 200.0)
+NORTH_UP = Affine(1.0, 0.0, 0.0, 0.0, -1.0, 20.0)
+
+
+def write_raster(path, data, transform):
+    with rasterio.open(
+        path, "w", driver="GTiff", width=data.shape[2], height=data.shape[1],
+        count=data.shape[0], dtype=data.dtype, transform=transform,
+    ) as dst:
+        dst.write(data)
+    return str(path)
+
+
+def test_geo_to_pixel_matches_dataset_index(tmp_path):
+    path = write_raster(tmp_path / "r.tif", np.zeros((1, 64, 64), np.uint8), TRANSFORM)
+    pixels = np.random.default_rng(0).uniform(0, 64, size=(50, 2))
+    a, b, c, d, e, f = TRANSFORM[:6]
+    xs = a * pixels[:, 0] + b * pixels[:, 1] + c
+    ys = d * pixels[:, 0] + e * pixels[:, 1] + f
+    coords = np.column_stack([xs, ys])
+
+    with rasterio.open(path) as src:
+        expected = [tuple(int(v) for v in src.index(x, y)) for x, y in coords]
+    got = geo_to_pixel(coords, TRANSFORM)
+
+    assert [(int(row), int(col)) for col, row in got] == expected
+    assert np.array_equal(geo_to_pixel(coords, list(TRANSFORM)[:6]), got)
+    assert np.allclose(geo_to_pixel(coords, TRANSFORM, floor=False), pixels)
+
+
+def test_fit_pixel_budget():
+    assert fit_pixel_budget(100, 50) == (100, 50)
+    assert fit_pixel_budget(100, 50, 5000) == (100, 50)
+    width, height = fit_pixel_budget(400, 200, 5000)
+    assert width * height <= 5000 and abs(width / height - 2) < 0.05
+
+
+def test_raster_pool_reuses_handles_until_file_changes(tmp_path):
+    path = write_raster(tmp_path / "r.tif", np.zeros((1, 8, 8), np.uint8), NORTH_UP)
+    pool = RasterPool(max_open=2)
+    with pool.dataset(path) as src:
+        first = src
+    with pool.dataset(path) as src:
+        assert src is first
+    assert pool.stats()["opened"] == 1 and pool.stats()["reused"] == 1
+
+    write_raster(tmp_path / "r.tif", np.ones((1, 8, 8), np.uint8), NORTH_UP)
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 10**9))
+    with pool.dataset(path) as src:
+        assert src is not first
+        assert src.read(1).max() == 1
+    pool.close_all()
+
+
+def test_raster_pool_checks_out_one_handle_per_thread(tmp_path):
+    path = write_raster(tmp_path / "r.tif", np.zeros((1, 8, 8), np.uint8), NORTH_UP)
+
+    class Handle:
+        def __init__(self, path):
+            self.path, self.closed = path, False
+
+        def close(self):
+            self.closed = True
+
+    pool = RasterPool(max_open=4, opener=Handle)
+    with pool.dataset(path) as first, pool.dataset(path) as second:
+        assert first is not second  # both busy: never shared
+    with pool.dataset(path) as again:
+        assert again in (first, second) and not again.closed
+    assert pool.stats()["opened"] == 2
+    pool.close_all()
+    assert first.closed and second.closed
@@ -0,0 +1,100 @@
+import threading
+import time
+
+from roi_jobs import JobQueue
+
+
+def wait_for(queue, job_id, states=("done", "cancelled", "failed"), timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = queue.status(job_id)
+        if status and status["status"] in states:
+            return status
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not reach {states}")
+
+
+def slow_job(steps, release=None, cancel_event=None, progress=None):
+    for i in range(steps):
+        if release is not None:
+            release.wait(5)
+        cancel_event.check()
+        progress(i + 1, steps)
+    return {"steps": steps}
+
+
+def test_job_reports_progress_and_result(tmp_path):
+    queue = JobQueue(str(tmp_path), max_workers=1)
+    job_id = queue.submit("s1", slow_job, 3)
+    status = wait_for(queue, job_id)
+    assert status["status"] == "done"
+    assert status["progress"] == {"done": 3, "total": 3}
+    assert status["result"] == {"steps": 3}
+
+
+def test_new_job_supersedes_running_one(tmp_path):
+    queue = JobQueue(str(tmp_path), max_workers=2)
+    release = threading.Event()
+    first = queue.submit("s1", slow_job, 3, release)
+    wait_for(queue, first, states=("running",))
+    second = queue.submit("s1", slow_job, 1)
+    release.set()
+
+    assert wait_for(queue, first)["status"] == "cancelled"
+    assert wait_for(queue, second)["status"] == "done"
+    assert queue.latest("s1")["id"] == second
+    assert queue.stats()["cancelled"] == 1
+
+
+def test_queued_job_of_superseded_owner_never_starts(tmp_path):
+    queue = JobQueue(str(tmp_path), max_workers=1)
+    release = threading.Event()
+    blocker = queue.submit("other", slow_job, 1, release)
+    started = []
+    first = queue.submit("s1", lambda cancel_event=None, progress=None: started.append(1))
+    second = queue.submit("s1", slow_job, 1)
+    release.set()
+
+    assert wait_for(queue, first)["status"] == "cancelled"
+    assert wait_for(queue, second)["status"] == "done"
+    assert wait_for(queue, blocker)["status"] == "done"
+    assert started == []
+
+
+def test_owners_do_not_cancel_each_other(tmp_path):
+    queue = JobQueue(str(tmp_path), max_workers=2)
+    a = queue.submit("s1", slow_job, 2)
+    b = queue.submit("s2", slow_job, 2)
+    assert wait_for(queue, a)["status"] == "done"
+    assert wait_for(queue, b)["status"] == "done"
+
+
+def test_superseded_from_another_process(tmp_path):
+    # two queues on one state dir stand in for two worker processes
+    worker_a = JobQueue(str(tmp_path), max_workers=1)
+    worker_b = JobQueue(str(tmp_path), max_workers=1)
+    release = threading.Event()
+    first = worker_a.submit("s1", slow_job, 2, release)
+    wait_for(worker_a, first, states=("running",))
+    second = worker_b.submit("s1", slow_job, 1)
+    release.set()
+
+    assert wait_for(worker_a, first)["status"] == "cancelled"
+    assert wait_for(worker_a, second)["status"] == "done"  # read from disk
+
+
+def test_failed_job_records_error(tmp_path):
+    queue = JobQueue(str(tmp_path))
+
+    def broken(cancel_event=None, progress=None):
+        raise ValueError("bad geometry")
+
+    status = wait_for(queue, queue.submit("s1", broken))
+    assert status["status"] == "failed"
+    assert status["error"] == "bad geometry"
+
+
+def test_unknown_job(tmp_path):
+    queue = JobQueue(str(tmp_path))
+    assert queue.status("missing") is None
+    assert queue.latest("nobody") is None
@@ -0,0 +1,64 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+rasterio = pytest.importorskip("rasterio")
+from rasterio.transform import Affine
+
+from cell_palette import COLOR_DICT_CELLS
+from roi_stats import _CLASS_IDS, classify_pixels, roi_composition
+
+NORTH_UP = Affine(1.0, 0.0, 0.0, 0.0, -1.0, 20.0)
+
+
+def write_raster(path, data, transform):
+    with rasterio.open(
+        path, "w", driver="GTiff", width=data.shape[2], height=data.shape[1],
+        count=data.shape[0], dtype=data.dtype, transform=transform,
+    ) as dst:
+        dst.write(data)
+    return str(path)
+
+
+def test_classify_pixels_with_bincount():
+    rgb = np.array(
+        [COLOR_DICT_CELLS[2], COLOR_DICT_CELLS[2], COLOR_DICT_CELLS[0], [1, 2, 3], COLOR_DICT_CELLS[25]],
+        dtype=np.uint8,
+    )
+    ids = classify_pixels(rgb)
+    assert ids.tolist() == [2, 2, 0, -1, 25]
+
+    counts = np.bincount(ids + 1, minlength=int(_CLASS_IDS.max()) + 2)
+    assert counts[0] == 1  # unlabeled
+    assert counts[1] == 1 and counts[3] == 2 and counts[26] == 1
+    assert counts.sum() == len(rgb)
+
+
+def overlay(tmp_path):
+    """20x20 white overlay: two class-1 squares, one touching a class-2 square."""
+    rgb = np.full((20, 20, 3), 255, dtype=np.uint8)
+    rgb[2:6, 2:6] = COLOR_DICT_CELLS[1]
+    rgb[10:14, 10:14] = COLOR_DICT_CELLS[1]
+    rgb[10:14, 14:18] = COLOR_DICT_CELLS[2]
+    return write_raster(tmp_path / "overlay.tif", rgb.transpose(2, 0, 1).copy(), NORTH_UP)
+
+
+def test_roi_composition_counts_pixels_and_cells(tmp_path):
+    path = overlay(tmp_path)
+    whole = [[0, 20], [20, 20], [20, 0], [0, 0]]  # geographic (x, y)
+
+    stats = roi_composition(path, NORTH_UP, whole)
+
+    by_id = {c["id"]: c for c in stats["classes"]}
+    assert stats["pixels"] == 400
+    assert by_id[1]["pixels"] == 32 and by_id[2]["pixels"] == 16
+    assert stats["unlabeled_pixels"] == 400 - 48
+    assert by_id[1]["cells"] == 2 and by_id[2]["cells"] == 1
+    assert by_id[1]["fraction"] == pytest.approx(2 / 3, abs=1e-3)
+
+
+def test_roi_composition_decimated_read_has_no_cell_counts(tmp_path):
+    path = overlay(tmp_path)
+    stats = roi_composition(path, NORTH_UP, [[0, 20], [20, 20], [20, 0], [0, 0]], max_pixels=100)
+    assert stats["scale"] > 1
+    assert all(c["cells"] is None for c in stats["classes"])
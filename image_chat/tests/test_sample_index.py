@@ -0,0 +1,77 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("rasterio")
+pytest.importorskip("rio_tiler")
+pytest.importorskip("flask")
+
+import sample_index
+from sample_index import SampleIndex, write_index
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """A database with one indexed sample; scans are recorded, not performed."""
+    root = tmp_path / "db"
+    os.makedirs(root / "S1")
+    (root / "S1" / sample_index.CLASSES_FILE).write_text(json.dumps(["tumor"]))
+    scans = []
+
+    def fake_scan(sample_dir):
+        scans.append(os.path.basename(sample_dir))
+        with open(os.path.join(sample_dir, sample_index.CLASSES_FILE)) as f:
+            classes = json.load(f)
+        return {"signature": sample_index._signature(sample_dir), "layers": {}, "real_images": {}, "classes": classes}
+
+    monkeypatch.setattr(sample_index, "scan_sample", fake_scan)
+    path = str(tmp_path / "index.json")
+    write_index({"S1": fake_scan(str(root / "S1"))}, path)
+    scans.clear()
+    return SampleIndex(path, str(root)), root, scans
+
+
+def touch_classes(root, classes):
+    classes_path = root / "S1" / sample_index.CLASSES_FILE
+    classes_path.write_text(json.dumps(classes))
+    stat = os.stat(classes_path)
+    os.utime(classes_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def test_indexed_sample_is_served_without_scanning(database):
+    index, _, scans = database
+    assert index.get("S1")["classes"] == ["tumor"]
+    assert len(index) == 1 and scans == []
+
+
+def test_changed_sample_is_rescanned_on_use(database, monkeypatch):
+    index, root, scans = database
+    monkeypatch.setattr(sample_index, "RELOAD_SECONDS", 0)
+    touch_classes(root, ["tumor", "stroma"])
+
+    assert index.get("S1")["classes"] == ["tumor", "stroma"]
+    assert index.get("S1")["classes"] == ["tumor", "stroma"]
+    assert scans == ["S1"]  # the second access matched the new signature
+
+
+def test_signature_checks_are_throttled(database, monkeypatch):
+    index, root, scans = database
+    monkeypatch.setattr(sample_index, "RELOAD_SECONDS", 3600)
+    index.get("S1")
+    touch_classes(root, ["stroma"])
+    assert index.get("S1")["classes"] == ["tumor"]
+    assert scans == []
+
+
+def test_unindexed_sample_is_scanned_once_and_unknown_raises(database):
+    index, root, scans = database
+    os.makedirs(root / "S2")
+    (root / "S2" / sample_index.CLASSES_FILE).write_text("[]")
+    index.get("S2")
+    index.get("S2")
+    assert scans == ["S2"]
+    with pytest.raises(KeyError):
+        index.get("missing")
+    with pytest.raises(KeyError):
+        index.get("../outside")
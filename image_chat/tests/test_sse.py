@@ -0,0 +1,34 @@
+import json
+
+from sse import sse_event
+
+
+def parse(stream):
+    """Split a stream the way the chat client's readStream does."""
+    events = []
+    for raw in stream.split("\n\n")[:-1]:
+        event, data = "message", ""
+        for line in raw.split("\n"):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data += line[len("data: "):]
+        events.append((event, json.loads(data)))
+    return events
+
+
+def test_plain_and_named_events():
+    assert sse_event({"token": "hi"}) == 'data: {"token": "hi"}\n\n'
+    assert sse_event({"position": 2}, event="queue") == 'event: queue\ndata: {"position": 2}\n\n'
+
+
+def test_tokens_with_newlines_stay_in_one_event():
+    tokens = ["line one\n\nline two", "data: not a field", "éè \U0001f52c"]
+    stream = "".join(sse_event({"token": t}) for t in tokens)
+    stream += sse_event({"response": "".join(tokens), "cached": False}, event="done")
+
+    events = parse(stream)
+
+    assert [e for e, _ in events] == ["message"] * 3 + ["done"]
+    assert [d["token"] for _, d in events[:3]] == tokens
+    assert events[-1][1]["response"] == "".join(tokens)
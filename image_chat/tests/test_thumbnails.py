@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+import thumbnails
+
+
+def test_thumbnail_is_downscaled_and_reused(tmp_path, monkeypatch):
+    monkeypatch.setattr(thumbnails, "THUMBNAIL_DIR", str(tmp_path / "thumbs"))
+    source = str(tmp_path / "roi.png")
+    cv2.imwrite(source, np.zeros((400, 200, 3), dtype=np.uint8))
+
+    path, etag = thumbnails.get_thumbnail(source, 100)
+    assert cv2.imread(path).shape[:2] == (200, 100)
+    assert thumbnails.get_thumbnail(source, 100) == (path, etag)
+    assert [n for n in os.listdir(tmp_path / "thumbs") if n.endswith(".tmp.png")] == []
+
+
+def test_prune_removes_least_recently_used(tmp_path):
+    for i, name in enumerate(["old.png", "mid.png", "new.png"]):
+        path = tmp_path / name
+        path.write_bytes(b"x" * 100)
+        os.utime(path, (1000 + i, 1000 + i))
+
+    assert thumbnails.prune_thumbnails(max_bytes=150, folder=str(tmp_path)) == 2
+    assert os.listdir(tmp_path) == ["new.png"]
@@ -0,0 +1,74 @@
+import pytest
+
+import tile_clients
+
+
+class FakeClient:
+    def __init__(self, path):
+        self.path = path
+        self.closed = False
+
+    def center(self):
+        return (0.0, 0.0)
+
+    def shutdown(self):
+        self.closed = True
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(tile_clients, "new_tile_client", lambda path, ip, port: FakeClient(path))
+    monkeypatch.setattr(tile_clients, "TILE_CLIENT_MAX_OPEN", 2)
+    tile_clients.TILE_CLIENT_REGISTRY.clear()
+    tile_clients.TILE_SESSIONS.clear()
+    yield tile_clients.TILE_CLIENT_REGISTRY
+    tile_clients.TILE_CLIENT_REGISTRY.clear()
+    tile_clients.TILE_SESSIONS.clear()
+
+
+def test_attached_session_clients_survive_eviction(registry):
+    tile_clients.get_or_create_tile_client("other.tif", "localhost", 9015)
+    for path in ("base.tif", "overlay.tif"):
+        tile_clients.get_or_create_tile_client(path, "localhost", 9015, "s1")
+    tile_clients.attach_tile_session("s1", ["base.tif", "overlay.tif"])
+
+    # the unreferenced client goes first, even though it is not the oldest use
+    assert list(registry) == ["base.tif", "overlay.tif"]
+    assert registry["base.tif"]["sessions"] == {"s1"}
+
+
+def test_detached_clients_are_evicted_first(registry):
+    for path in ("a.tif", "b.tif"):
+        tile_clients.get_or_create_tile_client(path, "localhost", 9015, "s1")
+    tile_clients.attach_tile_session("s1", ["a.tif", "b.tif"])
+    # the session moves on to another sample and releases a.tif
+    tile_clients.attach_tile_session("s1", ["b.tif"])
+    client = registry["a.tif"]["client"]
+
+    tile_clients.get_or_create_tile_client("c.tif", "localhost", 9015, "s2")
+
+    assert list(registry) == ["b.tif", "c.tif"]
+    assert client.closed
+
+
+def test_idle_sessions_release_their_clients(registry, monkeypatch):
+    tile_clients.get_or_create_tile_client("a.tif", "localhost", 9015, "s1")
+    tile_clients.attach_tile_session("s1", ["a.tif"])
+    monkeypatch.setattr(tile_clients, "TILE_CLIENT_IDLE_SECONDS", -1)
+
+    tile_clients.evict_tile_clients()
+
+    assert not registry
+    assert "s1" not in tile_clients.TILE_SESSIONS
+
+
+def test_tab_opening_another_sample_releases_the_previous_one(registry):
+    # the same tab id across two page loads, as kept in sessionStorage
+    for path in ("a_base.tif", "a_overlay.tif"):
+        tile_clients.get_or_create_tile_client(path, "localhost", 9015, "tab1")
+    tile_clients.attach_tile_session("tab1", ["a_base.tif", "a_overlay.tif"])
+    tile_clients.get_or_create_tile_client("b_base.tif", "localhost", 9015, "tab1")
+    tile_clients.attach_tile_session("tab1", ["b_base.tif"])
+
+    assert all(not info["sessions"] for path, info in registry.items() if path.startswith("a_"))
+    assert registry["b_base.tif"]["sessions"] == {"tab1"}
@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+rasterio = pytest.importorskip("rasterio")
+pytest.importorskip("flask")
+pytest.importorskip("rio_tiler")
+from rasterio.crs import CRS
+from rasterio.transform import from_bounds
+
+import tile_server
+
+# lon 0..10, lat 0..10: at zoom 5 it lies in tiles x=16, y=15..16
+BOUNDS = [[0.0, 0.0], [10.0, 10.0]]
+
+
+def write_rgba(path, alpha):
+    data = np.full((4, 256, 256), 200, dtype=np.uint8)
+    data[3] = alpha
+    with rasterio.open(
+        path, "w", driver="GTiff", width=256, height=256, count=4, dtype="uint8",
+        crs=CRS.from_epsg(4326), transform=from_bounds(0, 0, 10, 10, 256, 256),
+    ) as dst:
+        dst.write(data)
+    return str(path)
+
+
+def decode(png):
+    return cv2.imdecode(np.frombuffer(png, np.uint8), cv2.IMREAD_UNCHANGED)
+
+
+def test_tiles_in_bounds():
+    assert tile_server.tiles_in_bounds(BOUNDS, 5) == [(5, 16, 15), (5, 16, 16)]
+    padded = tile_server.tiles_in_bounds(BOUNDS, 5, pad=1)
+    assert len(padded) == 12 and (5, 15, 14) in padded and (5, 17, 17) in padded
+    assert tile_server.tiles_in_bounds(BOUNDS, 0, pad=3) == [(0, 0, 0)]
+
+
+def test_render_tile_uses_fourth_band_as_alpha(tmp_path):
+    opaque = decode(tile_server.render_tile(write_rgba(tmp_path / "opaque.tif", 255), 5, 16, 15))
+    clear = decode(tile_server.render_tile(write_rgba(tmp_path / "clear.tif", 0), 5, 16, 15))
+    assert opaque.shape == (256, 256, 4) and opaque[..., 3].max() == 255
+    assert clear[..., 3].max() == 0
+
+
+def test_render_tile_outside_raster_is_empty(tmp_path):
+    path = write_rgba(tmp_path / "r.tif", 255)
+    assert tile_server.render_tile(path, 5, 0, 0) == tile_server.empty_tile()
+    assert tile_server.READER_POOL.stats()["busy"] == 0
+
+
+@pytest.fixture
+def rendered(monkeypatch):
+    calls = []
+    monkeypatch.setattr(tile_server, "render_tile", lambda path, z, x, y: calls.append((path, z, x, y)))
+    tile_server._WARM_STATE.clear()
+    yield calls
+    tile_server._WARM_STATE.clear()
+
+
+def test_newer_sample_supersedes_queued_warm_up(rendered):
+    old = tile_server._warm_generation("tab1", ("a.tif",), 1)
+    new = tile_server._warm_generation("tab1", ("b.tif",), 1)
+
+    tile_server._warm_tile("tab1", old, "a.tif", 0, 0, 0)
+    tile_server._warm_tile("tab1", new, "b.tif", 0, 0, 0)
+
+    assert rendered == [("b.tif", 0, 0, 0)]
+    assert "tab1" not in tile_server._WARM_STATE  # nothing left pending
+
+
+def test_cancel_warm_drops_pending_tiles(rendered):
+    generation = tile_server._warm_generation("tab1", ("a.tif",), 2)
+    assert tile_server.cancel_warm("tab1")
+    tile_server._warm_tile("tab1", generation, "a.tif", 0, 0, 0)
+    assert rendered == []
+    assert not tile_server.cancel_warm("tab1")
+
+
+def test_warm_up_waits_for_client_requests(rendered):
+    generation = tile_server._warm_generation("tab1", ("a.tif",), 1)
+    with tile_server.interactive_request():
+        worker = threading.Thread(target=tile_server._warm_tile, args=("tab1", generation, "a.tif", 1, 0, 0))
+        worker.start()
+        worker.join(0.3)
+        assert worker.is_alive() and rendered == []
+    worker.join(5)
+    assert rendered == [("a.tif", 1, 0, 0)]
@@ -0,0 +1,138 @@
+import os
+import time
+import hashlib
+import tempfile
+import threading
+import cv2
+
+THUMBNAIL_DIR = os.environ.get("THUMBNAIL_CACHE_DIR", "./thumbnail_cache")
+MAX_THUMBNAIL_SIZE = 1024
+# Disk budget of THUMBNAIL_DIR; least recently served thumbnails go first.
+THUMBNAIL_CACHE_MB = int(os.environ.get("THUMBNAIL_CACHE_MB", "256"))
+THUMBNAIL_PRUNE_SECONDS = 60
+
+_last_prune = 0.0
+_prune_lock = threading.Lock()
+
+
+def file_etag(path, size=None):
+    """ETag for a file (optionally at a thumbnail size), from path + mtime.
+
+    Args:
+        path (str): image path.
+        size (int, optional): thumbnail size, None for the original file.
+
+    Returns:
+        str: hex digest.
+    """
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{size}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def get_thumbnail(path, size):
+    """Return the path of a cached thumbnail, generating it on first use.
+
+    The thumbnail's shorter side is ``size`` pixels (the chat panel crops
+    with ``object-fit: cover``); images already that small are not upscaled.
+    Files are stored under ``THUMBNAIL_DIR`` keyed by source path + mtime, so
+    regenerated ROIs get a new thumbnail; old entries age out through
+    ``prune_thumbnails``.
+
+    Args:
+        path (str): source image.
+        size (int): target size of the shorter side.
+
+    Returns:
+        tuple[str, str]: (thumbnail path, etag).
+    """
+    size = max(1, min(int(size), MAX_THUMBNAIL_SIZE))
+    etag = file_etag(path, size)
+    thumb_path = os.path.join(THUMBNAIL_DIR, f"{etag}.png")
+    if os.path.exists(thumb_path):
+        try:
+            os.utime(thumb_path)  # mark as recently used for pruning
+        except OSError:
+            pass
+        return thumb_path, etag
+
+    image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise ValueError(f"❌ Failed to read image for thumbnail: {path}")
+    height, width = image.shape[:2]
+    scale = size / float(min(height, width))
+    if scale < 1:
+        image = cv2.resize(
+            image,
+            (max(1, round(width * scale)), max(1, round(height * scale))),
+            interpolation=cv2.INTER_AREA,
+        )
+
+    os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+    # unique per call: threads of a worker may render the same thumbnail
+    fd, tmp_path = tempfile.mkstemp(dir=THUMBNAIL_DIR, prefix=".", suffix=".tmp.png")
+    os.close(fd)
+    try:
+        if not cv2.imwrite(tmp_path, image):
+            raise ValueError(f"❌ Failed to write thumbnail for {path}")
+        os.replace(tmp_path, thumb_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    print(f"🖼️ Thumbnail cached ({size}px) → {thumb_path}")
+    maybe_prune_thumbnails()
+    return thumb_path, etag
+
+
+def maybe_prune_thumbnails():
+    """Run ``prune_thumbnails`` at most every ``THUMBNAIL_PRUNE_SECONDS``."""
+    global _last_prune
+    with _prune_lock:
+        if time.monotonic() - _last_prune < THUMBNAIL_PRUNE_SECONDS:
+            return
+        _last_prune = time.monotonic()
+    prune_thumbnails()
+
+
+def prune_thumbnails(max_bytes=None, folder=None):
+    """Delete the least recently used thumbnails until the folder fits.
+
+    Args:
+        max_bytes (int, optional): budget, ``THUMBNAIL_CACHE_MB`` by default.
+        folder (str, optional): thumbnail folder, ``THUMBNAIL_DIR`` by default.
+
+    Returns:
+        int: number of files removed.
+    """
+    max_bytes = THUMBNAIL_CACHE_MB * 1024 ** 2 if max_bytes is None else max_bytes
+    folder = folder or THUMBNAIL_DIR
+    entries = []
+    try:
+        names = os.listdir(folder)
+    except OSError:
+        return 0
+    for name in names:
+        try:
+            stat = os.stat(os.path.join(folder, name))
+        except OSError:
+            continue
+        if name.endswith(".tmp.png") and time.time() - stat.st_mtime < THUMBNAIL_PRUNE_SECONDS:
+            continue  # being written by another request
+        entries.append((stat.st_mtime, stat.st_size, name))
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(folder, name))
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    if removed:
+        print(f"🗑️ Pruned {removed} thumbnail(s) from {folder}")
+    return removed
@@ -0,0 +1,167 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+# Registry of localtileserver TileClients: file path -> client info,
+# kept in LRU order and bounded by count and idle time. It is process-local,
+# so that backend runs with a single server worker (see gunicorn.conf.py).
+TILE_CLIENT_REGISTRY = OrderedDict()
+# Sessions are browser tabs (the app's sessionStorage "tab-id"), which keep
+# their id across page loads; a tab holds references to the rasters it shows.
+TILE_SESSIONS = {}  # tab id -> {"paths": set, "last_seen": float}
+TILE_CLIENT_LOCK = threading.RLock()
+TILE_CLIENT_MAX_OPEN = int(os.environ.get("TILE_CLIENT_MAX_OPEN", "8"))
+TILE_CLIENT_IDLE_SECONDS = int(os.environ.get("TILE_CLIENT_IDLE_SECONDS", "1800"))
+TILE_CLIENT_STATS = {"created": 0, "evicted": 0, "idle_evicted": 0}
+
+
+def new_tile_client(file_path, ip, port):
+    """Start a TileClient for a raster (localtileserver is only needed by this backend)."""
+    from localtileserver import TileClient
+
+    return TileClient(file_path, cors_all=True, host="0.0.0.0", port=port, client_host=ip, client_port=port)
+
+
+def get_or_create_tile_client(file_path, ip, port, session_id=None):
+    """Reuses or creates a TileClient, with validation and registry tracking.
+
+    The registry is an LRU: using a client marks it recent and records the
+    session holding it; creating one may evict others (see evict_tile_clients).
+    """
+    with TILE_CLIENT_LOCK:
+        if file_path in TILE_CLIENT_REGISTRY:
+            info = TILE_CLIENT_REGISTRY[file_path]
+            client = info["client"]
+            try:
+                _ = client.center()
+                print(f"♻️ Reusing valid TileClient for {file_path}")
+            except Exception as e:
+                print(f"⚠️ Client invalid ({e}), recreating...")
+                shutdown_tile_client(file_path)
+                info = None
+        else:
+            info = None
+
+        if info is None:
+            client = new_tile_client(file_path, ip, port)
+            info = {"client": client, "port": port, "sessions": set(), "last_used": time.time()}
+            TILE_CLIENT_REGISTRY[file_path] = info
+            TILE_CLIENT_STATS["created"] += 1
+            print(f"✅ Created new TileClient on {ip}:{port} for {file_path}")
+
+        info["last_used"] = time.time()
+        TILE_CLIENT_REGISTRY.move_to_end(file_path)
+        if session_id:
+            info["sessions"].add(session_id)
+        evict_tile_clients(keep=file_path)
+        return client
+
+
+def attach_tile_session(session_id, file_paths):
+    """Record which rasters a session is viewing, releasing the ones it left.
+
+    ``session_id`` must stay the same while the user navigates (a per-tab
+    id), otherwise a previous sample is only released by the idle timeout.
+    """
+    if not session_id:
+        return
+    with TILE_CLIENT_LOCK:
+        previous = TILE_SESSIONS.get(session_id, {}).get("paths", set())
+        for path in previous - set(file_paths):
+            info = TILE_CLIENT_REGISTRY.get(path)
+            if info:
+                info["sessions"].discard(session_id)
+        TILE_SESSIONS[session_id] = {"paths": set(file_paths), "last_seen": time.time()}
+
+
+def touch_tile_session(session_id):
+    """Mark a session as active so its clients are not idle-evicted."""
+    with TILE_CLIENT_LOCK:
+        if session_id in TILE_SESSIONS:
+            TILE_SESSIONS[session_id]["last_seen"] = time.time()
+
+
+def shutdown_tile_client(file_path):
+    """Remove a client from the registry and release its server and file handles."""
+    with TILE_CLIENT_LOCK:
+        info = TILE_CLIENT_REGISTRY.pop(file_path, None)
+    if not info:
+        return
+    client = info["client"]
+    try:
+        # only stops the port's server once no other client uses it
+        client.shutdown()
+    except Exception as e:
+        print(f"⚠️ TileClient shutdown failed for {file_path}: {e}")
+    try:
+        dataset = getattr(client, "dataset", None)
+        if dataset is not None:
+            dataset.close()
+    except Exception:
+        pass
+    print(f"🗑️ Shut down TileClient for {file_path}")
+
+
+def evict_tile_clients(keep=None):
+    """Apply the idle timeout and the max-open limit to TILE_CLIENT_REGISTRY.
+
+    Sessions not seen for TILE_CLIENT_IDLE_SECONDS drop their references.
+    Unreferenced clients idle that long are shut down, then least recently
+    used clients (unreferenced first) go until the registry fits
+    TILE_CLIENT_MAX_OPEN. ``keep`` is never evicted.
+    """
+    with TILE_CLIENT_LOCK:
+        now = time.time()
+        for sid, entry in list(TILE_SESSIONS.items()):
+            if now - entry["last_seen"] > TILE_CLIENT_IDLE_SECONDS:
+                for path in entry["paths"]:
+                    info = TILE_CLIENT_REGISTRY.get(path)
+                    if info:
+                        info["sessions"].discard(sid)
+                del TILE_SESSIONS[sid]
+
+        victims = [
+            path for path, info in TILE_CLIENT_REGISTRY.items()
+            if path != keep and not info["sessions"]
+            and now - info["last_used"] > TILE_CLIENT_IDLE_SECONDS
+        ]
+        TILE_CLIENT_STATS["idle_evicted"] += len(victims)
+
+        overflow = len(TILE_CLIENT_REGISTRY) - len(victims) - TILE_CLIENT_MAX_OPEN
+        if overflow > 0:
+            candidates = [p for p in TILE_CLIENT_REGISTRY if p != keep and p not in victims]
+            candidates.sort(key=lambda p: bool(TILE_CLIENT_REGISTRY[p]["sessions"]))
+            victims += candidates[:overflow]
+            TILE_CLIENT_STATS["evicted"] += len(candidates[:overflow])
+
+    for path in victims:
+        shutdown_tile_client(path)
+
+
+def tile_client_stats():
+    with TILE_CLIENT_LOCK:
+        return {
+            **TILE_CLIENT_STATS,
+            "open": len(TILE_CLIENT_REGISTRY),
+            "max_open": TILE_CLIENT_MAX_OPEN,
+            "idle_seconds": TILE_CLIENT_IDLE_SECONDS,
+            "sessions": len(TILE_SESSIONS),
+            "clients": {
+                path: {"sessions": len(info["sessions"]), "idle": round(time.time() - info["last_used"])}
+                for path, info in TILE_CLIENT_REGISTRY.items()
+            },
+        }
+
+
+def start_janitor(interval=60):
+    """Run ``evict_tile_clients`` every ``interval`` seconds in the background."""
+    def _tile_client_janitor():
+        while True:
+            time.sleep(interval)
+            try:
+                evict_tile_clients()
+            except Exception as e:
+                print(f"⚠️ TileClient janitor failed: {e}")
+
+    threading.Thread(target=_tile_client_janitor, daemon=True).start()
@@ -0,0 +1,345 @@
+import os
+import math
+import itertools
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+from flask import Blueprint, Response, abort, request
+from rio_tiler.errors import TileOutsideBounds
+from rio_tiler.io import Reader
+from rio_tiler.utils import render
+
+from image_cache import ByteLRUCache
+from raster_pool import RasterPool
+
+DATABASE_DIR = "/condo/wanglab/shared/database"
+
+# layer name in tile URLs -> raster file inside a sample folder
+LAYER_FILES = {
+    "base": "raster_resized.tif",
+    "overlay": "raster_resized_overlay.tif",
+}
+
+# rio-tiler readers, one per rendering thread and raster (see RasterPool)
+READER_POOL = RasterPool(
+    int(os.environ.get("TILE_MAX_OPEN_DATASETS", "32")),
+    name="tile-readers",
+    opener=Reader,
+)
+
+# Rendered PNG tiles shared by every session, keyed by (path, mtime, z, x, y).
+TILE_CACHE = ByteLRUCache(
+    int(os.environ.get("TILE_CACHE_MB", "512")) * 1024 ** 2,
+    name="tiles",
+)
+
+# Background tile warm-up / viewport prefetch (see warm_sample).
+WARM_POOL = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("TILE_WARM_WORKERS", "2")),
+    thread_name_prefix="tile-warm",
+)
+MAX_WARM_TILES = int(os.environ.get("TILE_MAX_WARM_TILES", "256"))
+
+tiles_bp = Blueprint("tiles", __name__)
+
+_EMPTY_TILE = None
+# owner -> {"key": rasters being warmed, "generation": int, "pending": int};
+# an owner's entry is dropped once none of its tiles are queued
+_WARM_STATE = {}
+_WARM_LOCK = threading.Lock()
+_WARM_GENERATIONS = itertools.count(1)
+# tile requests being served; warm-up waits while any are in flight
+_INTERACTIVE = 0
+_INTERACTIVE_COND = threading.Condition()
+
+
+def cog_path(path):
+    """Path of the prebuilt Cloud-Optimized GeoTIFF for a raster (see build_tiles.py)."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.cog{ext}"
+
+
+def raster_path(sample, layer):
+    """Resolve the raster file of a sample layer inside ``DATABASE_DIR``.
+
+    A prebuilt COG is used when one exists and is not older than the source.
+
+    Args:
+        sample (str): sample folder name.
+        layer (str): key of ``LAYER_FILES``.
+
+    Returns:
+        str: absolute raster path.
+    """
+    if layer not in LAYER_FILES:
+        raise KeyError(f"Unknown layer: {layer}")
+    root = os.path.realpath(DATABASE_DIR)
+    path = os.path.realpath(os.path.join(root, sample, LAYER_FILES[layer]))
+    if not path.startswith(root + os.sep):
+        raise KeyError(f"Sample outside database: {sample}")
+
+    prebuilt = cog_path(path)
+    try:
+        if os.stat(prebuilt).st_mtime_ns >= os.stat(path).st_mtime_ns:
+            return prebuilt
+    except OSError:
+        pass
+    return path
+
+
+def empty_tile():
+    """Transparent 256x256 PNG used for tiles outside the raster."""
+    global _EMPTY_TILE
+    if _EMPTY_TILE is None:
+        _EMPTY_TILE = cv2.imencode(".png", np.zeros((256, 256, 4), dtype=np.uint8))[1].tobytes()
+    return _EMPTY_TILE
+
+
+def render_tile(path, z, x, y):
+    """Render (or fetch from ``TILE_CACHE``) one XYZ tile of a raster.
+
+    A fourth band (RGBA overlays) is used as alpha, combined with the
+    dataset mask, so transparent areas stay transparent over the base layer.
+
+    Args:
+        path (str): raster path.
+        z, x, y (int): tile coordinates.
+
+    Returns:
+        bytes: PNG data.
+    """
+    key = (path, os.stat(path).st_mtime_ns, z, x, y)
+
+    def _render():
+        # each rendering thread checks out a reader of its own, so tiles of
+        # one layer render in parallel
+        with READER_POOL.dataset(path) as reader:
+            try:
+                if not reader.tile_exists(x, y, z):
+                    return empty_tile()
+                count = reader.dataset.count
+                indexes = (1, 2, 3, 4) if count >= 4 else (1, 2, 3) if count >= 3 else (1,)
+                image = reader.tile(x, y, z, indexes=indexes)
+            except TileOutsideBounds:
+                return empty_tile()
+        if len(indexes) == 4:
+            alpha = np.clip(image.data[3], 0, 255).astype(np.uint8)
+            return render(image.data[:3], np.minimum(image.mask, alpha), img_format="PNG")
+        return image.render(img_format="PNG")
+
+    return TILE_CACHE.get_or_load(key, _render)
+
+
+class TileSource:
+    """Map metadata and tile URL of one sample layer served by ``tiles_bp``.
+
+    Exposes the same attributes ``create_leaflet_map`` reads from a
+    localtileserver ``TileClient`` / leaflet tile layer pair.
+
+    Args:
+        sample (str): sample folder name.
+        layer (str): key of ``LAYER_FILES``.
+        info (dict, optional): the layer's ``sample_index`` entry; when
+            given, no file is opened or stat'ed.
+    """
+
+    def __init__(self, sample, layer, info=None):
+        if info is not None:
+            self.path = info["path"]
+            self.min_zoom = info["min_zoom"]
+            self.max_zoom = info["max_zoom"]
+            self.bounds = info["bounds"]
+            version = info["mtime_ns"]
+        else:
+            self.path = raster_path(sample, layer)
+            with READER_POOL.dataset(self.path) as reader:
+                west, south, east, north = reader.geographic_bounds
+                self.min_zoom = reader.minzoom
+                self.max_zoom = reader.maxzoom
+            self.bounds = [[south, west], [north, east]]
+            version = os.stat(self.path).st_mtime_ns
+        self.default_zoom = self.min_zoom
+
+        # the mtime query busts browser caches when the raster is rebuilt
+        self.url = (
+            f"/tiles/{urllib.parse.quote(sample)}/{layer}/{{z}}/{{x}}/{{y}}.png?v={version}"
+        )
+
+    def center(self):
+        (south, west), (north, east) = self.bounds
+        return (south + north) / 2, (west + east) / 2
+
+
+def tiles_in_bounds(bounds, z, pad=0):
+    """XYZ tiles covering geographic bounds at zoom ``z``.
+
+    Args:
+        bounds (list): [[south, west], [north, east]].
+        z (int): zoom level.
+        pad (int): extra ring of tiles around the bounds.
+
+    Returns:
+        list[tuple[int, int, int]]: (z, x, y) tiles.
+    """
+    (south, west), (north, east) = bounds
+    n = 2 ** z
+
+    def _tile(lon, lat):
+        lat = max(min(lat, 85.0511), -85.0511)
+        x = int((lon + 180.0) / 360.0 * n)
+        y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+        return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+    x0, y0 = _tile(west, north)
+    x1, y1 = _tile(east, south)
+    return [
+        (z, x, y)
+        for x in range(max(x0 - pad, 0), min(x1 + pad, n - 1) + 1)
+        for y in range(max(y0 - pad, 0), min(y1 + pad, n - 1) + 1)
+    ]
+
+
+def _warm_generation(owner, key, count):
+    """Current warm-up generation of ``owner``; a new key cancels older work.
+
+    Also reserves ``count`` pending tiles for the owner. Generations are
+    unique across owners' entries, so tiles queued before an entry was
+    dropped never match a newer one.
+    """
+    with _WARM_LOCK:
+        state = _WARM_STATE.get(owner)
+        if state is None or state["key"] != key:
+            state = _WARM_STATE[owner] = {"key": key, "generation": next(_WARM_GENERATIONS), "pending": 0}
+        state["pending"] += count
+        return state["generation"]
+
+
+@contextmanager
+def interactive_request():
+    """Mark a client tile request in flight, so warm-up yields to it."""
+    global _INTERACTIVE
+    with _INTERACTIVE_COND:
+        _INTERACTIVE += 1
+    try:
+        yield
+    finally:
+        with _INTERACTIVE_COND:
+            _INTERACTIVE -= 1
+            _INTERACTIVE_COND.notify_all()
+
+
+def _superseded(owner, generation):
+    with _WARM_LOCK:
+        state = _WARM_STATE.get(owner)
+        return state is None or state["generation"] != generation
+
+
+def _warm_tile(owner, generation, path, z, x, y):
+    try:
+        while True:
+            if _superseded(owner, generation):
+                return  # the owner moved to another sample
+            # client requests go first: warm-up only renders when idle
+            with _INTERACTIVE_COND:
+                if _INTERACTIVE_COND.wait_for(lambda: _INTERACTIVE == 0, timeout=0.5):
+                    break
+        render_tile(path, z, x, y)
+    except Exception as e:
+        print(f"⚠️ Tile warm-up failed {path} {z}/{x}/{y}: {e}")
+    finally:
+        with _WARM_LOCK:
+            state = _WARM_STATE.get(owner)
+            if state is not None and state["generation"] == generation:
+                state["pending"] -= 1
+                if state["pending"] <= 0:
+                    del _WARM_STATE[owner]
+
+
+def _submit_warm(owner, paths, tiles):
+    key = tuple(paths)
+    tiles = tiles[:MAX_WARM_TILES]
+    if not tiles or not paths:
+        return 0
+    generation = _warm_generation(owner, key, len(tiles) * len(paths))
+    for z, x, y in tiles:
+        for path in paths:
+            WARM_POOL.submit(_warm_tile, owner, generation, path, z, x, y)
+    return len(tiles) * len(paths)
+
+
+def warm_sample(owner, sources, max_zoom):
+    """Render the low-zoom tiles of a sample's layers in the background.
+
+    Work for ``owner`` on a previous sample is cancelled. Warm-up renders
+    only while no client tile request is being served.
+
+    Args:
+        owner (str): browser tab id (stable across page loads).
+        sources (list[TileSource]): base and overlay layers.
+        max_zoom (float): last zoom level to warm (the map's default zoom).
+
+    Returns:
+        int: number of tiles queued.
+    """
+    if not sources:
+        return 0
+    base = sources[0]
+    last = min(int(math.ceil(max_zoom)), base.max_zoom)
+    tiles = []
+    for z in range(int(base.min_zoom), last + 1):
+        tiles += tiles_in_bounds(base.bounds, z)
+    queued = _submit_warm(owner, [s.path for s in sources], tiles)
+    print(f"🔥 Warming {queued} tile(s) for tab {owner} (z{base.min_zoom}-{last})")
+    return queued
+
+
+def prefetch_viewport(owner, paths, bounds, zoom, ring=1):
+    """Queue the tiles in and around the client's viewport.
+
+    Args:
+        owner (str): browser tab id.
+        paths (list[str]): rasters of the sample being viewed.
+        bounds (list): viewport [[south, west], [north, east]].
+        zoom (float): current zoom.
+        ring (int): tiles of padding around the viewport.
+
+    Returns:
+        int: number of tiles queued.
+    """
+    return _submit_warm(owner, paths, tiles_in_bounds(bounds, int(round(zoom)), pad=ring))
+
+
+def cancel_warm(owner):
+    """Drop all pending warm-up work of ``owner``."""
+    with _WARM_LOCK:
+        state = _WARM_STATE.pop(owner, None)
+    return state is not None
+
+
+@tiles_bp.route("/tiles/<path:sample>/<layer>/<int:z>/<int:x>/<int:y>.png")
+def serve_tile(sample, layer, z, x, y):
+    try:
+        path = raster_path(sample, layer)
+    except KeyError:
+        abort(404)
+    if not os.path.exists(path):
+        abort(404)
+
+    with interactive_request():
+        data = render_tile(path, z, x, y)
+    response = Response(data, mimetype="image/png")
+    # URLs carry ?v=<mtime>, so tiles can be cached aggressively
+    if request.args.get("v"):
+        response.cache_control.public = True
+        response.cache_control.max_age = 86400
+    response.headers["Access-Control-Allow-Origin"] = "*"
+    return response
+
+
+@tiles_bp.route("/tiles/stats")
+def tile_stats():
+    return {"readers": READER_POOL.stats(), "cache": TILE_CACHE.stats()}
@@ -0,0 +1,14 @@
+"""WSGI entry point for running the viewer under a multi-worker server.
+
+    gunicorn -c image_chat/gunicorn.conf.py wsgi:application
+
+Each worker imports ``image_chat_app`` on its own, so caches, tile readers
+and thread pools are per process. State that must agree between workers is
+kept on disk: chat sessions (JSONL), ROI folders, the lock files for both,
+the model admission slots and ROI jobs (all under ``APP_STATE_DIR``) and the
+response cache (SQLite). In-memory caches are per worker; gunicorn.conf.py
+divides their default budgets by the worker count.
+"""
+from image_chat_app import server
+
+application = server
@@ -17,7 +17,7 @@ NODE_NAME=$(hostname)
 
 # --- Kill existing nohup jobs (user-owned only) ---
 echo "🧹 Checking for existing Dash or HTTP servers..."
-PIDS=$(ps aux | grep "$USER" | grep -E "image_chat_app.py|http.server" | grep -v "grep" | awk '{print $2}')
+PIDS=$(ps aux | grep "$USER" | grep -E "image_chat_app.py|wsgi:application|http.server" | grep -v "grep" | awk '{print $2}')
 
 if [ -n "$PIDS" ]; then
   echo "⚠️  Found running processes: $PIDS"
@@ -9,15 +9,23 @@ conda activate /condo/wanglab/tmhtxt85/conda_envs/mjolnir
 DASH_PORT=8050
 HTTP_PORT=8083
 MODEL_PORT=11434
+# Tiles are served by the Dash app under /tiles; the TileClient port is only
+# used (and needs a tunnel) with TILE_BACKEND=localtileserver.
 TILE_PORT=9015
 
+# --- Server mode ---
+# dev:  single process, Flask development server (python image_chat_app.py)
+# prod: gunicorn with WEB_WORKERS processes x WEB_THREADS threads (wsgi.py)
+SERVER_MODE=${SERVER_MODE:-dev}
+export DASH_PORT
+
 # --- Detect environment ---
 USER_NAME=$(whoami)
 NODE_NAME=$(hostname)
 
 # --- Kill existing nohup jobs (user-owned only) ---
 echo "🧹 Checking for existing Dash or HTTP servers..."
-PIDS=$(ps aux | grep "$USER" | grep -E "image_chat_app.py|http.server" | grep -v "grep" | awk '{print $2}')
+PIDS=$(ps aux | grep "$USER" | grep -E "image_chat_app.py|wsgi:application|http.server" | grep -v "grep" | awk '{print $2}')
 
 if [ -n "$PIDS" ]; then
   echo "⚠️  Found running processes: $PIDS"
@@ -29,9 +37,22 @@ else
 fi
 
 
+# --- Refresh the sample index (only changed samples are re-scanned) ---
+echo "📇 Refreshing sample index..."
+python ./image_chat/sample_index.py > ./sample_index.log 2>&1 || echo "⚠️  Sample index refresh failed, see ./sample_index.log"
+
+# --- Refresh the dataset catalog snapshot (keeps the old one if offline) ---
+echo "📚 Refreshing dataset catalog..."
+python ./image_chat/catalog.py > ./catalog.log 2>&1 || echo "⚠️  Catalog refresh failed, serving the previous snapshot"
+
 # --- Run Dash app ---
-echo "🧠 Starting Dash app on port $DASH_PORT..."
-nohup python ./image_chat/image_chat_app.py > ./dash_$DASH_PORT.log 2>&1 &
+if [ "$SERVER_MODE" = "prod" ]; then
+  echo "🧠 Starting Dash app on port $DASH_PORT (gunicorn, ${WEB_WORKERS:-auto} workers)..."
+  nohup gunicorn -c ./image_chat/gunicorn.conf.py wsgi:application > ./dash_$DASH_PORT.log 2>&1 &
+else
+  echo "🧠 Starting Dash app on port $DASH_PORT..."
+  nohup python ./image_chat/image_chat_app.py > ./dash_$DASH_PORT.log 2>&1 &
+fi
 DASH_PID=$!
 
 # --- Run HTTP file server ---
@@ -43,7 +64,7 @@ HTTP_PID=$!
 echo ""
 echo "✅ Dash app running on: http://$NODE_NAME:$DASH_PORT"
 echo "✅ HTTP preview server: http://$NODE_NAME:$HTTP_PORT"
-echo "✅ TileClient server:   http://$NODE_NAME:$TILE_PORT"
+echo "✅ Map tiles:           http://$NODE_NAME:$DASH_PORT/tiles"
 echo "✅ Model expected on:   $MODEL_PORT"
 echo ""
 echo "📄 Logs:"
@@ -58,7 +79,6 @@ echo "🔗 Run this on your laptop to start port forwarding:"
 echo ""
 echo "ssh -L $HTTP_PORT:$NODE_NAME:$HTTP_PORT \\"
 echo "    -L $DASH_PORT:$NODE_NAME:$DASH_PORT \\"
-echo "    -L $TILE_PORT:$NODE_NAME:$TILE_PORT \\"
 echo "    $USER_NAME@hpc.tmh.tmhs"
 echo ""
 echo "💡 Once tunneled, open in your browser:"
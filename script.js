@@ -3,35 +3,46 @@ const techTabs = document.getElementById("techTabs");
 const filterTissue = document.getElementById("filterTissue");
 const filterSpecies = document.getElementById("filterSpecies");
 const filterStatus = document.getElementById("filterStatus");
-let allData = [];
+const pagination = document.getElementById("pagination");
 let currentTech = null;
+let requestSeq = 0;
 
-const sheetCSVUrl =
-  "https://docs.google.com/spreadsheets/d/e/2PACX-1vS6BxRrR8H56sDOg9LZA8WGVrQlbVg6vRMxtWgqG1Yo4W3IwgWHS7n6ajB4FNIKyHRwqZXjF9w7hdiN/pub?gid=0&single=true&output=csv";
-
-fetch(sheetCSVUrl)
-  .then(res => res.text())
-  .then(csvText => {
-    const parsed = Papa.parse(csvText, { header: true });
-    allData = parsed.data
-      .map(row => {
-        const normalized = {};
-        Object.keys(row).forEach(k => {
-          normalized[k.trim().replace(/^\uFEFF/, "")] = row[k];
-        });
-        return normalized;
-      })
-      .filter(row => row["dataset_name"] || row["adata_filename"]);
-
-    createTabs(allData);
-    populateDropdowns(allData);
+// Catalog snapshot served by the Dash app (see image_chat/catalog.py)
+const catalogAPI = "http://localhost:8050/api/catalog";
+const PER_PAGE = 50;
+
+// First page, plus the tab and filter values
+fetchPage({ page: 1, facets: true })
+  .then(data => {
+    createTabs(data.facets.technology);
+    populateDropdowns(data.facets);
     applyFilters(); // initial render
+  })
+  .catch(err => {
+    console.warn("⚠️ Catalog fetch failed:", err.message);
+    tbody.innerHTML = "<tr><td colspan='12'>Catalog unavailable — is the app server running?</td></tr>";
   });
 
-// Create technology tabs
-function createTabs(data) {
-  const technologies = [...new Set(data.map(d => d["technology"]).filter(Boolean))];
+// Fetch one page of the catalog with the current search and filters
+function fetchPage({ page, facets = false }) {
+  const params = new URLSearchParams({ page, per_page: PER_PAGE });
+  if (facets) params.set("facets", "1");
+  if (currentTech) params.append("technology", currentTech);
+
+  const search = document.getElementById("searchBox").value.trim();
+  if (search) params.set("q", search);
+  filterTissue.querySelectorAll("input:checked").forEach(i => params.append("tissue", i.value));
+  filterSpecies.querySelectorAll("input:checked").forEach(i => params.append("species", i.value));
+  filterStatus.querySelectorAll("input:checked").forEach(i => params.append("status", i.value));
+
+  return fetch(`${catalogAPI}?${params}`).then(res => {
+    if (!res.ok) throw new Error(`Catalog API returned ${res.status}`);
+    return res.json();
+  });
+}
 
+// Create technology tabs
+function createTabs(technologies) {
   technologies.forEach((tech, idx) => {
     const btn = document.createElement("button");
     btn.textContent = tech;
@@ -51,10 +62,10 @@ function createTabs(data) {
 }
 
 // Populate dropdowns with checkboxes
-function populateDropdowns(data) {
-  const tissues = [...new Set(data.map(d => d["general tissue"]).filter(Boolean))];
-  const species = [...new Set(data.map(d => d["species"]).filter(Boolean))];
-  const statuses = [...new Set(data.map(d => d["cancer or normal or other disease"]).filter(Boolean))];
+function populateDropdowns(facets) {
+  const tissues = facets.tissue;
+  const species = facets.species;
+  const statuses = facets.status;
 
   function createCheckboxOption(value, container) {
     const wrapper = document.createElement("div");
@@ -128,32 +139,49 @@ function renderTable(data) {
   });
 }
 
-// Apply search + filters + current technology tab
-function applyFilters() {
-  const search = document.getElementById("searchBox").value.toLowerCase();
+// Render page controls
+function renderPagination(data) {
+  pagination.innerHTML = "";
 
-  const selectedTissues = Array.from(filterTissue.querySelectorAll("input:checked")).map(i => i.value);
-  const selectedSpecies = Array.from(filterSpecies.querySelectorAll("input:checked")).map(i => i.value);
-  const selectedStatuses = Array.from(filterStatus.querySelectorAll("input:checked")).map(i => i.value);
+  const prev = document.createElement("button");
+  prev.textContent = "‹ Prev";
+  prev.disabled = data.page <= 1;
+  prev.addEventListener("click", () => loadPage(data.page - 1));
 
-  const filtered = allData.filter(row => {
-    const matchesTech = !currentTech || row["technology"] === currentTech;
+  const info = document.createElement("span");
+  info.textContent = `Page ${data.page} of ${data.pages} · ${data.total} datasets`;
 
-    const text = Object.values(row).join(" ").toLowerCase();
-    const matchesSearch = text.includes(search);
+  const next = document.createElement("button");
+  next.textContent = "Next ›";
+  next.disabled = data.page >= data.pages;
+  next.addEventListener("click", () => loadPage(data.page + 1));
 
-    const matchesTissue = selectedTissues.length === 0 || selectedTissues.includes(row["general tissue"]);
-    const matchesSpecies = selectedSpecies.length === 0 || selectedSpecies.includes(row["species"]);
-    const matchesStatus = selectedStatuses.length === 0 || selectedStatuses.includes(row["cancer or normal or other disease"]);
+  pagination.append(prev, info, next);
+}
 
-    return matchesTech && matchesSearch && matchesTissue && matchesSpecies && matchesStatus;
-  });
+// Fetch and render one page (responses to superseded requests are dropped)
+function loadPage(page) {
+  const seq = ++requestSeq;
+  fetchPage({ page })
+    .then(data => {
+      if (seq !== requestSeq) return;
+      renderTable(data.rows);
+      renderPagination(data);
+    })
+    .catch(err => console.warn("⚠️ Catalog fetch failed:", err.message));
+}
 
-  renderTable(filtered);
+// Apply search + filters + current technology tab (back to the first page)
+function applyFilters() {
+  loadPage(1);
 }
 
 // Event listeners
-document.getElementById("searchBox").addEventListener("keyup", applyFilters);
+let searchTimer;
+document.getElementById("searchBox").addEventListener("keyup", () => {
+  clearTimeout(searchTimer);
+  searchTimer = setTimeout(applyFilters, 250);
+});
 
 // Toggle dropdown open/close
 document.querySelector(".filter-btn").addEventListener("click", () => {